@@ -17,6 +17,7 @@ import numpy as np
 import pyaudio
 
 from numba import jit
+from bmi30_dsp import PeriodAverager         # Усреднение зон по всем периодам чанка
 import random
 import atexit
 
@@ -119,11 +120,6 @@ accum_DC_spad_P = np.zeros((count_accum, chunk_out2), dtype=int)
 accum_DC_front_L = np.zeros((count_accum, chunk_out2), dtype=int)                    
 accum_DC_spad_L = np.zeros((count_accum, chunk_out2), dtype=int)
 
-front_values_P = np.empty((0, chunk_out2), dtype=np.int16)
-spad_values_P = np.empty((0, chunk_out2), dtype=np.int16)
-front_values_L = np.empty((0, chunk_out2), dtype=np.int16)
-spad_values_L = np.empty((0, chunk_out2), dtype=np.int16)
-
 # Константы
 chunk = 23040
 chunk_out2 = 240
@@ -140,13 +136,16 @@ adc_P0s = np.zeros(chunk_out2, dtype=np.int64) # Средние данные - 
 adc_L0f = np.zeros(chunk_out2, dtype=np.int64) # Средние данные - левый канал по фронту
 adc_L0s = np.zeros(chunk_out2, dtype=np.int64) # Средние данные - левый канал по спаду
 sinhro = 0
+avg_depth = 1                                   # Глубина усреднения зон, в чанках (1 - только текущий)
+avg_front = PeriodAverager(chunk_out2, start_index_front, avg_depth)  # Зоны по фронту, оба канала
+avg_spad = PeriodAverager(chunk_out2, start_index_spad, avg_depth)    # Зоны по спаду, оба канала
 
 # @jit
 def callback(in_data, frame_count, time_info, status):
     led_line.set_value(1)
 
-    global adc_L0, adc_P0, adc_P0f, adc_P0s, adc_L0f, adc_L0s, front_values_P, spad_values_P
-    global front_values_L, spad_values_L, accum_DC_front_P, accum_DC_spad_P
+    global adc_L0, adc_P0, adc_P0f, adc_P0s, adc_L0f, adc_L0s
+    global accum_DC_front_P, accum_DC_spad_P
     global accum_DC_front_L, accum_DC_spad_L, accumulation_count, sinhro
 
 
@@ -162,47 +161,17 @@ def callback(in_data, frame_count, time_info, status):
 
     valid_starts = np.where(condition)[0]
 
-    # ????????????? ??????? ??????? ? ?????? ??? ??????? ??????
-    front_values_P = np.empty((0, chunk_out2), dtype=np.int64)  # ????? ????????
-    spad_values_P = np.empty((0, chunk_out2), dtype=np.int64)   # ????? ????????
-    front_values_L = np.empty((0, chunk_out2), dtype=np.int64)  # ????? ????????
-    spad_values_L = np.empty((0, chunk_out2), dtype=np.int64)   # ????? ????????
-
-    # ???? ??? ????? ???????? ??????? ? ??????
-    for start_index in valid_starts:
-        front_start_P = start_index + start_index_front
-        spad_start_P = start_index + start_index_spad
-        front_start_L = start_index + start_index_front
-        spad_start_L = start_index + start_index_spad
-
-        # ????????? ?????? ?? ?????? ??????? ??????
-        if front_start_P + chunk_out2 <= len(adc_P0):
-            front_values_P = np.vstack((front_values_P, adc_P0[front_start_P:front_start_P + chunk_out2]))
-        
-        # ????????? ?????? ? ????? ??????? ??????
-        if spad_start_P + chunk_out2 <= len(adc_P0):
-            spad_values_P = np.vstack((spad_values_P, adc_P0[spad_start_P:spad_start_P + chunk_out2]))
-
-        # ????????? ?????? ?? ?????? ?????? ??????
-        if front_start_L + chunk_out2 <= len(adc_L0):
-            front_values_L = np.vstack((front_values_L, adc_L0[front_start_L:front_start_L + chunk_out2]))
-
-        # ????????? ?????? ? ????? ?????? ??????
-        if spad_start_L + chunk_out2 <= len(adc_L0):
-            spad_values_L = np.vstack((spad_values_L, adc_L0[spad_start_L:spad_start_L + chunk_out2]))
-
-    # ????????? ??????????? ???????? ???????
-    if front_values_P.size > 0:
-        adc_P0f = np.round(np.mean(front_values_P, axis=0)).astype(int)
-
-    if spad_values_P.size > 0:
-        adc_P0s = np.round(np.mean(spad_values_P, axis=0)).astype(int)
-
-    if front_values_L.size > 0:
-        adc_L0f = np.round(np.mean(front_values_L, axis=0)).astype(int)
-
-    if spad_values_L.size > 0:
-        adc_L0s = np.round(np.mean(spad_values_L, axis=0)).astype(int)
+    # Все окна фронта/спада обоих каналов (строки 0 - L, 1 - P) одним взятием по индексам,
+    # суммы копятся в PeriodAverager по последним avg_depth чанкам
+    stereo = np.stack((adc_L0, adc_P0))
+    avg_front.add(stereo, valid_starts)
+    avg_spad.add(stereo, valid_starts)
+    front = avg_front.mean()
+    spad = avg_spad.mean()
+    if front is not None:
+        adc_L0f, adc_P0f = front
+    if spad is not None:
+        adc_L0s, adc_P0s = spad
 
     led_line.set_value(0)
     sinhro = 1
@@ -19,6 +19,7 @@ import spidev
 from gpiozero import DigitalOutputDevice, PWMOutputDevice, Button as GPIOButton
 from rpi_hardware_pwm import HardwarePWM
 from bmi30_def import initialize_gpio, set_resistor, toggle_gpio6_and_update_resistors, update_plot
+from bmi30_dsp import find_sync_points, MovingSum, sum_zones_shifted, LRUCache, CrossCorrelator, DCTracker
 from bmi30_plt import (
     update_start,
     switch_graph,
@@ -137,6 +138,7 @@ p = pyaudio.PyAudio()
 dataADC_P1 = np.zeros(CHUNK, dtype=int)
 dataADC_L1 = np.zeros(CHUNK, dtype=int)
 start_sinchronize = 0
+data_seq = 0  # Номер текущего буфера (растёт на каждый audio_callback) — ключ кэшей
 
 # Добавляем глобальные переменные для хранения зон ожидания
 zone_P1_1 = np.zeros(200)  # Зона 1 верхней антенны (370-570)
@@ -144,11 +146,20 @@ zone_P1_2 = np.zeros(200)  # Зона 2 верхней антенны (1320-1520
 zone_L1_1 = np.zeros(200)  # Зона 1 нижней антенны (350-550)
 zone_L1_2 = np.zeros(200)  # Зона 2 нижней антенны (1320-1520)
 
-# Добавляем массивы для хранения постоянных составляющих
-dc_P1_1 = np.zeros(200)  # Постоянная составляющая зоны 1 верхней антенны
-dc_P1_2 = np.zeros(200)  # Постоянная составляющая зоны 2 верхней антенны
-dc_L1_1 = np.zeros(200)  # Постоянная составляющая зоны 1 нижней антенны
-dc_L1_2 = np.zeros(200)  # Постоянная составляющая зоны 2 нижней антенны
+# Константы для шагов DC
+DC_STEP_LARGE = 16    # Шаг для больших отклонений
+DC_STEP_MEDIUM = 4    # Шаг для средних отклонений
+DC_STEP_SMALL = 1      # Шаг для малых отклонений
+
+DC_THRESHOLD_HIGH = 10000  # Порог для больших отклонений
+DC_THRESHOLD_LOW = 3000    # Порог для малых отклонений
+
+# Постоянные составляющие всех четырёх зон — строки одного DCTracker (bmi30_dsp):
+# счётчики шагов и направления хранятся там же, обновление — один проход по 4×200.
+# dc_P1_1 … dc_L1_2 — виды на строки tracker.dc, меняются на месте.
+dc_tracker = DCTracker(4, 200, thresholds=(DC_THRESHOLD_LOW, DC_THRESHOLD_HIGH),
+                       steps=(DC_STEP_SMALL, DC_STEP_MEDIUM, DC_STEP_LARGE))
+dc_P1_1, dc_P1_2, dc_L1_1, dc_L1_2 = dc_tracker.dc  # Зоны 1/2 верхней (P1) и нижней (L1) антенны
 
 # Массивы для хранения переменных составляющих
 ac_P1_1 = np.zeros(200)  # Переменная составляющая зоны 1 верхней антенны
@@ -161,25 +172,14 @@ sum_P1_2 = np.zeros(200)  # Сумма для зоны 2 верхней анте
 sum_L1_1 = np.zeros(200)  # Сумма для зоны 1 нижней антенны
 sum_L1_2 = np.zeros(200)  # Сумма для зоны 2 нижней антенны
 
-# Счетчики последовательных отклонений для каждой зоны
-dc_counter_P1_1 = np.ones(200)  # Счетчик для зоны 1 верхней антенны
-dc_counter_P1_2 = np.ones(200)  # Счетчик для зоны 2 верхней антенны
-dc_counter_L1_1 = np.ones(200)  # Счетчик для зоны 1 нижней антенны
-dc_counter_L1_2 = np.ones(200)  # Счетчик для зоны 2 нижней антенны
-
-# Предыдущие направления изменения для каждой зоны (True - увеличение, False - уменьшение)
-prev_direction_P1_1 = np.zeros(200, dtype=bool)
-prev_direction_P1_2 = np.zeros(200, dtype=bool)
-prev_direction_L1_1 = np.zeros(200, dtype=bool)
-prev_direction_L1_2 = np.zeros(200, dtype=bool)
-
 # Добавим после объявления других массивов
-# Массивы для хранения истории разностных сигналов (6 последних измерений)
-diff_history_P1 = np.zeros((6, 200))  # История разностей верхней антенны
-diff_history_L1 = np.zeros((6, 200))  # История разностей нижней антенны
-diff_sum_P1 = np.zeros(200)  # Сумма последних 6 разностей верхней антенны
-diff_sum_L1 = np.zeros(200)  # Сумма последних 6 разностей нижней антенны
-history_index = 0  # Индекс для циклической записи в историю
+# История разностных сигналов (DIFF_HISTORY_DEPTH последних измерений) со скользящей суммой:
+# стоимость обновления не зависит от глубины, её можно поднимать до сотен периодов
+DIFF_HISTORY_DEPTH = 6
+diff_history_P1 = MovingSum(200, DIFF_HISTORY_DEPTH)  # История разностей верхней антенны
+diff_history_L1 = MovingSum(200, DIFF_HISTORY_DEPTH)  # История разностей нижней антенны
+diff_sum_P1 = np.zeros(200)  # Сумма последних DIFF_HISTORY_DEPTH разностей верхней антенны
+diff_sum_L1 = np.zeros(200)  # Сумма последних DIFF_HISTORY_DEPTH разностей нижней антенны
 
 # Добавить после объявления других глобальных переменных
 max_sample_index_P1 = -1  # Индекс максимального значения для верхней антенны
@@ -262,56 +262,21 @@ sum_low_level_shifted = np.zeros(240)   # Сумма low_level зон с уче
 zone_sum_update_counter = 0
 ZONE_SUM_UPDATE_INTERVAL = 2  # Обновлять суммы только каждые N циклов
 
-# Ускоренная функция суммирования зон с векторизацией операций
-
-def sum_zones_with_shifts_fast(data, zone_marks, zone_length=240, shifts_range=10):
-    """
-    Существенно оптимизированная версия для суммирования зон с учетом смещений
-    """
-    # Кэширование результатов для повторяющихся вызовов
-    cache_key = hash(data.tobytes()) + hash(tuple(zone_marks))
-    
-    if not hasattr(sum_zones_with_shifts_fast, 'cache'):
-        sum_zones_with_shifts_fast.cache = {}
-    
-    if cache_key in sum_zones_with_shifts_fast.cache:
-        return sum_zones_with_shifts_fast.cache[cache_key]
-    
-    # Создаем пустой массив для результата
-    sum_result = np.zeros(zone_length)
-    
-    # Получаем валидные зоны один раз
-    valid_zones = []
-    for start_idx in zone_marks:
-        if start_idx + zone_length <= len(data):
-            valid_zones.append(data[start_idx:start_idx + zone_length])
-    
-    if not valid_zones:
-        return sum_result
-    
-    # Преобразуем список зон в numpy массив для векторизации
-    zones_array = np.array(valid_zones)
-    
-    # Сначала суммируем все зоны без смещения
-    sum_result += np.sum(zones_array, axis=0)
-    
-    # Положительные смещения - векторизованная версия
-    for shift in range(1, shifts_range + 1):
-        for zone in zones_array:
-            sum_result[shift:] += zone[:zone_length-shift]
-    
-    # Отрицательные смещения - векторизованная версия
-    for shift in range(1, shifts_range + shifts_range):
-        for zone in zones_array:
-            sum_result[:zone_length-shift] += zone[shift:]
-    
-    # Сохраняем результат в кэш
-    sum_zones_with_shifts_fast.cache[cache_key] = sum_result
-    
-    # Ограничиваем размер кэша
-    if len(sum_zones_with_shifts_fast.cache) > 50:
-        sum_zones_with_shifts_fast.cache = {}
-    
+# Суммирование зон с учётом смещений: одна свёртка суммарной зоны с прямоугольным
+# ядром (bmi30_dsp.sum_zones_shifted), результат тот же, что у прежних циклов.
+# Кэш — по номеру буфера seq (data_seq из audio_callback), а не по хэшу содержимого;
+# без seq результат не кэшируется.
+zone_sum_cache = LRUCache(8)
+
+def sum_zones_with_shifts_fast(data, zone_marks, zone_length=240, shifts_range=10, seq=None):
+    key = None if seq is None else (seq, tuple(zone_marks), zone_length, shifts_range)
+    if key is not None:
+        cached = zone_sum_cache.get(key)
+        if cached is not None:
+            return cached
+    sum_result = sum_zones_shifted(data, zone_marks, zone_length, shifts_range)
+    if key is not None:
+        zone_sum_cache.put(key, sum_result)
     return sum_result
 
 # Добавьте функцию кэширования результатов для повторяющихся участков данных
@@ -419,29 +384,14 @@ settings = load_settings(settings_file)
 current_oscilloscope = settings.get('current_oscilloscope', 1)
 window_size = settings.get('window_size', (800, 600))
 
-# Функция синхронизации данных
+# Функция синхронизации данных: начала периодов за один векторный проход,
+# start_sinchronize — первое из них (если не нашли — остаётся как было)
 def synchronize_data(data):
     global start_sinchronize
-    threshold1 = -23000
-    threshold2 = -30000
-    for i in range(len(data) - 595):
-        #if data[i] > 28000 and data[i + 48] > 28000 and data[i + 120] > threshold2: # and data[i + 165] > threshold1:
-        #if data[i] < -22000 and data[i + 40] > 20000 and data[i + 124] < -22000 and data[i + 146] < -22000:
-        #if data[i] < 0 and data[i + 37] < -30000 and data[i + 55] < -26000 and data[i + 78] < -24000:
-        #if data[i + 37] < -31000 and data[i + 55] < -26000 and data[i + 78] < -24000:
-        if data[i] < -20000 and data[i+1] > -20000: # and data[i + 78] < -24000:
-            data = data[i:]
-            start_sinchronize = i
-            #print("Синхронизация данных", i, len(data))
-            break 
-
-# В начале файла добавим константы для шагов DC
-DC_STEP_LARGE = 16    # Шаг для больших отклонений
-DC_STEP_MEDIUM = 4    # Шаг для средних отклонений
-DC_STEP_SMALL = 1      # Шаг для малых отклонений
-
-DC_THRESHOLD_HIGH = 10000  # Порог для больших отклонений
-DC_THRESHOLD_LOW = 3000    # Порог для малых отклонений
+    points = find_sync_points(data, -20000, 595)  # data[i] < -20000 and data[i+1] > -20000
+    if len(points):
+        start_sinchronize = int(points[0])
+    return start_sinchronize
 
 #high_level_mark = [420, 2380, 4296, 6200, 8104, 10058, 11976, 13880, 15784, 17738, 19654, 21558]  # Метки зон high
 #low_level_mark = [1460, 3342, 5239, 7137, 9137, 11020, 12915, 14813, 16816, 18697, 20594, 22493]  # Метки зон low
@@ -460,187 +410,51 @@ last_dc_save_time = time.time()  # Время последнего сохран
 THRESHOLD_SAVE_INTERVAL = 180  # 3 минуты в секундах
 last_threshold_save_time = time.time()
 
+# Файл снимка DC (4×200 float64, .npy); прежний dc_components.json читается, если снимка ещё нет
+DC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dc_components.npy')
+DC_FILE_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dc_components.json')
+
 def save_dc_components():
     """Сохранение DC составляющих в файл"""
-    global dc_P1_1, dc_P1_2, dc_L1_1, dc_L1_2
-    
     # Проверка, что DC компоненты имеют правильные значения
-    if len(dc_P1_1) == 0 or np.all(dc_P1_1 == 0):
+    if not np.any(dc_tracker.dc):
         print("Внимание: DC компоненты пусты или равны нулю, сохранение отменено")
         return False
-    
-    # Создаем копии массивов, чтобы избежать потери данных при сериализации
-    dc_data = {
-        'dc_P1_1': dc_P1_1.tolist(),
-        'dc_P1_2': dc_P1_2.tolist(),
-        'dc_L1_1': dc_L1_1.tolist(),
-        'dc_L1_2': dc_L1_2.tolist(),
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    
-    # Проверяем, что данные не пустые
-    if not dc_data['dc_P1_1'] or not dc_data['dc_P1_2'] or not dc_data['dc_L1_1'] or not dc_data['dc_L1_2']:
-        print("Ошибка: данные пусты, сохранение отменено")
-        return False
-    
-    # Используем абсолютный путь для гарантированного сохранения
-    dc_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dc_components.json')
-    
     try:
-        # Создаем временный файл и только потом переименовываем для атомарной операции
-        temp_file = dc_file_path + ".tmp"
-        with open(temp_file, 'w') as f:
-            json.dump(dc_data, f)
-        
-        # Если все успешно, переименовываем файл
-        os.replace(temp_file, dc_file_path)
-        
-        print(f"++++++++++++++++DC компоненты сохранены: {datetime.now().strftime('%H:%M:%S')}")
-        print(f"Путь к файлу: {dc_file_path}")
+        dc_tracker.save(DC_FILE)
+        print(f"++++++++++++++++DC компоненты сохранены: {datetime.now().strftime('%H:%M:%S')} → {DC_FILE}")
         print(f"Сохранены DC: P1_1 max={np.max(dc_P1_1):.1f}, P1_2 max={np.max(dc_P1_2):.1f}, L1_1 max={np.max(dc_L1_1):.1f}, L1_2 max={np.max(dc_L1_2):.1f}")
-        
-        # Проверяем, что файл действительно существует после сохранения
-        if os.path.exists(dc_file_path):
-            print(f"Файл успешно создан, размер: {os.path.getsize(dc_file_path)} байт")
-        else:
-            print(f"ОШИБКА: файл не создан после сохранения!")
-            
         return True
     except Exception as e:
         print(f"Ошибка при сохранении DC компонент: {e}")
-        import traceback
-        traceback.print_exc()
         return False
 
 def load_dc_components():
     """Загрузка DC составляющих из файла"""
-    global dc_P1_1, dc_P1_2, dc_L1_1, dc_L1_2
-    global dc_counter_P1_1, dc_counter_P1_2, dc_counter_L1_1, dc_counter_L1_2
-    global prev_direction_P1_1, prev_direction_P1_2, prev_direction_L1_1, prev_direction_L1_2
-    
-    # Используем абсолютный путь для гарантированного доступа
-    dc_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dc_components.json')
-    print(f"*** Пытаемся загрузить DC компоненты из файла: {dc_file_path}")
-    
+    print(f"*** Пытаемся загрузить DC компоненты из файла: {DC_FILE}")
     try:
-        # Проверяем существование файла
-        if not os.path.exists(dc_file_path):
-            print(f"Файл DC компонент не существует: {dc_file_path}")
-            return False
-        
-        # Проверяем, что файл не пуст
-        if os.path.getsize(dc_file_path) == 0:
-            print(f"Файл DC компонент пуст: {dc_file_path}")
-            return False
-            
-        # Открываем файл и загружаем данные
-        with open(dc_file_path, 'r') as f:
-            file_content = f.read()
-            print(f"Прочитано {len(file_content)} байт из файла")
-            
-            # Проверяем, что файл содержит JSON
-            if not file_content.strip().startswith('{'):
-                print(f"Файл не содержит JSON данных")
-                return False
-            
-            dc_data = json.loads(file_content)
-            print(f"JSON успешно загружен, timestamp: {dc_data.get('timestamp', 'не указан')}")
-            
-            # Загружаем DC компоненты
-            loaded_dc_P1_1 = np.array(dc_data['dc_P1_1'])
-            loaded_dc_P1_2 = np.array(dc_data['dc_P1_2'])
-            loaded_dc_L1_1 = np.array(dc_data['dc_L1_1'])
-            loaded_dc_L1_2 = np.array(dc_data['dc_L1_2'])
-            
-            # Проверяем размеры массивов
-            print(f"Размеры загруженных массивов: P1_1={len(loaded_dc_P1_1)}, P1_2={len(loaded_dc_P1_2)}, " 
-                  f"L1_1={len(loaded_dc_L1_1)}, L1_2={len(loaded_dc_L1_2)}")
-            
-            # Проверяем, что массивы не пустые и имеют нужную длину
-            if (len(loaded_dc_P1_1) == 200 and len(loaded_dc_P1_2) == 200 and
-                len(loaded_dc_L1_1) == 200 and len(loaded_dc_L1_2) == 200):
-                
-                # Проверяем, что массивы не содержат только нули
-                if not np.all(loaded_dc_P1_1 == 0):
-                    # ИСПРАВЛЕНИЕ: Используем np.copyto для обновления содержимого массива вместо создания нового
-                    np.copyto(dc_P1_1, loaded_dc_P1_1)
-                    np.copyto(dc_P1_2, loaded_dc_P1_2)
-                    np.copyto(dc_L1_1, loaded_dc_L1_1)
-                    np.copyto(dc_L1_2, loaded_dc_L1_2)
-                
-                    # Инициализируем счетчики для DC-адаптации
-                    dc_counter_P1_1.fill(5)  # Начинаем с уже накопленными счетчиками
-                    dc_counter_P1_2.fill(5)
-                    dc_counter_L1_1.fill(5)
-                    dc_counter_L1_2.fill(5)
-                    
-                    print(f"*** DC компоненты успешно загружены (сохранены: {dc_data['timestamp']})")
-                    print(f"Загружены DC: P1_1 max={np.max(dc_P1_1):.1f}, P1_2 max={np.max(dc_P1_2):.1f}, "
-                          f"L1_1 max={np.max(dc_L1_1):.1f}, L1_2 max={np.max(dc_L1_2):.1f}")
-                          
-                    # Проверяем, что данные действительно скопированы
-                    if np.max(dc_P1_1) > 0:
-                        print("Проверка успешна: данные не нулевые")
-                    else:
-                        print("ОШИБКА: данные нулевые после копирования")
-                        
-                    return True
-                else:
-                    print("Предупреждение: Загруженные DC компоненты содержат только нули, используются значения по умолчанию")
-            else:
-                print(f"Предупреждение: Неверная длина загруженных DC компонент: "
-                      f"P1_1={len(loaded_dc_P1_1)}, P1_2={len(loaded_dc_P1_2)}, "
-                      f"L1_1={len(loaded_dc_L1_1)}, L1_2={len(loaded_dc_L1_2)}")
-                
-    except FileNotFoundError:
-        print(f"Файл с DC компонентами не найден: {dc_file_path}")
-    except json.JSONDecodeError as e:
-        print(f"Ошибка декодирования JSON файла: {e}")
-        # Выводим содержимое файла для отладки
-        try:
-            with open(dc_file_path, 'r') as f:
-                print(f"Первые 100 символов файла: {f.read(100)}")
-        except:
-            pass
+        if dc_tracker.load(DC_FILE):
+            print(f"*** DC компоненты загружены (сохранены: {datetime.fromtimestamp(os.path.getmtime(DC_FILE)).strftime('%Y-%m-%d %H:%M:%S')})")
+            return True
+        # Снимка нет — пробуем прежний JSON
+        if os.path.exists(DC_FILE_JSON) and os.path.getsize(DC_FILE_JSON) > 0:
+            with open(DC_FILE_JSON, 'r') as f:
+                dc_data = json.load(f)
+            dc = np.array([dc_data[k] for k in ('dc_P1_1', 'dc_P1_2', 'dc_L1_1', 'dc_L1_2')], dtype=float)
+            if dc.shape == dc_tracker.dc.shape and np.any(dc[0]):
+                dc_tracker.set(dc)
+                print(f"*** DC компоненты загружены из {DC_FILE_JSON} (сохранены: {dc_data.get('timestamp', 'не указан')})")
+                return True
+            print(f"Предупреждение: неверная форма или нулевые DC компоненты в {DC_FILE_JSON}: {dc.shape}")
+        else:
+            print(f"Файл DC компонент не существует: {DC_FILE}")
     except Exception as e:
         print(f"Ошибка при загрузке DC компонент: {e}")
-        import traceback
-        traceback.print_exc()
-    
+
     # Если не удалось загрузить, инициализируем нулевыми значениями
     print("Используем нулевые значения для DC компонент")
     return False
 
-# Векторизованное обновление DC компонентов
-def update_dc_components(zone_data, dc_data, counter, prev_direction):
-    """Векторизованное обновление DC компонентов"""
-    # Вычисляем разности
-    diff = np.abs(zone_data - dc_data)
-    
-    # Определяем направления
-    current_direction = dc_data > zone_data
-    
-    # Обновляем счетчики
-    same_direction = current_direction == prev_direction
-    counter[same_direction] += 1
-    counter[~same_direction] = 1
-    prev_direction[~same_direction] = current_direction[~same_direction]
-    
-    # Определяем шаги
-    step = np.ones_like(diff)
-    step[diff > DC_THRESHOLD_HIGH] = DC_STEP_LARGE
-    step[(diff <= DC_THRESHOLD_HIGH) & (diff > DC_THRESHOLD_LOW)] = DC_STEP_MEDIUM
-    step[diff <= DC_THRESHOLD_LOW] = DC_STEP_SMALL
-    
-    # Умножаем на счетчики
-    step = step * counter
-    
-    # Обновляем DC компоненты
-    dc_data[current_direction] -= step[current_direction]
-    dc_data[~current_direction] += step[~current_direction]
-    
-    return dc_data, counter, prev_direction
-
 # Обновленная функция нормализации периодов
 def normalize_periods(periods):
     """Центрирует каждый период относительно нуля, убирая наклон"""
@@ -698,45 +512,14 @@ CROSS_CORRELATION_SHIFTS = 100  # Смещение в обе стороны (±1
 cross_correlation_update_counter = 0
 CROSS_CORRELATION_UPDATE_INTERVAL = 1  # Обновляем на каждой итерации
 
-# Функция для вычисления кросс-корреляции между суммами high_level и low_level
+# Функция для вычисления кросс-корреляции между суммами high_level и low_level.
+# Считаются только лаги ±max_shift (bmi30_dsp.CrossCorrelator: узкое окно — прямые
+# произведения, широкое — FFT), а не полная корреляция длины 2N-1 со срезом.
+correlator = CrossCorrelator(CROSS_CORRELATION_SHIFTS)
+
 def calculate_cross_correlation(high_level_data, low_level_data, max_shift=100):
-    """Оптимизированная версия расчета кросс-корреляции"""
-    # Проверка входных данных
-    if len(high_level_data) == 0 or len(low_level_data) == 0 or len(high_level_data) != len(low_level_data):
-        return np.zeros(2*max_shift+1)
-    
-    # Используем numpy.correlate для быстрого вычисления корреляции
-    # Это намного быстрее ручного расчета
-    data_length = len(high_level_data)
-    
-    # Нормализуем данные
-    high_norm = high_level_data - np.mean(high_level_data)
-    low_norm = low_level_data - np.mean(low_level_data)
-    
-    # Используем numpy.correlate с режимом 'full' для получения всех смещений
-    # Это намного эффективнее, чем вручную считать смещения в цикле
-    full_corr = np.correlate(high_norm, low_norm, mode='full')
-    
-    # Вырезаем интересующую нас часть корреляции
-    mid_point = len(full_corr) // 2
-    start_idx = mid_point - max_shift
-    end_idx = mid_point + max_shift + 1
-    
-    # Проверка границ
-    if start_idx < 0:
-        start_idx = 0
-    if end_idx > len(full_corr):
-        end_idx = len(full_corr)
-        
-    result = full_corr[start_idx:end_idx]
-    
-    # Если полученный результат не соответствует ожидаемой длине, дополняем его нулями
-    if len(result) < 2*max_shift+1:
-        padding = np.zeros(2*max_shift+1)
-        padding[:len(result)] = result
-        result = padding
-    
-    return result[:2*max_shift+1]
+    """Кросс-корреляция (входы без среднего), 2*max_shift+1 значений; центр — нулевой сдвиг"""
+    return correlator.correlate(high_level_data, low_level_data, max_shift)
 
 # Добавьте после объявления переменной cross_correlation_sum
 
@@ -756,11 +539,8 @@ def calculate_antiphase_correlation(high_level_data, low_level_data, max_shift=1
     Returns:
         Массив противофазной корреляции
     """
-    # Инвертируем low_level_data для поиска максимума противофазной корреляции
-    inverted_low_data = -low_level_data
-    
-    # Используем существующую функцию с инвертированными данными
-    return calculate_cross_correlation(high_level_data, inverted_low_data, max_shift)
+    # Корреляция с инвертированным low_level — та же кросс-корреляция с обратным знаком
+    return -calculate_cross_correlation(high_level_data, low_level_data, max_shift)
 
 # AC компоненты для суммированных зон
 ac_high_level = np.zeros(240)  # AC компонента high_level
@@ -796,14 +576,12 @@ correlation_sound_active = False  # Флаг активности звука п
 
 # Исправьте функцию audio_callback, добавив объявление глобальных переменных
 def audio_callback(in_data, frame_count, time_info, status):
-    global dataADC_P1, dataADC_L1, start_sinchronize, last_dc_save_time
+    global dataADC_P1, dataADC_L1, start_sinchronize, data_seq, last_dc_save_time
     global zone_P1_1, zone_P1_2, zone_L1_1, zone_L1_2
-    global dc_P1_1, dc_P1_2, dc_L1_1, dc_L1_2, ac_P1_1, ac_P1_2, ac_L1_1, ac_L1_2
+    global ac_P1_1, ac_P1_2, ac_L1_1, ac_L1_2
     global sum_P1_1, sum_P1_2, sum_L1_1, sum_L1_2
-    global diff_history_P1, diff_history_L1, diff_sum_P1, diff_sum_L1, history_index
+    global diff_history_P1, diff_history_L1, diff_sum_P1, diff_sum_L1
     global max_sample_index_P1, max_sample_index_L1, max_count_P1, max_count_L1
-    global dc_counter_P1_1, dc_counter_P1_2, dc_counter_L1_1, dc_counter_L1_2
-    global prev_direction_P1_1, prev_direction_P1_2, prev_direction_L1_1, prev_direction_L1_2
     global sum_high_level_shifted, sum_low_level_shifted
     global zone_sum_update_counter
     global periods_P1_1, periods_P1_2, periods_L1_1, periods_L1_2
@@ -820,6 +598,7 @@ def audio_callback(in_data, frame_count, time_info, status):
     new_data = np.frombuffer(in_data, dtype=np.int16).reshape(-1, 2)
     dataADC_P1 = np.concatenate((dataADC_P1[-CHUNK:], new_data[:, 0]))
     dataADC_L1 = np.concatenate((dataADC_L1[-CHUNK:], new_data[:, 1]))
+    data_seq += 1
     
     if len(dataADC_L1) > CHUNK:
         synchronize_data(dataADC_P1)
@@ -837,40 +616,19 @@ def audio_callback(in_data, frame_count, time_info, status):
                 zone_L1_1 = dataADC_L1[350:550].copy()
                 zone_L1_2 = dataADC_L1[1320:1520].copy()
                 
-                # Накопление DC для обеих зон с переменным шагом
-                dc_P1_1, dc_counter_P1_1, prev_direction_P1_1 = update_dc_components(
-                    zone_P1_1, dc_P1_1, dc_counter_P1_1, prev_direction_P1_1
-                )
-                dc_P1_2, dc_counter_P1_2, prev_direction_P1_2 = update_dc_components(
-                    zone_P1_2, dc_P1_2, dc_counter_P1_2, prev_direction_P1_2
-                )
-                dc_L1_1, dc_counter_L1_1, prev_direction_L1_1 = update_dc_components(
-                    zone_L1_1, dc_L1_1, dc_counter_L1_1, prev_direction_L1_1
-                )
-                dc_L1_2, dc_counter_L1_2, prev_direction_L1_2 = update_dc_components(
-                    zone_L1_2, dc_L1_2, dc_counter_L1_2, prev_direction_L1_2
-                )
-                
-                # Вычисление переменных составляющих для обеих зон
-                ac_P1_1 = zone_P1_1 - dc_P1_1
-                ac_P1_2 = zone_P1_2 - dc_P1_2
-                ac_L1_1 = zone_L1_1 - dc_L1_1
-                ac_L1_2 = zone_L1_2 - dc_L1_2
+                # Накопление DC всех зон с переменным шагом (один проход по 4×200)
+                # и переменные составляющие относительно обновлённого DC
+                ac_P1_1, ac_P1_2, ac_L1_1, ac_L1_2 = dc_tracker.update(
+                    (zone_P1_1, zone_P1_2, zone_L1_1, zone_L1_2))
 
                 # Вычисление разностных сигналов и их накопление
                 current_diff_P1 = ac_P1_1 - ac_P1_2  # Разность AC сигналов верхней антенны
                 current_diff_L1 = ac_L1_1 - ac_L1_2  # Разность AC сигналов нижней антенны
                 
-                # Сохраняем текущие разности в историю
-                diff_history_P1[history_index] = current_diff_P1
-                diff_history_L1[history_index] = current_diff_L1
-                
-                # Обновляем индекс истории
-                history_index = (history_index + 1) % 6
-                
-                # Вычисляем суммы по всей истории
-                diff_sum_P1 = np.sum(diff_history_P1, axis=0)
-                diff_sum_L1 = np.sum(diff_history_L1, axis=0)
+                # Сохраняем текущие разности в историю; сумма по истории обновляется
+                # добавлением новой и вычитанием вытесненной строки (копия — для графиков)
+                diff_sum_P1 = diff_history_P1.add(current_diff_P1).copy()
+                diff_sum_L1 = diff_history_L1.add(current_diff_L1).copy()
 
                 # После вычисления diff_sum_P1 и diff_sum_L1
                 # Поиск максимумов по модулю и подсчет повторений
@@ -926,14 +684,14 @@ def audio_callback(in_data, frame_count, time_info, status):
 
                     # Обновляем только если данные изменились существенно
                     if abs(current_high_hash - prev_high_hash) > 1000 or prev_high_sum is None:
-                        sum_high_level_shifted = sum_zones_with_shifts_fast(dataADC_L1, high_level_mark, 240, 10)
+                        sum_high_level_shifted = sum_zones_with_shifts_fast(dataADC_L1, high_level_mark, 240, 10, seq=data_seq)
                         prev_high_hash = current_high_hash
                         prev_high_sum = sum_high_level_shifted
                     else:
                         sum_high_level_shifted = prev_high_sum
 
                     if abs(current_low_hash - prev_low_hash) > 1000 or prev_low_sum is None:
-                        sum_low_level_shifted = sum_zones_with_shifts_fast(dataADC_L1, low_level_mark, 240, 10)
+                        sum_low_level_shifted = sum_zones_with_shifts_fast(dataADC_L1, low_level_mark, 240, 10, seq=data_seq)
                         prev_low_hash = current_low_hash
                         prev_low_sum = sum_low_level_shifted
                     else:
@@ -946,29 +704,12 @@ def audio_callback(in_data, frame_count, time_info, status):
                 ac_low_level = extract_ac_component(sum_low_level_shifted)
 
 
-                # Кэширование результатов для повышения производительности
-                last_high_hash = 0
-                last_low_hash = 0
-                last_correlation_result = None
-
-                # Вычисляем хэши текущих данных
-                current_high_hash = hash(tuple(sum_high_level_shifted))
-                current_low_hash = hash(tuple(sum_low_level_shifted))
-
-                # Используем кэшированный результат, если данные не изменились
-                if current_high_hash == last_high_hash and current_low_hash == last_low_hash and last_correlation_result is not None:
-                    cross_correlation_sum = last_correlation_result
-                else:
-                    # Вычисляем кросс-корреляцию только если данные изменились
-                    cross_correlation_sum = calculate_cross_correlation(
-                        ac_high_level, ac_low_level, CROSS_CORRELATION_SHIFTS)
-                    last_correlation_result = cross_correlation_sum
-                    last_high_hash = current_high_hash
-                    last_low_hash = current_low_hash
-
-                # Вычисляем противофазную корреляцию между AC компонентами high и low зон
-                antiphase_correlation_sum = calculate_antiphase_correlation(
-                    ac_high_level, ac_low_level, CROSS_CORRELATION_SHIFTS)
+                # Кросс-корреляция AC компонент и противофазная (та же с обратным знаком).
+                # Метки версий — хэши зон, по которым суммы последний раз пересчитывались:
+                # пока суммы не менялись, берётся сохранённый результат
+                cross_correlation_sum, antiphase_correlation_sum = correlator.pair(
+                    ac_high_level, ac_low_level, CROSS_CORRELATION_SHIFTS,
+                    key_a=prev_high_hash, key_b=prev_low_hash)
 
                 if current_oscilloscope == 23:  # Отображаем на графике 23
                     max_idx = np.argmax(cross_correlation_sum)
@@ -1255,7 +996,9 @@ plt.show()
 
 # Используйте асинхронное сохранение в файлы:
 def async_save_dc_components():
-    threading.Thread(target=save_dc_components).start()
+    # Копия DC снимается здесь, файл пишется в фоновом потоке DCTracker
+    if np.any(dc_tracker.dc):
+        dc_tracker.save_async(DC_FILE, on_error=lambda e: print(f"Ошибка при сохранении DC компонент: {e}"))
 
 
 # Конфигурируем pwm
@@ -1498,7 +1241,8 @@ try:
             adaptive_correlation_threshold,
             correlation_detection_count,
             correlation_detection_threshold,
-            CROSS_CORRELATION_SHIFTS
+            CROSS_CORRELATION_SHIFTS,
+            data_seq=data_seq
             )
         if not continue_loop:
             break
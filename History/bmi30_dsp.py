@@ -0,0 +1,581 @@
+import os
+import threading
+import time
+import numpy as np
+
+
+# Векторные помощники конвейера детектирования (BMI30.*, BMI140.*): только numpy,
+# без pyaudio/GPIO, поэтому их можно гонять отдельно (python bmi30_dsp.py — замеры).
+
+
+# Поиск всех точек синхронизации (начал периодов) за один проход:
+# data[i] < level и data[i+1] > level, как в цикле synchronize_data,
+# i — не ближе tail семплов к концу буфера (чтобы за точкой поместился период).
+def find_sync_points(data, level=-20000, tail=595):
+    n = len(data) - tail
+    if n <= 0:
+        return np.zeros(0, dtype=np.intp)
+    below = data[:n] < level
+    above = data[1:n + 1] > level
+    return np.flatnonzero(below & above)
+
+
+# Окна [start+offset, start+offset+length) для всех начал периодов сразу: (..., k, length).
+# Один fancy-index по sliding_window_view; окна, вылезающие за буфер, отбрасываются.
+# x может быть многоканальным (..., n) — например data.T из (n, 2) стерео.
+def period_windows(x, starts, offset, length):
+    st = np.asarray(starts, dtype=np.intp) + offset
+    st = st[(st >= 0) & (st + length <= x.shape[-1])]
+    return np.lib.stride_tricks.sliding_window_view(x, length, axis=-1)[..., st, :]
+
+
+# Скользящая сумма последних depth строк (история периодов, разностей и т.п.):
+# add() кладёт строку на место самой старой, к total прибавляет новую и вычитает
+# вытесненную — O(размер строки) независимо от depth. Для float раз в resync
+# добавлений total пересчитывается целиком, чтобы не копилась ошибка округления.
+class MovingSum:
+    def __init__(self, shape, depth, dtype=np.float64, resync=1024):
+        self.depth = max(1, int(depth))
+        shape = (shape,) if isinstance(shape, (int, np.integer)) else tuple(shape)
+        self.rows = np.zeros((self.depth,) + shape, dtype=dtype)
+        self.total = np.zeros(self.rows.shape[1:], dtype=dtype)
+        self.count = 0             # сколько строк реально в истории (<= depth)
+        self.pos = 0               # куда ляжет следующая строка
+        self._exact = np.issubdtype(self.rows.dtype, np.integer)
+        self._resync = max(1, int(resync))
+        self._adds = 0
+
+    def reset(self):
+        self.rows[...] = 0
+        self.total[...] = 0
+        self.count = 0
+        self.pos = 0
+        self._adds = 0
+
+    def add(self, row):
+        slot = self.rows[self.pos:self.pos + 1]   # срез, а не элемент — работает и для скалярных строк
+        self.total -= slot[0]
+        slot[0] = row
+        self.total += slot[0]
+        self.pos = (self.pos + 1) % self.depth
+        self.count = min(self.count + 1, self.depth)
+        self._adds += 1
+        if not self._exact and self._adds >= self._resync:
+            self.rows.sum(axis=0, out=self.total)
+            self._adds = 0
+        return self.total
+
+    # Среднее по накопленным строкам (до заполнения — по тем, что есть)
+    def mean(self):
+        return self.total / max(1, self.count)
+
+    # Строки от самой старой к самой новой (копия — для графиков)
+    def ordered(self):
+        if self.count < self.depth:
+            return self.rows[:self.count].copy()
+        return np.roll(self.rows, -self.pos, axis=0)
+
+
+# Усреднение окон по периодам с накоплением между чанками:
+# add() суммирует все окна чанка одной редукцией, суммы последних depth чанков
+# копятся в MovingSum, так что глубина усреднения не влияет на стоимость add().
+# depth=1 — среднее по одному чанку.
+class PeriodAverager:
+    def __init__(self, length=240, offset=0, depth=1):
+        self.length = length
+        self.offset = offset
+        self.depth = max(1, int(depth))
+        self._sum = None                                   # суммы окон по чанкам (форма — по первому add)
+        self._cnt = MovingSum((), self.depth, np.int64)    # число окон по чанкам
+
+    @property
+    def total(self):
+        return None if self._sum is None else self._sum.total
+
+    @property
+    def count(self):
+        return int(self._cnt.total)
+
+    def reset(self):
+        self._sum = None
+        self._cnt.reset()
+
+    def add(self, x, starts):
+        w = period_windows(x, starts, self.offset, self.length)
+        s = w.sum(axis=-2, dtype=np.int64)
+        if self._sum is None or self._sum.total.shape != s.shape:
+            self._sum = MovingSum(s.shape, self.depth, np.int64)
+            self._cnt.reset()
+        self._sum.add(s)
+        self._cnt.add(w.shape[-2])
+        return w.shape[-2]
+
+    # Среднее, округлённое как np.round(np.mean(..., axis=0)).astype(int); None — окон нет
+    def mean(self):
+        if not self.count:
+            return None
+        return np.round(self.total / self.count).astype(int)
+
+
+# Сумма зон со сдвигами (то же, что sum_zones_with_shifts_fast): к суммарной зоне S
+# прибавлены её копии, сдвинутые на 1..shifts_range вправо и на 1..2*shifts_range-1 влево
+# (так в исходных циклах), т.е. result[j] = сумма S[m] по m в [j-shifts_range, j+2*shifts_range).
+# Это свёртка S с прямоугольным ядром — одна разность кумулятивных сумм вместо
+# зоны × сдвиги Python-итераций. Для целых данных результат совпадает бит в бит.
+def sum_zones_shifted(data, zone_marks, zone_length=240, shifts_range=10):
+    marks = np.asarray(zone_marks, dtype=np.intp)
+    zones = period_windows(data, marks[marks + zone_length <= len(data)], 0, zone_length)
+    if not zones.shape[0]:
+        return np.zeros(zone_length)
+    c = np.zeros(zone_length + 1, dtype=np.result_type(zones.dtype, np.int64))
+    np.cumsum(zones.sum(axis=0), out=c[1:])
+    j = np.arange(zone_length)
+    hi = np.minimum(zone_length, j + max(1, 2 * shifts_range))   # при shifts_range=0 — только сама S
+    return (c[hi] - c[np.maximum(0, j - shifts_range)]).astype(np.float64)
+
+
+# Маленький LRU-кэш результатов по дешёвому ключу (номер буфера, параметры) —
+# вместо хэширования содержимого буфера на каждом вызове
+class LRUCache:
+    def __init__(self, maxsize=8):
+        from collections import OrderedDict
+        self.maxsize = max(1, int(maxsize))
+        self._d = OrderedDict()
+
+    def get(self, key):
+        v = self._d.get(key)
+        if v is not None:
+            self._d.move_to_end(key)
+        return v
+
+    def put(self, key, value):
+        self._d[key] = value
+        self._d.move_to_end(key)
+        while len(self._d) > self.maxsize:
+            self._d.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._d.clear()
+
+
+# Кросс-корреляция только в окне лагов ±max_shift (как calculate_cross_correlation:
+# corr[max_shift + l] = sum(a[n + l] * b[n]), входы без среднего). Противофазная
+# корреляция — та же с обратным знаком, отдельно не считается.
+#   direct — np.correlate(..., 'valid') по входу, дополненному нулями на max_shift:
+#            ровно 2*max_shift+1 скалярных произведений вместо 2N-1 (выгодно при узком окне);
+#   fft    — rfft/irfft длины >= N + max_shift (выгодно при широком окне и длинных зонах).
+# method='auto' выбирает по оценке числа операций. key_a/key_b — необязательные метки
+# версий входов: если метка не изменилась, берётся сохранённый результат/спектр этой стороны
+# (пересчитывается только то, что поменялось).
+class CrossCorrelator:
+    def __init__(self, max_shift=100, method='auto', demean=True):
+        self.max_shift = int(max_shift)
+        self.method = method
+        self.demean = demean
+        self._keys = (None, None)
+        self._spec = [None, None]     # (key, nfft, rfft) по сторонам
+        self._last = None
+
+    def _pick(self, n, s):
+        if self.method in ('direct', 'fft'):
+            return self.method
+        nfft = 1 << int(np.ceil(np.log2(n + s + 1)))
+        return 'direct' if (2 * s + 1) * n <= 12 * nfft * np.log2(nfft) else 'fft'
+
+    def _rfft(self, side, key, x, nfft):
+        c = self._spec[side]
+        if key is not None and c is not None and c[0] == key and c[1] == nfft:
+            return c[2]
+        f = np.fft.rfft(x, nfft)
+        self._spec[side] = (key, nfft, f)
+        return f
+
+    def correlate(self, a, b, max_shift=None, key_a=None, key_b=None):
+        s = self.max_shift if max_shift is None else int(max_shift)
+        n = len(a)
+        if n == 0 or len(b) != n:
+            return np.zeros(2 * s + 1)
+        if key_a is not None and key_b is not None and self._keys == (key_a, key_b) \
+                and self._last is not None and len(self._last) == 2 * s + 1:
+            return self._last
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        if self.demean:
+            a = a - a.mean()
+            b = b - b.mean()
+        out = np.zeros(2 * s + 1)
+        k = min(s, n - 1)                  # лаги дальше длины зоны — нули
+        if self._pick(n, k) == 'direct':
+            ap = np.zeros(n + 2 * k)
+            ap[k:k + n] = a
+            out[s - k:s + k + 1] = np.correlate(ap, b, mode='valid')
+        else:
+            nfft = 1 << int(np.ceil(np.log2(n + k + 1)))
+            r = np.fft.irfft(self._rfft(0, key_a, a, nfft) * np.conj(self._rfft(1, key_b, b, nfft)), nfft)
+            out[s:s + k + 1] = r[:k + 1]
+            if k:
+                out[s - k:s] = r[nfft - k:]
+        self._keys = (key_a, key_b)
+        self._last = out
+        return out
+
+    # (корреляция, противофазная корреляция) — вторая просто -первая
+    def pair(self, a, b, max_shift=None, key_a=None, key_b=None):
+        c = self.correlate(a, b, max_shift, key_a, key_b)
+        return c, -c
+
+
+# Следящие DC всех зон сразу: строки dc — зоны (P1_1, P1_2, L1_1, L1_2 и т.п.), столбцы — семплы.
+# Правило то же, что у update_dc_components: DC шагает к сигналу на step * counter, где step
+# выбирается по |zone - dc| (steps[0] до thresholds[0], steps[1] до thresholds[1], дальше steps[2]),
+# а counter растёт, пока направление шага не меняется, и сбрасывается в 1 при смене направления.
+# update() — один проход по всему (zones, length) массиву, все промежуточные буферы
+# преаллоцированы; dc меняется на месте, поэтому виды на его строки остаются актуальными.
+# Снимок — компактный .npy (только dc, как tab_DC.npy); save_async() копирует dc в вызывающем
+# потоке и пишет файл (через .tmp + os.replace) в фоновом, не задерживая audio_callback.
+class DCTracker:
+    def __init__(self, zones, length, thresholds=(3000, 10000), steps=(1, 4, 16), counter_on_load=5):
+        shape = (int(zones), int(length))
+        self.thresholds = thresholds
+        self.steps = steps
+        self.counter_on_load = counter_on_load
+        self.dc = np.zeros(shape)
+        self.counter = np.ones(shape)
+        self.direction = np.zeros(shape, dtype=bool)     # True — DC выше сигнала (шаг вниз)
+        self._z = np.empty(shape)
+        self._d = np.empty(shape)
+        self._step = np.empty(shape)
+        self._cur = np.empty(shape, dtype=bool)
+        self._mask = np.empty(shape, dtype=bool)
+        self._saving = None
+        self.saved_t = None
+
+    # zones — (zones, length) или последовательность строк; возвращает AC = zone - dc (новый массив)
+    def update(self, zones):
+        z = self._z
+        if isinstance(zones, np.ndarray) and zones.shape == z.shape:
+            np.copyto(z, zones)
+        else:
+            np.stack(zones, out=z)
+        d, st, cur, m = self._d, self._step, self._cur, self._mask
+        np.subtract(z, self.dc, out=d)
+        np.less(d, 0, out=cur)                         # dc > zone
+        np.equal(cur, self.direction, out=m)
+        self.counter += 1
+        np.logical_not(m, out=m)
+        np.copyto(self.counter, 1.0, where=m)          # смена направления — счётчик с 1
+        np.copyto(self.direction, cur)
+        np.abs(d, out=d)
+        st.fill(self.steps[0])
+        np.copyto(st, self.steps[1], where=np.greater(d, self.thresholds[0], out=m))
+        np.copyto(st, self.steps[2], where=np.greater(d, self.thresholds[1], out=m))
+        st *= self.counter
+        np.negative(st, out=st, where=cur)
+        self.dc += st
+        return z - self.dc
+
+    def save(self, path, dc=None):
+        dc = self.dc.copy() if dc is None else dc
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, dc)
+        os.replace(tmp, path)
+        self.saved_t = time.time()
+        return True
+
+    # Сохранение в фоне; False — предыдущее ещё пишется (снимок пропущен)
+    def save_async(self, path, on_error=None):
+        th = self._saving
+        if th is not None and th.is_alive():
+            return False
+        dc = self.dc.copy()
+        def _run():
+            try:
+                self.save(path, dc)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+        self._saving = threading.Thread(target=_run, name='dc-save', daemon=True)
+        self._saving.start()
+        return True
+
+    # Дождаться фонового сохранения (перед выходом)
+    def join(self, timeout=None):
+        th = self._saving
+        if th is not None:
+            th.join(timeout)
+
+    # Загрузка снимка: False — файла нет, форма не та или все нули (dc не трогается)
+    def load(self, path):
+        if not os.path.exists(path):
+            return False
+        dc = np.load(path)
+        if dc.shape != self.dc.shape or not np.any(dc):
+            return False
+        self.set(dc)
+        return True
+
+    # Задать DC извне (например, из старого JSON); счётчики — как после накопления
+    def set(self, dc):
+        np.copyto(self.dc, dc)
+        self.counter.fill(self.counter_on_load)
+
+
+# Амплитудный спектр как в calculate_spectrum (bmi30_plt): |rfft(окно · (x - mean))| с дополнением
+# нулями до n_fft (n_fft_short для сигналов короче short_below), только бины f_min <= f <= f_max.
+# rfft вместо комплексного fft; окна — по длине, оси частот и срезы полосы — по (n_fft, fs, f_min, f_max)
+# считаются один раз; готовые результаты — в LRUCache (вытесняется самый старый, а не весь кэш).
+# welch() — средняя мощность по последовательным кадрам одной длины (frames — (k, n)) одним rfft.
+class SpectrumAnalyzer:
+    def __init__(self, window=np.blackman, n_fft=32768, n_fft_short=8192, short_below=4096, cache=20):
+        self.window = window
+        self.n_fft = n_fft
+        self.n_fft_short = n_fft_short
+        self.short_below = short_below
+        self.cache = LRUCache(cache)
+        self._windows = LRUCache(8)
+        self._bands = LRUCache(8)
+
+    def _window(self, n):
+        w = self._windows.get(n)
+        if w is None:
+            w = self.window(n)
+            self._windows.put(n, w)
+        return w
+
+    # (частоты полосы, срез бинов полосы) для n_fft; бин Найквиста не входит, как у fft[:n_fft // 2]
+    def band(self, n_fft, fs, f_min, f_max):
+        key = (n_fft, fs, f_min, f_max)
+        b = self._bands.get(key)
+        if b is None:
+            freqs = np.fft.rfftfreq(n_fft, d=1 / fs)[:n_fft // 2]
+            idx = np.flatnonzero((freqs >= f_min) & (freqs <= f_max))
+            sl = slice(int(idx[0]), int(idx[-1]) + 1) if len(idx) else slice(0, 0)
+            b = (freqs[sl], sl)
+            self._bands.put(key, b)
+        return b
+
+    # Кэш — по ключу вызывающего (номер буфера/версия данных, как seq у sum_zones_with_shifts_fast),
+    # а не по хэшу содержимого; без key результат не кэшируется.
+    def spectrum(self, data, fs, f_min, f_max, key=None):
+        if len(data) == 0:
+            return np.array([0]), np.array([0])
+        if key is not None:
+            key = (key, len(data), fs, f_min, f_max)
+            res = self.cache.get(key)
+            if res is not None:
+                return res
+        n_fft = self.n_fft_short if len(data) < self.short_below else self.n_fft
+        freqs, sl = self.band(n_fft, fs, f_min, f_max)
+        spec = np.abs(np.fft.rfft((data - np.mean(data)) * self._window(len(data)), n=n_fft)[sl])
+        res = (freqs, spec)
+        if key is not None:
+            self.cache.put(key, res)
+        return res
+
+    def welch(self, frames, fs, f_min, f_max):
+        frames = np.asarray(frames, dtype=np.float64)
+        n = frames.shape[-1]
+        n_fft = self.n_fft_short if n < self.short_below else self.n_fft
+        freqs, sl = self.band(n_fft, fs, f_min, f_max)
+        x = frames - frames.mean(axis=-1, keepdims=True)
+        f = np.fft.rfft(x * self._window(n), n=n_fft, axis=-1)[..., sl]
+        return freqs, np.mean(f.real ** 2 + f.imag ** 2, axis=0)
+
+
+# Прежний цикл synchronize_data (эталон для сравнения и замера)
+def _sync_loop(data, level=-20000, tail=595):
+    for i in range(len(data) - tail):
+        if data[i] < level and data[i + 1] > level:
+            return i
+    return None
+
+
+# Прежнее накопление окон в BMI140 callback (эталон)
+def _vstack_means(x, starts, offset, length):
+    values = np.empty((0, length), dtype=np.int64)
+    for start in starts:
+        if start + offset + length <= len(x):
+            values = np.vstack((values, x[start + offset:start + offset + length]))
+    return np.round(np.mean(values, axis=0)).astype(int)
+
+
+# Прежнее тело sum_zones_with_shifts_fast без кэша (эталон)
+def _sum_zones_loops(data, zone_marks, zone_length=240, shifts_range=10):
+    sum_result = np.zeros(zone_length)
+    valid_zones = [data[s:s + zone_length] for s in zone_marks if s + zone_length <= len(data)]
+    if not valid_zones:
+        return sum_result
+    zones_array = np.array(valid_zones)
+    sum_result += np.sum(zones_array, axis=0)
+    for shift in range(1, shifts_range + 1):
+        for zone in zones_array:
+            sum_result[shift:] += zone[:zone_length - shift]
+    for shift in range(1, shifts_range + shifts_range):
+        for zone in zones_array:
+            sum_result[:zone_length - shift] += zone[shift:]
+    return sum_result
+
+
+# Прежний update_dc_components (эталон), вызывается на каждую зону отдельно
+def _update_dc_loop(zone_data, dc_data, counter, prev_direction, thresholds=(3000, 10000), steps=(1, 4, 16)):
+    diff = np.abs(zone_data - dc_data)
+    current_direction = dc_data > zone_data
+    same_direction = current_direction == prev_direction
+    counter[same_direction] += 1
+    counter[~same_direction] = 1
+    prev_direction[~same_direction] = current_direction[~same_direction]
+    step = np.ones_like(diff)
+    step[diff > thresholds[1]] = steps[2]
+    step[(diff <= thresholds[1]) & (diff > thresholds[0])] = steps[1]
+    step[diff <= thresholds[0]] = steps[0]
+    step = step * counter
+    dc_data[current_direction] -= step[current_direction]
+    dc_data[~current_direction] += step[~current_direction]
+    return dc_data, counter, prev_direction
+
+
+# Прежний calculate_spectrum без кэша (эталон): комплексный fft, окно на каждом вызове
+def _spectrum_fft(data, fs, f_min, f_max):
+    n_fft = 32768 if len(data) >= 4096 else 8192
+    spectrum = np.abs(np.fft.fft((data - np.mean(data)) * np.blackman(len(data)), n=n_fft)[:n_fft // 2])
+    freqs = np.fft.fftfreq(n_fft, d=1 / fs)[:n_fft // 2]
+    valid = (freqs >= f_min) & (freqs <= f_max)
+    return freqs[valid], spectrum[valid]
+
+
+# Прежний calculate_cross_correlation (эталон): полная корреляция и срез ±max_shift
+def _correlate_full(h, l, max_shift=100):
+    full = np.correlate(h - np.mean(h), l - np.mean(l), mode='full')
+    mid = len(full) // 2
+    return full[mid - max_shift:mid + max_shift + 1]
+
+
+def _bench(fn, *args, repeat=20):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        res = fn(*args)
+    return res, (time.perf_counter() - t0) / repeat
+
+
+if __name__ == '__main__':
+    # Синтетический буфер как в audio_callback: 2×CHUNK семплов, период ~1910 семплов
+    CHUNK = 22990
+    rng = np.random.default_rng(0)
+    t = np.arange(2 * CHUNK)
+    data = (30000 * np.sign(np.sin(2 * np.pi * t / 1910.0)) + rng.normal(0, 300, len(t))).astype(int)
+    data[:1500] = -30000    # синхронизация не в самом начале — цикл проходит по пути больше семплов
+
+    first, t_loop = _bench(_sync_loop, data)
+    pts, t_vec = _bench(find_sync_points, data)
+    assert first == (pts[0] if len(pts) else None)
+    print(f"synchronize_data (цикл):  {t_loop * 1e3:8.3f} мс, первая точка {first}")
+    print(f"find_sync_points:         {t_vec * 1e6:8.1f} мкс, все точки: {len(pts)} шт. ({pts[:4]}…)")
+    # худший случай: синхронизации нет, цикл проходит весь буфер
+    flat = np.full(2 * CHUNK, -30000)
+    _, t_loop = _bench(_sync_loop, flat, repeat=3)
+    _, t_vec = _bench(find_sync_points, flat)
+    print(f"без синхронизации: цикл {t_loop * 1e3:.1f} мс, find_sync_points {t_vec * 1e6:.1f} мкс")
+
+    # Зоны фронта/спада BMI140 (оба канала): 4 прежних vstack-цикла против двух PeriodAverager
+    x = np.stack((data[:23040], data[1:23041]))
+    starts = find_sync_points(x[1], 0, 35)
+    def _old():
+        return [_vstack_means(x[c], starts, off, 240) for off in (320, 1280) for c in (0, 1)]
+    ref, t_old = _bench(_old)
+    for depth in (1, 100):
+        front, spad = PeriodAverager(240, 320, depth), PeriodAverager(240, 1280, depth)
+        def _new():
+            front.add(x, starts)
+            spad.add(x, starts)
+            return front.mean(), spad.mean()
+        (mf, ms), t_new = _bench(_new, repeat=200)
+        if depth == 1:
+            assert all(np.array_equal(a, b) for a, b in zip(ref, (mf[0], mf[1], ms[0], ms[1])))
+        print(f"окна {len(starts)} периодов × 4: vstack {t_old * 1e3:.3f} мс, PeriodAverager(depth={depth}) {t_new * 1e3:.3f} мс")
+
+    # История разностей audio_callback (строки по 200): np.sum по всей истории против MovingSum
+    rows = rng.normal(0, 1000, (1000, 200))
+    for depth in (6, 600):
+        hist = np.zeros((depth, 200)); idx = [0]
+        def _old_sum(r=rows[0]):
+            hist[idx[0]] = r
+            idx[0] = (idx[0] + 1) % depth
+            return np.sum(hist, axis=0)
+        ms = MovingSum(200, depth)
+        _, t_old = _bench(_old_sum, repeat=200)
+        _, t_new = _bench(ms.add, rows[0], repeat=200)
+        print(f"история {depth}×200: np.sum {t_old * 1e6:.1f} мкс, MovingSum.add {t_new * 1e6:.1f} мкс")
+    ms = MovingSum(200, 6, resync=100)
+    for r in rows:
+        ms.add(r)
+    assert np.allclose(ms.total, rows[-6:].sum(axis=0))
+
+    # Суммы зон со сдвигами (метки high_level_mark из BMI30.059.21)
+    marks = [330, 2285, 4206, 6110, 8014, 9965, 11885, 13790, 15693, 17645, 19563, 21467]
+    ref, t_old = _bench(_sum_zones_loops, data, marks, 240, 10)
+    res, t_new = _bench(sum_zones_shifted, data, marks, 240, 10, repeat=200)
+    assert np.array_equal(ref, res) and res.dtype == ref.dtype
+    for R in (0, 1, 50, 120):   # при 2*R-1 > zone_length исходные циклы падают на срезах
+        assert np.array_equal(_sum_zones_loops(data, marks, 240, R), sum_zones_shifted(data, marks, 240, R))
+    print(f"суммы зон со сдвигами: циклы {t_old * 1e3:.2f} мс, sum_zones_shifted {t_new * 1e6:.1f} мкс (совпадают бит в бит)")
+
+    # Корреляция AC-компонент сумм зон (240 семплов, ±100): полная + повтор для противофазной
+    h = sum_zones_shifted(data, marks, 240, 10)
+    l = sum_zones_shifted(data, [m + 1040 for m in marks], 240, 10)
+    ref_c = _correlate_full(h, l, 100)
+    ref_a = _correlate_full(h, -l, 100)
+    _, t_old = _bench(lambda: (_correlate_full(h, l, 100), _correlate_full(h, -l, 100)), repeat=200)
+    for method in ('direct', 'fft', 'auto'):
+        cc = CrossCorrelator(100, method)
+        (c, a), t_new = _bench(cc.pair, h, l, repeat=200)
+        assert np.allclose(c, ref_c, rtol=1e-9, atol=1e-6 * np.abs(ref_c).max())
+        assert np.allclose(a, ref_a, rtol=1e-9, atol=1e-6 * np.abs(ref_c).max())
+        print(f"корреляция ±100 по 240: correlate(full)×2 {t_old * 1e6:.0f} мкс, CrossCorrelator[{method}] {t_new * 1e6:.0f} мкс")
+    # широкое окно по длинным зонам — тут выигрывает FFT
+    h2 = data[:8192].astype(float); l2 = data[5:8197].astype(float)
+    _, t_old = _bench(_correlate_full, h2, l2, 2000, repeat=5)
+    for method in ('direct', 'fft', 'auto'):
+        cc = CrossCorrelator(2000, method)
+        c, t_new = _bench(cc.correlate, h2, l2, repeat=5)
+        assert np.allclose(c, _correlate_full(h2, l2, 2000), atol=1e-6 * np.abs(c).max())
+        print(f"корреляция ±2000 по 8192: correlate(full) {t_old * 1e3:.2f} мс, CrossCorrelator[{method}] {t_new * 1e3:.2f} мс")
+
+    # DC четырёх зон по 200 семплов: 4 вызова прежней функции против одного DCTracker.update
+    offs = ((0, 365), (0, 1320), (1, 350), (1, 1320))
+    frames = [[x[c, o + 40 * k:o + 40 * k + 200] for c, o in offs] for k in range(50)]
+    tr = DCTracker(4, 200)
+    dc = [np.zeros(200) for _ in offs]; cnt = [np.ones(200) for _ in offs]; dirs = [np.zeros(200, bool) for _ in offs]
+    t_old = t_new = 0.0
+    for zs in frames:
+        t0 = time.perf_counter()
+        for i, z in enumerate(zs):
+            _update_dc_loop(z, dc[i], cnt[i], dirs[i])
+        t1 = time.perf_counter()
+        ac = tr.update(zs)
+        t_new += time.perf_counter() - t1; t_old += t1 - t0
+    assert np.array_equal(tr.dc, np.array(dc)) and np.array_equal(tr.counter, np.array(cnt))
+    assert np.array_equal(ac, np.array(zs) - np.array(dc))
+    print(f"DC 4×200: update_dc_components×4 {t_old / len(frames) * 1e6:.0f} мкс, "
+          f"DCTracker.update {t_new / len(frames) * 1e6:.0f} мкс (совпадают бит в бит)")
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'dc.npy')
+    t0 = time.perf_counter(); tr.save_async(path); t1 = time.perf_counter(); tr.join()
+    tr2 = DCTracker(4, 200)
+    assert tr2.load(path) and np.array_equal(tr2.dc, tr.dc)
+    print(f"save_async: {(t1 - t0) * 1e6:.0f} мкс в вызывающем потоке, файл {os.path.getsize(path)} байт")
+
+    # Спектр разностей (график 11): 200 семплов, fs=384000, 40..1000 Гц, и длинный сигнал
+    sa = SpectrumAnalyzer(cache=1)     # кэш на 1 — замер именно расчёта, а не попаданий
+    for sig in (rng.normal(0, 1000, 200), data[:8000].astype(float)):
+        xs = [sig + k for k in range(20)]
+        ref = [_spectrum_fft(v, 384000, 40, 1000) for v in xs]
+        _, t_old = _bench(lambda: [_spectrum_fft(v, 384000, 40, 1000) for v in xs])
+        res, t_new = _bench(lambda: [sa.spectrum(v, 384000, 40, 1000) for v in xs])
+        for (f0, s0), (f1, s1) in zip(ref, res):
+            assert np.array_equal(f0, f1) and np.allclose(s0, s1, rtol=1e-9, atol=1e-9 * s0.max())
+        _, pw = sa.welch(np.array(xs[:4]), 384000, 40, 1000)
+        assert np.allclose(pw, np.mean([r[1] ** 2 for r in ref[:4]], axis=0), rtol=1e-9)
+        print(f"спектр {len(sig)} семплов: fft+blackman {t_old / len(xs) * 1e6:.0f} мкс, "
+              f"SpectrumAnalyzer {t_new / len(xs) * 1e6:.0f} мкс")
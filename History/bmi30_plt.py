@@ -2,6 +2,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider, Button
 import time
+from bmi30_dsp import SpectrumAnalyzer
 
 # Словарь настроек для всех кнопок - центральное место хранения конфигурации
 BUTTON_CONFIG = {
@@ -413,7 +414,7 @@ def update_graph(
     cross_correlation_sum, ac_high_level, ac_low_level,
     antiphase_correlation_sum, adaptive_correlation_threshold,
     correlation_detection_count, correlation_detection_threshold,
-    CROSS_CORRELATION_SHIFTS):
+    CROSS_CORRELATION_SHIFTS, data_seq=None):
         
     global max_amp_15, max_amp_14, max_phase_15, max_phase_14
 
@@ -654,8 +655,10 @@ def update_graph(
             f_max = config.get('f_max', 1000)
             
             if len(diff_sum_P1) > 0 and len(diff_sum_L1) > 0:
-                freqs_diff_P1, spectrum_diff_P1 = calculate_spectrum(diff_sum_P1, fs, f_min, f_max)
-                freqs_diff_L1, spectrum_diff_L1 = calculate_spectrum(diff_sum_L1, fs, f_min, f_max)
+                key_P1 = None if data_seq is None else (data_seq, 'diff_P1')
+                key_L1 = None if data_seq is None else (data_seq, 'diff_L1')
+                freqs_diff_P1, spectrum_diff_P1 = calculate_spectrum(diff_sum_P1, fs, f_min, f_max, key=key_P1)
+                freqs_diff_L1, spectrum_diff_L1 = calculate_spectrum(diff_sum_L1, fs, f_min, f_max, key=key_L1)
                 
                 line1.set_data(freqs_diff_P1, spectrum_diff_P1)
                 line2.set_data(freqs_diff_L1, spectrum_diff_L1)
@@ -1497,54 +1500,13 @@ def update_graph(
 
     return True, False
 
-_spectrum_cache = {}  # Глобальный словарь для кэширования
+# Спектр: окна по длине и срезы полосы f_min..f_max считаются один раз, rfft вместо fft,
+# LRU-кэш результатов по ключу key — номеру буфера данных (bmi30_dsp.SpectrumAnalyzer)
+_spectrum = SpectrumAnalyzer(cache=20)
 
-def calculate_spectrum(data, fs, f_min, f_max):
-    """Расчет спектра сигнала с кэшированием"""
-    global _spectrum_cache
-    
-    # Быстрый выход на случай пустых данных
-    if len(data) == 0:
-        return np.array([0]), np.array([0])
-    
-    # Хэширование входных данных для проверки кэша
-    data_hash = hash(data.tobytes())
-    cache_key = (data_hash, fs, f_min, f_max)
-    
-    # Проверка кэша
-    if cache_key in _spectrum_cache:
-        return _spectrum_cache[cache_key]
-    
-    # Обычное вычисление, если кэш-промах
-    n_fft = 32768
-    data_centered = data - np.mean(data)
-    window = np.blackman(len(data_centered))
-    windowed_data = data_centered * window
-    
-    # Оптимизация: использование меньшего n_fft для коротких сигналов
-    if len(windowed_data) < 4096:
-        n_fft = 8192
-    
-    # Вычисление спектра
-    spectrum = np.fft.fft(windowed_data, n=n_fft)
-    spectrum = np.abs(spectrum[:n_fft // 2])  # Берем только положительные частоты
-    
-    # Вычисление частотной оси
-    freqs = np.fft.fftfreq(n_fft, d=1/fs)[:n_fft // 2]
-    
-    # Ограничение по диапазону частот
-    valid_indices = (freqs >= f_min) & (freqs <= f_max)
-    freqs = freqs[valid_indices]
-    spectrum = spectrum[valid_indices]
-    
-    # Сохраняем в кэш
-    _spectrum_cache[cache_key] = (freqs, spectrum)
-    
-    # Ограничиваем размер кэша
-    if len(_spectrum_cache) > 20:
-        _spectrum_cache.clear()
-        
-    return freqs, spectrum
+def calculate_spectrum(data, fs, f_min, f_max, key=None):
+    """Расчет спектра сигнала с кэшированием (только при заданном key)"""
+    return _spectrum.spectrum(data, fs, f_min, f_max, key=key)
 
 # Добавьте эту новую функцию
 def add_diamond_markers(ax, x_points, y_points, color='red', size=8, label=None):
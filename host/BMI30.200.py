@@ -20,6 +20,15 @@ except Exception:
 	CMD_SOFT_RESET = 0x7E
 	CMD_DEEP_RESET = 0x7F
 	CMD_SET_ALT = 0x31
+from usb_vendor.scope_render import MinMaxDecimator, PeakTracker, PersistenceHist  # type: ignore
+from usb_vendor.trigger import TriggerEngine, RISING  # type: ignore
+from usb_vendor.spectrum import RingSpectrum  # type: ignore
+from usb_vendor.control import vendor_client  # type: ignore
+
+# режимы отображения: последняя пара / лента из кольца семплов / послесвечение / развёртка по триггеру / спектр
+SCOPE_MODES = ('frame', 'roll', 'persist', 'trigger', 'spectrum')
+SCOPE_MODE_NAMES = ('Кадр', 'Лента', 'Послесвечение', 'Триггер', 'Спектр')
+SPECTRUM_DB_MIN = -100.0   # низ шкалы Y в режиме спектра, дБ полной шкалы
 
 # Qt/pyqtgraph bootstrap: enforce PyQt5 first to keep binding consistent
 PG_IMPORT_ERR = None
@@ -61,6 +70,14 @@ class ScopeWindow:
 		self.freq_box.setCurrentIndex(0)  # по умолчанию 200 Гц
 		self.freq_box.currentIndexChanged.connect(self._on_freq_change)
 		legend_bar.addWidget(self.freq_box, 0)
+		# режим отображения (BMI30_SCOPE_MODE=frame|roll|persist|trigger|spectrum)
+		mode = str(os.getenv("BMI30_SCOPE_MODE", "frame")).lower()
+		self.scope_mode = mode if mode in SCOPE_MODES else 'frame'
+		self.mode_box = QtWidgets.QComboBox()
+		self.mode_box.addItems(list(SCOPE_MODE_NAMES))
+		self.mode_box.setCurrentIndex(SCOPE_MODES.index(self.scope_mode))
+		self.mode_box.setToolTip("Кадр — последняя пара; Лента — непрерывная запись подряд идущих пар; Послесвечение — гистограмма последних N кадров; Триггер — развёртки по фронту/уровню (BMI30_TRIGGER, BMI30_TRIG_*); Спектр — Уэлч по кольцу семплов (BMI30_SPECTRUM_*)")
+		legend_bar.addWidget(self.mode_box, 0)
 		self.btn_reconnect = QtWidgets.QPushButton("↻")
 		self.btn_reconnect.setToolTip("Ручное переподключение к устройству")
 		self.btn_reconnect.clicked.connect(self._manual_reconnect)
@@ -85,6 +102,41 @@ class ScopeWindow:
 		self.curve1 = self.p1.plot(pen=None, symbol='o', symbolSize=2, symbolPen=None, symbolBrush=pg.mkBrush('#3498db'))
 		self.p0.showGrid(x=True, y=True, alpha=0.3)
 		self.p1.showGrid(x=True, y=True, alpha=0.3)
+		# Лента: сколько последних семплов показывать (не больше кольца семплов)
+		try:
+			self.roll_samples = max(1, int(os.getenv("BMI30_ROLL_SAMPLES", str(1 << 18))))
+		except Exception:
+			self.roll_samples = 1 << 18
+		# Послесвечение: N кадров × уровни по Y, картинка под кривыми
+		try:
+			self.persist_frames = max(1, int(os.getenv("BMI30_PERSIST_FRAMES", "64")))
+		except Exception:
+			self.persist_frames = 64
+		try:
+			self.persist_bins = max(2, int(os.getenv("BMI30_PERSIST_BINS", "256")))
+		except Exception:
+			self.persist_bins = 256
+		self._persist: tuple | None = None  # (PersistenceHist ADC0, PersistenceHist ADC1)
+		self.img0 = pg.ImageItem()
+		self.img1 = pg.ImageItem()
+		try:
+			lut = pg.colormap.get('inferno').getLookupTable(nPts=256)
+		except Exception:
+			lut = None  # старый pyqtgraph — оттенки серого
+		for plot, img in ((self.p0, self.img0), (self.p1, self.img1)):
+			img.setZValue(-10)
+			if lut is not None:
+				img.setLookupTable(lut)
+			img.setVisible(self.scope_mode == 'persist')
+			plot.addItem(img)
+		# Триггер: движок создаётся на кольцо текущего потока, линия — момент срабатывания
+		self._trig: TriggerEngine | None = None
+		self.trig_lines = [pg.InfiniteLine(angle=90, movable=False, pen=pg.mkPen('#e67e22', style=QtCore.Qt.PenStyle.DashLine)) for _ in range(2)]
+		for plot, line in zip((self.p0, self.p1), self.trig_lines):
+			line.setVisible(self.scope_mode == 'trigger')
+			plot.addItem(line)
+		# Спектр: усреднение по сегментам кольца текущего потока (создаётся при первом кадре)
+		self._spec: RingSpectrum | None = None
 		# Синхронизируем X-оси между графиками
 		try:
 			self.p1.setXLink(self.p0)
@@ -109,6 +161,11 @@ class ScopeWindow:
 			self.test_as_data = str(os.getenv("BMI30_TEST_AS_DATA", "0")).lower() not in ("0","false","no")
 		except Exception:
 			self.test_as_data = False
+		# Приём USB в отдельном процессе (кольцо семплов в shared_memory), включить: BMI30_RX_PROC=1
+		try:
+			self.rx_proc = str(os.getenv("BMI30_RX_PROC", "0")).lower() not in ("0","false","no")
+		except Exception:
+			self.rx_proc = False
 		# Показывать ли нулевые сигналы (по умолчанию ВКЛЮЧЕНО, чтобы видеть семплы "как есть")
 		try:
 			self.show_zero = str(os.getenv("BMI30_SHOW_ZERO", "1")).lower() not in ("0","false","no")
@@ -131,7 +188,12 @@ class ScopeWindow:
 		try:
 			self.p0.enableAutoRange(y=self.y_auto)
 			self.p1.enableAutoRange(y=self.y_auto)
-			if not self.y_auto:
+			if self.scope_mode == 'spectrum':
+				self.p0.enableAutoRange(y=False)
+				self.p1.enableAutoRange(y=False)
+				self.p0.setYRange(SPECTRUM_DB_MIN, 0, padding=0.02)
+				self.p1.setYRange(SPECTRUM_DB_MIN, 0, padding=0.02)
+			elif not self.y_auto:
 				self.p0.setYRange(self.y_min, self.y_max, padding=0.02)
 				self.p1.setYRange(self.y_min, self.y_max, padding=0.02)
 		except Exception:
@@ -164,7 +226,17 @@ class ScopeWindow:
 		self.fps = 0.0
 		self.last_range_t = 0.0
 		self.max_int16_span = 33000  # предельное окно по амплитуде
-		self._y_span_smooth = None  # сглаженный спан по Y
+		# Y-диапазон по пикам только новых пар (без max/min по всему буферу на каждом тике)
+		self._y_peak = PeakTracker()
+		# отрисовка отвязана от приёма: не чаще BMI30_SCOPE_FPS кадров/с и только если что-то изменилось
+		try:
+			self.scope_fps = max(1.0, float(os.getenv("BMI30_SCOPE_FPS", "30")))
+		except Exception:
+			self.scope_fps = 30.0
+		self._dec0 = MinMaxDecimator()
+		self._dec1 = MinMaxDecimator()
+		self._dirty = False
+		self.mode_box.currentIndexChanged.connect(self._on_mode_change)
 		# окно отображения
 		self.view_start = 0
 		self.view_len = 0  # выставим когда узнаем длину буфера
@@ -176,6 +248,9 @@ class ScopeWindow:
 		# отслеживание общего приёма данных (по транспорту), чтобы не ругаться на "остановку" при отсутствии пар
 		self._last_rx_seen = 0.0
 		self._last_sample_ts: float | None = None
+		# курсор по кольцу семплов текущего USBStream (сбрасывается при новом потоке)
+		self._ring_owner = None
+		self._blk_cursor = 0
 		# интервалы можно настроить через переменные окружения
 		try:
 			self.diag_interval = float(os.getenv("BMI30_DIAG_INTERVAL", "10"))  # не спамить предупреждением чаще, чем раз в 10с
@@ -210,6 +285,10 @@ class ScopeWindow:
 		self.qtimer.setInterval(60)
 		self.qtimer.timeout.connect(self._tick)
 		self.qtimer.start()
+		self.render_timer = QtCore.QTimer()
+		self.render_timer.setInterval(int(1000.0 / self.scope_fps))
+		self.render_timer.timeout.connect(self._render)
+		self.render_timer.start()
 		# авто-кик при зависании
 		self.auto_soft_kick = str(os.getenv("BMI30_AUTO_SOFT_KICK", "1")).lower() not in ("0","false","no")
 		self.last_soft_kick_t = 0.0
@@ -368,17 +447,26 @@ class ScopeWindow:
 				if self._status_hold_text and any(x in self._status_hold_text for x in ("Поток остановился", "Нет приёма данных", "Нет новых стереопар")):
 					self._status_hold_text = None
 				self._last_rx_seen = rx_t
-			while True:
-				pair = self.stream.get_stereo(timeout=0.0)
-				if not pair:
-					break
-				a, b = pair
+			# Пары читаем из непрерывного кольца семплов USBStream: за тик берём метаданные
+			# всех новых пар (разрывы seq, паузы), а копируем только последнюю — её и рисуем.
+			ring = self.stream.sample_ring
+			if self._ring_owner is not self.stream:
+				self._ring_owner = self.stream
+				self._blk_cursor = 0
+				try:
+					# очередь пар get_stereo() GUI не нужна — пусть не копится
+					self.stream.set_pair_queue(False)
+				except Exception:
+					pass
+			seqs, tss, starts, lens, self._blk_cursor = ring.blocks_since(self._blk_cursor)
+			got = len(seqs)
+			if got and ring.valid(int(starts[-1])):
 				self.last_frame_t = time.time()
-				ch0 = np.frombuffer(a.payload, dtype='<i2')
-				ch1 = np.frombuffer(b.payload, dtype='<i2')
+				n = int(lens[-1])
+				ch0, ch1 = ring.view(int(starts[-1]), n)
 				if self.base_buf_len is None:
 					# Базовая длина = фактическое количество семплов
-					length_guess = len(ch0)
+					length_guess = n
 					self.base_buf_len = length_guess
 					self.base_buf_len_bytes = self.base_buf_len * 2
 					if self.base_buf_len == 1360:
@@ -403,41 +491,47 @@ class ScopeWindow:
 					self.slider_start.setValue(self.view_start)
 					self.lbl_start_value.setText(str(self.view_start))
 					self.lbl_len_value.setText(str(self.view_len))
-				self.data0[:len(ch0)] = ch0
-				self.data1[:len(ch1)] = ch1
-				if len(ch0) < self.base_buf_len:
-					self.data0[len(ch0):] = 0
-				if len(ch1) < self.base_buf_len:
-					self.data1[len(ch1):] = 0
+				n = min(n, self.base_buf_len)
+				self.data0[:n] = ch0[:n]
+				self.data1[:n] = ch1[:n]
+				# пики и послесвечение — по ВСЕМ новым парам, не только по последней
+				s0 = int(starts[0]); s_end = int(starts[-1]) + int(lens[-1])
+				if self.y_auto and ring.valid(s0) and s_end - s0 <= ring.cap:
+					self._y_peak.feed(*ring.view(s0, s_end - s0))
+				if self.scope_mode == 'persist':
+					self._persist_add(ring, starts, lens)
+				if n < self.base_buf_len:
+					self.data0[n:] = 0
+					self.data1[n:] = 0
 				if self.freq_hz:
 					dt = 1.0 / self.freq_hz
-					ts_start = a.timestamp / 1_000_000.0
-					ts = ts_start + np.arange(len(ch0)) * dt
-					self.timestamps[:len(ts)] = ts
-					if len(ts) < self.base_buf_len:
-						self.timestamps[len(ts):] = 0.0
-					# Проверить на паузы внутри блока (между семплами)
-					if len(ts) > 1 and ts[-1] - ts[-2] > dt * 2:
-						pause_ms = (ts[-1] - ts[-2]) * 1000
-						print(f"[pause] Обнаружена пауза внутри блока: {pause_ms:.1f}мс")
-					if len(ch0):
-						if self._last_sample_ts is not None:
-							gap = ts_start - self._last_sample_ts
-							if gap > dt * 2:
-								pause_ms = gap * 1000
-								print(f"[pause] Обнаружена пауза между блоками данных: {pause_ms:.1f}мс")
-						self._last_sample_ts = ts[len(ch0)-1]
+					t0 = tss / 1_000_000.0
+					t_last = t0 + (lens - 1) * dt
+					self.timestamps[:n] = t0[-1] + np.arange(n) * dt
+					if n < self.base_buf_len:
+						self.timestamps[n:] = 0.0
+					# паузы между блоками данных: начало пары против последнего семпла предыдущей
+					prev_last = np.concatenate(([np.nan if self._last_sample_ts is None else self._last_sample_ts], t_last[:-1]))
+					for gap in (t0 - prev_last)[(t0 - prev_last) > dt * 2]:
+						print(f"[pause] Обнаружена пауза между блоками данных: {gap * 1000:.1f}мс")
+					self._last_sample_ts = float(t_last[-1])
 				else:
 					self._last_sample_ts = None
-				if self.last_seq is not None:
-					exp = (self.last_seq + 1) & 0xFFFFFFFF
-					if a.seq != exp:
-						self.gap_count += 1
-				self.last_seq = a.seq
-				got += 1
+				seq_all = seqs if self.last_seq is None else np.concatenate(([self.last_seq], seqs))
+				self.gap_count += int(np.count_nonzero((np.diff(seq_all) & 0xFFFFFFFF) != 1))
+				self.last_seq = int(seqs[-1])
 				# если ранее висело предупреждение об остановке — сбросить его сразу
 				if self._status_hold_text and "Поток остановился" in self._status_hold_text:
 					self._status_hold_text = None
+			# развёртки триггера и спектр — после разбора всех новых пар (poll сам смотрит, что пришло)
+			if self.scope_mode == 'trigger' and self.base_buf_len is not None:
+				eng = self._trigger_for(ring)
+				if eng is not None and eng.poll():
+					self._dirty = True
+			if self.scope_mode == 'spectrum':
+				sp = self._spectrum_for(ring)
+				if sp is not None and sp.poll():
+					self._dirty = True
 		except Exception as e:
 			# если EBUSY/EPIPE — инициируем переподключение, чтобы не мигал текст
 			msg = str(e)
@@ -459,22 +553,10 @@ class ScopeWindow:
 			self.slider_start.setMaximum(max(0, self.base_buf_len - vlen))
 			vstart = min(int(self.slider_start.value()), max_start)
 			vlen = min(vlen, len(self.data0) - vstart)  # не больше доступных данных
+			if got or vstart != self.view_start or vlen != self.view_len:
+				self._dirty = True
 			self.view_start = vstart
 			self.view_len = vlen
-			seg0 = self.data0[vstart:vstart+vlen]
-			seg1 = self.data1[vstart:vstart+vlen]
-			x = np.arange(vlen)
-			if len(seg0) > 0 and (self.show_zero or not np.all(seg0 == 0)):
-				self.curve0.setData(x, seg0)
-			else:
-				self.curve0.setData([], [])
-			if len(seg1) > 0 and (self.show_zero or not np.all(seg1 == 0)):
-				self.curve1.setData(x, seg1)
-			else:
-				self.curve1.setData([], [])
-			self._apply_x_range(0, self.view_len or self.initial_expected)
-			self.lbl_start_value.setText(str(vstart))
-			self.lbl_len_value.setText(str(vlen))
 			self.frames_sec_pairs += got
 		now = time.time()
 		if now - self.last_fps_t >= 1.0:
@@ -482,25 +564,13 @@ class ScopeWindow:
 			self.frames_sec_pairs = 0
 			self.last_fps_t = now
 		# auto symmetric y-range update (0.5s throttle) — ТОЛЬКО если включено BMI30_Y_AUTO=1
-		if self.y_auto and (now - self.last_range_t > 0.5) and (len(self.data0) or len(self.data1)):
+		# пики копятся по новым парам при приёме (PeakTracker.feed), здесь только сглаживание
+		if self.y_auto and self.scope_mode != 'spectrum' and (now - self.last_range_t > 0.5):
 			try:
-				maxv = 1
-				if len(self.data0):
-					maxv = max(maxv, int(np.max(self.data0)))
-					maxv = max(maxv, abs(int(np.min(self.data0))))
-				if len(self.data1):
-					maxv = max(maxv, int(np.max(self.data1)))
-					maxv = max(maxv, abs(int(np.min(self.data1))))
-				# небольшая защита от нуля
-				span = max(64, maxv * 1.05)
-				# экспоненциальное сглаживание перепадов амплитуды
-				alpha = 0.25
-				if self._y_span_smooth is None:
-					self._y_span_smooth = span
-				else:
-					self._y_span_smooth = alpha * span + (1 - alpha) * self._y_span_smooth
-				self.p0.setYRange(-self._y_span_smooth, self._y_span_smooth, padding=0.02)
-				self.p1.setYRange(-self._y_span_smooth, self._y_span_smooth, padding=0.02)
+				span = self._y_peak.span()
+				if span is not None:
+					self.p0.setYRange(-span, span, padding=0.02)
+					self.p1.setYRange(-span, span, padding=0.02)
 			except Exception:
 				pass
 			self.last_range_t = now
@@ -580,20 +650,182 @@ class ScopeWindow:
 		self.view_start = min(self.view_start, max_start)
 		vlen = min(vlen, len(self.data0) - self.view_start)  # не больше доступных данных
 		self.view_len = vlen
-		seg0 = self.data0[self.view_start:self.view_start+vlen]
-		seg1 = self.data1[self.view_start:self.view_start+vlen]
-		x = np.arange(vlen)
-		if len(seg0) > 0 and (self.show_zero or not np.all(seg0 == 0)):
-			self.curve0.setData(x, seg0)
-		else:
-			self.curve0.setData([], [])
-		if len(seg1) > 0 and (self.show_zero or not np.all(seg1 == 0)):
-			self.curve1.setData(x, seg1)
-		else:
-			self.curve1.setData([], [])
-		self.lbl_start_value.setText(str(self.view_start))
-		self.lbl_len_value.setText(str(vlen))
-		self._apply_x_range(0, self.view_len or self.initial_expected)
+		self._dirty = True
+
+	def _persist_add(self, ring, starts, lens):
+		"""Добавить новые пары в гистограммы послесвечения (затёртые кольцом пропускаются)."""
+		ph = self._persist
+		if ph is None or ph[0].samples != self.base_buf_len:
+			lo, hi = (-self.max_int16_span / 2, self.max_int16_span / 2) if self.y_auto else (self.y_min, self.y_max)
+			ph = self._persist = tuple(PersistenceHist(self.base_buf_len, self.persist_frames, self.persist_bins, lo, hi) for _ in range(2))
+			rect = QtCore.QRectF(0, ph[0].lo, ph[0].samples, ph[0].hi - ph[0].lo)
+			self.img0.setRect(rect)
+			self.img1.setRect(rect)
+		# больше persist_frames пар за тик смысла нет — они бы тут же вытеснились
+		for start, n in zip(starts[-self.persist_frames:], lens[-self.persist_frames:]):
+			if ring.valid(int(start)):
+				v0, v1 = ring.view(int(start), int(n))
+				ph[0].add(v0)
+				ph[1].add(v1)
+
+	def _trigger_for(self, ring):
+		"""Движок триггера на кольцо ring (пересоздаётся при новом потоке); по умолчанию — фронт через 0, 1/4 предыстории."""
+		eng = self._trig
+		if eng is None or eng.ring is not ring:
+			n = self.base_buf_len or self.initial_expected
+			try:
+				eng = self._trig = TriggerEngine.from_env(ring, RISING, pre=n // 4, post=n - n // 4)
+				if eng is None:
+					raise ValueError(f"неизвестный режим BMI30_TRIGGER={os.getenv('BMI30_TRIGGER')!r}")
+			except Exception as e:
+				print("[trigger]", e)
+				eng = self._trig = None
+				self.mode_box.setCurrentIndex(0)
+				return None
+			for line in self.trig_lines:
+				line.setValue(eng.pre)
+		return eng
+
+	def _spectrum_for(self, ring):
+		"""Спектр по кольцу ring (пересоздаётся при новом потоке); параметры — BMI30_SPECTRUM_*."""
+		sp = self._spec
+		if sp is None or sp.ring is not ring:
+			try:
+				sp = self._spec = RingSpectrum.from_env(ring)
+			except Exception as e:
+				print("[spectrum]", e)
+				sp = self._spec = None
+				self.mode_box.setCurrentIndex(0)
+		return sp
+
+	def _on_mode_change(self, idx: int):
+		was_spectrum = self.scope_mode == 'spectrum'
+		self.scope_mode = SCOPE_MODES[idx] if 0 <= idx < len(SCOPE_MODES) else 'frame'
+		self._persist = None
+		self._trig = None
+		self._spec = None
+		spectrum = self.scope_mode == 'spectrum'
+		if spectrum != was_spectrum:
+			# спектр — в дБ полной шкалы; при возврате — прежний диапазон семплов
+			try:
+				for plot in (self.p0, self.p1):
+					plot.enableAutoRange(y=False if spectrum else self.y_auto)
+					if spectrum:
+						plot.setYRange(SPECTRUM_DB_MIN, 0, padding=0.02)
+					elif not self.y_auto:
+						plot.setYRange(self.y_min, self.y_max, padding=0.02)
+				self._y_peak.reset()
+				self._apply_x_axis_mode()
+			except Exception:
+				pass
+		for line in self.trig_lines:
+			line.setVisible(self.scope_mode == 'trigger')
+		persist = self.scope_mode == 'persist'
+		for img in (self.img0, self.img1):
+			img.setVisible(persist)
+			if not persist:
+				img.clear()
+		self.slider_start.setEnabled(self.scope_mode == 'frame' and self.base_buf_len is not None)
+		self.slider_len.setEnabled(self.scope_mode == 'frame' and self.base_buf_len is not None)
+		self._dirty = True
+
+	def _render(self):
+		"""Таймер отрисовки (BMI30_SCOPE_FPS): окно данных → min/max до ширины графика → setData."""
+		if not self._dirty or self.base_buf_len is None:
+			return
+		self._dirty = False
+		try:
+			vstart, vlen = self.view_start, self.view_len
+			try:
+				width = int(self.p0.getViewBox().width()) or 1000
+			except Exception:
+				width = 1000
+			if self.scope_mode == 'roll':
+				self._render_roll(width)
+				return
+			if self.scope_mode == 'persist':
+				self._render_persist()
+				return
+			if self.scope_mode == 'trigger':
+				self._render_trigger(width)
+				return
+			if self.scope_mode == 'spectrum':
+				self._render_spectrum(width)
+				return
+			for curve, dec, data in ((self.curve0, self._dec0, self.data0), (self.curve1, self._dec1, self.data1)):
+				seg = data[vstart:vstart+vlen]
+				x, y = dec(seg, width)
+				# после min/max нули остаются нулями, так что проверяем уже прореженное
+				if len(y) > 0 and (self.show_zero or y.any()):
+					curve.setData(x, y)
+				else:
+					curve.setData([], [])
+			self.lbl_start_value.setText(str(vstart))
+			self.lbl_len_value.setText(str(vlen))
+			self._apply_x_range(0, vlen or self.initial_expected)
+		except Exception as e:
+			print("[render]", e)
+
+	def _render_roll(self, width: int):
+		"""Лента: последние roll_samples семплов кольца подряд, X — семплы от начала окна."""
+		stream = self.stream
+		if stream is None:
+			return
+		ring = stream.sample_ring
+		total = min(self.roll_samples, ring.cap)
+		v0, v1, _ = ring.latest(total)
+		for curve, dec, seg in ((self.curve0, self._dec0, v0), (self.curve1, self._dec1, v1)):
+			x, y = dec(seg, width, copy=True)
+			if len(y):
+				curve.setData(x, y)
+			else:
+				curve.setData([], [])
+		self.lbl_start_value.setText("roll")
+		self.lbl_len_value.setText(str(len(v0)))
+		self._apply_x_range(0, total)
+
+	def _render_trigger(self, width: int):
+		"""Последняя готовая развёртка: X — семплы от её начала, срабатывание на отметке pre."""
+		eng = self._trig
+		sw = eng.latest() if eng is not None else None
+		if sw is None:
+			return
+		_, v0, v1 = sw
+		for curve, dec, seg in ((self.curve0, self._dec0, v0), (self.curve1, self._dec1, v1)):
+			x, y = dec(seg, width, copy=True)
+			curve.setData(x, y)
+		self.lbl_start_value.setText(f"trig {eng.mode} {eng.level:g}")
+		self.lbl_len_value.setText(f"{eng.count} (-{eng.missed})")
+		self._apply_x_range(0, eng.pre + eng.post)
+
+	def _render_spectrum(self, width: int):
+		"""Спектр обоих каналов (дБ полной шкалы): X — Гц при BMI30_SPECTRUM_FS, иначе циклы на семпл."""
+		sp = self._spec
+		res = sp.db() if sp is not None else None
+		if res is None:
+			return
+		freqs, d0, d1 = res
+		df = float(freqs[1] - freqs[0]) if len(freqs) > 1 else 1.0
+		for curve, dec, y in ((self.curve0, self._dec0, d0), (self.curve1, self._dec1, d1)):
+			x, y = dec(y, width, copy=True)
+			curve.setData(x * df, y)
+		self.lbl_start_value.setText(f"spectrum {sp.plan.nperseg}")
+		self.lbl_len_value.setText(f"{sp.count}/{sp.avg} (-{sp.skipped})")
+		self._apply_x_range(0, float(freqs[-1]))
+
+	def _render_persist(self):
+		"""Послесвечение: гистограммы как картинки, уровни — по числу накопленных кадров."""
+		self.curve0.setData([], [])
+		self.curve1.setData([], [])
+		ph = self._persist
+		if ph is None:
+			return
+		levels = (0, max(1, ph[0].filled))
+		self.img0.setImage(ph[0].hist, autoLevels=False, levels=levels)
+		self.img1.setImage(ph[1].hist, autoLevels=False, levels=levels)
+		self.lbl_start_value.setText("persist")
+		self.lbl_len_value.setText(f"{ph[0].filled}×{ph[0].samples}")
+		self._apply_x_range(0, ph[0].samples)
 
 	def _apply_x_range(self, start: float, end: float):
 		"""Принудительно зафиксировать диапазон X, чтобы график не 'улетал'."""
@@ -619,9 +851,15 @@ class ScopeWindow:
 				ax1.enableAutoSIPrefix(False)
 			except Exception:
 				pass
-			ax0.setLabel("samples")
-			ax1.setLabel("samples")
+			if self.scope_mode == 'spectrum':
+				label = "Hz" if os.getenv("BMI30_SPECTRUM_FS") else "cycles/sample"
+			else:
+				label = "samples"
+			ax0.setLabel(label)
+			ax1.setLabel(label)
 			def _int_ticks(values, scale, spacing):
+				if self.scope_mode == 'spectrum':
+					return [f"{v:g}" for v in values]
 				labels = []
 				for v in values:
 					try:
@@ -705,6 +943,20 @@ class ScopeWindow:
 		else:
 			self.legend_lbl.setText("Нажмите 1 для запуска")
 
+	def _send_profile_burst(self):
+		"""SET_PROFILE, SET_FRAME_SAMPLES (если для профиля задан) и START — подряд, без sleep между ними."""
+		try:
+			from usb_vendor.usb_stream import CMD_SET_FRAME_SAMPLES  # type: ignore
+		except Exception:
+			CMD_SET_FRAME_SAMPLES = 0x17
+		cmds = [(CMD_SET_PROFILE, bytes([self.desired_profile]))]
+		ns = self.ns_map.get(self.desired_profile)
+		if ns:
+			cmds.append((CMD_SET_FRAME_SAMPLES, int(ns).to_bytes(2,'little')))
+		cmds.append((CMD_START_STREAM, b""))
+		ctrl = getattr(self.stream, 'ctrl', None) or vendor_client(self.stream)
+		return ctrl.burst(cmds)
+
 	def _soft_kick_stream(self):
 		"""Мягко переинициализировать параметры и запустить START без STOP, чтобы не ронять интерфейс."""
 		if self.stream is None:
@@ -722,28 +974,8 @@ class ScopeWindow:
 						pass
 			except Exception:
 				pass
-			# профиль
-			self.stream.send_cmd(CMD_SET_PROFILE, bytes([self.desired_profile]))
-			try:
-				import time as _t
-				_t.sleep(0.02)
-			except Exception:
-				pass
-			# размер кадра для ~20 FPS
-			try:
-				from usb_vendor.usb_stream import CMD_SET_FRAME_SAMPLES  # type: ignore
-			except Exception:
-				CMD_SET_FRAME_SAMPLES = 0x17
-			ns = self.ns_map.get(self.desired_profile)
-			if ns:
-				self.stream.send_cmd(CMD_SET_FRAME_SAMPLES, int(ns).to_bytes(2,'little'))
-				try:
-					import time as _t
-					_t.sleep(0.02)
-				except Exception:
-					pass
-			# старт
-			self.stream.send_cmd(CMD_START_STREAM, b"")
+			# профиль, размер кадра для ~20 FPS и старт — одной пачкой, без пауз между командами
+			self._send_profile_burst()
 		except Exception as e:
 			raise
 
@@ -994,7 +1226,18 @@ class ScopeWindow:
 				pass
 			# Не ограничиваем устройство Ns по умолчанию (максимальный FPS). Подсказку Ns включаем через BMI30_SEND_NS=1
 			fs = self.ns_map.get(self.desired_profile) if self.send_ns else None
-			self.stream = USBStream(profile=self.desired_profile, full=True, test_as_data=self.test_as_data, frame_samples=fs)
+			# Воспроизведение записи вместо устройства: BMI30_REPLAY=файл (.bmr или сырой дамп), BMI30_REPLAY_SPEED
+			_replay = None
+			if os.getenv("BMI30_REPLAY"):
+				from usb_vendor.replay import from_env as _replay_from_env  # type: ignore
+				_replay = _replay_from_env(test_as_data=self.test_as_data, frame_samples=fs)
+			if _replay is not None:
+				self.stream = _replay
+			elif self.rx_proc:
+				from usb_vendor.usb_proc import ProcUSBStream  # type: ignore
+				self.stream = ProcUSBStream(profile=self.desired_profile, full=True, test_as_data=self.test_as_data, frame_samples=fs)
+			else:
+				self.stream = USBStream(profile=self.desired_profile, full=True, test_as_data=self.test_as_data, frame_samples=fs)
 			# Сохраним порт info для power cycle без stream
 			self.last_port_info = self.stream.port_info
 			self._set_status("Устройство подключено, ожидание данных…", hold_sec=1.5)
@@ -1042,28 +1285,9 @@ class ScopeWindow:
 			return
 		# Переключение на лету: остановим и запустим снова быстро
 		try:
-			# Мягкий ре-старт без явного STOP, чтобы не ронять интерфейс (ENODEV)
-			self.stream.send_cmd(CMD_SET_PROFILE, bytes([self.desired_profile]))
-			# небольшая пауза даёт прошивке переключить профиль
-			try:
-				import time as _t
-				_t.sleep(0.02)
-			except Exception:
-				pass
-			# Обновим желаемый размер кадра под новый профиль (для ~20 FPS)
-			try:
-				from usb_vendor.usb_stream import CMD_SET_FRAME_SAMPLES  # type: ignore
-			except Exception:
-				CMD_SET_FRAME_SAMPLES = 0x17
-			ns = self.ns_map.get(self.desired_profile)
-			if ns:
-				self.stream.send_cmd(CMD_SET_FRAME_SAMPLES, int(ns).to_bytes(2,'little'))
-				try:
-					import time as _t
-					_t.sleep(0.02)
-				except Exception:
-					pass
-			self.stream.send_cmd(CMD_START_STREAM, b"")
+			# Мягкий ре-старт без явного STOP, чтобы не ронять интерфейс (ENODEV):
+			# профиль, размер кадра под новый профиль (для ~20 FPS) и старт одной пачкой
+			self._send_profile_burst()
 			self._set_status(f"Переключена частота {200 if idx==0 else 300} Гц, ожидание данных…", hold_sec=1.5)
 			self.base_buf_len = None
 			self.base_buf_len_bytes = None
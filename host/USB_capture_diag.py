@@ -94,8 +94,9 @@ def main():
         status_block = b''
         buf = b''
         t_stat = time.time() + args.status_wait
+        rd = USB_io.reader_for(ser)  # хвост после кадров уже в буфере читателя read_frame
         while time.time() < t_stat and not status_block:
-            chunk = ser.read(64)
+            chunk = rd.read(64)
             if chunk:
                 buf += chunk
                 pos = buf.find(b'STAT')
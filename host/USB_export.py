@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""USB_export.py — выгрузка потока кадров (CSV, сырой int16, .npy, Parquet) крупными буферизованными записями.
+
+Кадр форматируется целиком, без Python-цикла по строкам:
+  csv     — seq,index,<ch0>..<chN>; шаблон '%d' на весь кадр строится один раз на (строк, каналов),
+            индекс вшит в шаблон, кадр подставляется одной операцией %;
+  raw     — семплы кадра int16 LE подряд (строка = все каналы), без заголовков;
+  npy     — .npy (int16, форма (строк, каналов)); форма в заголовке дописывается при close(),
+            до этого файл читается как пустой массив;
+  parquet — столбцы seq, index, ch0..chN (нужен pyarrow), группа строк на rows_per_group строк.
+
+Выход — путь или '-' (stdout). Запись копится в буфере и уходит в файл блоками по FLUSH_BYTES.
+
+Замер: python USB_export.py --format csv --frames 2000
+"""
+from __future__ import annotations
+import os
+import sys
+
+import numpy as np
+
+FORMATS = ('csv', 'raw', 'npy', 'parquet')
+FLUSH_BYTES = 1 << 20         # размер блока записи
+NPY_HEADER = 128              # длина заголовка .npy (v1.0) вместе с magic — с запасом под любую форму
+TEMPLATE_CACHE = 8            # сколько шаблонов CSV (строк × каналов) держать
+
+
+def _frame_data(frame: dict, limit: int = 0) -> np.ndarray:
+    """(строк, каналов) int16 кадра; limit > 0 — только первые limit строк."""
+    data = np.asarray(frame.get('data'))
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    if limit and limit > 0:
+        data = data[:limit]
+    return data
+
+
+class FrameExporter:
+    """База: буферизованный вывод в файл или stdout."""
+    binary = True
+
+    def __init__(self, path: str = '-', limit: int = 0):
+        self.path = path
+        self.limit = int(limit or 0)
+        self.frames = 0
+        self.rows = 0
+        self.bytes = 0
+        self._buf = bytearray()
+        if path == '-':
+            self._f = sys.stdout.buffer
+            self._own = False
+        else:
+            self._f = open(path, 'wb')
+            self._own = True
+
+    def write(self, frame: dict):
+        data = _frame_data(frame, self.limit)
+        if data.size:
+            self._write(frame, data)
+            self.rows += data.shape[0]
+        self.frames += 1
+
+    def _write(self, frame: dict, data: np.ndarray):
+        raise NotImplementedError
+
+    def _emit(self, b):
+        self._buf += b
+        if len(self._buf) >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            self._f.write(self._buf)
+            self.bytes += len(self._buf)
+            self._buf.clear()
+        try:
+            self._f.flush()
+        except Exception:
+            pass
+
+    def close(self):
+        self.flush()
+        if self._own:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvExporter(FrameExporter):
+    binary = False
+
+    def __init__(self, path: str = '-', limit: int = 0, header: bool = False):
+        super().__init__(path, limit)
+        self.header = bool(header)
+        self._tpl: dict = {}
+
+    def _template(self, n: int, ch: int) -> str:
+        key = (n, ch)
+        tpl = self._tpl.get(key)
+        if tpl is None:
+            if len(self._tpl) >= TEMPLATE_CACHE:
+                self._tpl.clear()
+            tail = ','.join(['%d'] * ch) + '\n'
+            tpl = self._tpl[key] = ''.join(f'%d,{i},{tail}' for i in range(n))
+        return tpl
+
+    def _write(self, frame: dict, data: np.ndarray):
+        n, ch = data.shape
+        if self.header:
+            self._emit((','.join(['seq', 'index'] + [f'ch{c}' for c in range(ch)]) + '\n').encode())
+            self.header = False
+        a = np.empty((n, ch + 1), dtype=np.int64)
+        a[:, 0] = int(frame.get('seq', 0))
+        a[:, 1:] = data
+        self._emit((self._template(n, ch) % tuple(a.ravel().tolist())).encode())
+
+
+class RawExporter(FrameExporter):
+    def _write(self, frame: dict, data: np.ndarray):
+        self._emit(np.ascontiguousarray(data, dtype='<i2').data)
+
+
+class NpyExporter(FrameExporter):
+    def __init__(self, path: str, limit: int = 0):
+        if path == '-':
+            raise ValueError('npy: нужен файл (форма дописывается в заголовок при закрытии)')
+        super().__init__(path, limit)
+        self.channels: int | None = None
+        self._emit(self._header(0, 0))
+
+    @staticmethod
+    def _header(rows: int, ch: int) -> bytes:
+        d = "{'descr': '<i2', 'fortran_order': False, 'shape': (%d, %d), }" % (rows, ch)
+        pad = NPY_HEADER - 10 - len(d) - 1
+        return b'\x93NUMPY\x01\x00' + (NPY_HEADER - 10).to_bytes(2, 'little') + (d + ' ' * pad + '\n').encode('latin1')
+
+    def _write(self, frame: dict, data: np.ndarray):
+        ch = data.shape[1]
+        if self.channels is None:
+            self.channels = ch
+        elif ch != self.channels:
+            raise ValueError(f'npy: число каналов сменилось {self.channels} → {ch}')
+        self._emit(np.ascontiguousarray(data, dtype='<i2').data)
+
+    def close(self):
+        self.flush()
+        try:
+            self._f.seek(0)
+            self._f.write(self._header(self.rows, self.channels or 0))
+        finally:
+            self._f.close()
+
+
+class ParquetExporter(FrameExporter):
+    def __init__(self, path: str, limit: int = 0, rows_per_group: int = 1 << 17):
+        if path == '-':
+            raise ValueError('parquet: нужен файл')
+        try:
+            import pyarrow as pa  # type: ignore[import-not-found]
+            import pyarrow.parquet as pq  # type: ignore[import-not-found]
+        except ImportError as e:
+            raise RuntimeError('parquet: не установлен pyarrow (pip install pyarrow)') from e
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.limit = int(limit or 0)
+        self.frames = 0
+        self.rows = 0
+        self.bytes = 0
+        self.rows_per_group = max(1, int(rows_per_group))
+        self._parts: list = []
+        self._pending = 0
+        self._w = None
+
+    def _write(self, frame: dict, data: np.ndarray):
+        n = data.shape[0]
+        seq = np.full(n, int(frame.get('seq', 0)) & 0xFFFF, dtype=np.uint16)
+        self._parts.append((seq, np.arange(n, dtype=np.uint16), np.asarray(data, dtype=np.int16)))
+        self._pending += n
+        if self._pending >= self.rows_per_group:
+            self.flush()
+
+    def flush(self):
+        if not self._parts:
+            return
+        pa = self._pa
+        ch = self._parts[0][2].shape[1]
+        cols = {
+            'seq': np.concatenate([p[0] for p in self._parts]),
+            'index': np.concatenate([p[1] for p in self._parts]),
+        }
+        data = np.concatenate([p[2] for p in self._parts])
+        for c in range(ch):
+            cols[f'ch{c}'] = data[:, c]
+        table = pa.table(cols)
+        if self._w is None:
+            self._w = self._pq.ParquetWriter(self.path, table.schema)
+        self._w.write_table(table)
+        self._parts.clear()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self._w is not None:
+            self._w.close()
+        try:
+            self.bytes = os.path.getsize(self.path)
+        except OSError:
+            pass
+
+
+def open_exporter(fmt: str, path: str = '-', limit: int = 0, header: bool = False) -> FrameExporter:
+    """Экспортёр формата fmt (FORMATS) в path ('-' — stdout)."""
+    if fmt == 'csv':
+        return CsvExporter(path, limit, header)
+    if fmt == 'raw':
+        return RawExporter(path, limit)
+    if fmt == 'npy':
+        return NpyExporter(path, limit)
+    if fmt == 'parquet':
+        return ParquetExporter(path, limit)
+    raise ValueError(f'неизвестный формат выгрузки: {fmt}')
+
+
+def main():
+    """Синтетические кадры 912×2: мс на кадр против построчной печати и запас по частоте блоков."""
+    import argparse, tempfile, time
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--format', default='csv', choices=FORMATS)
+    ap.add_argument('--frames', type=int, default=2000)
+    ap.add_argument('--samples', type=int, default=912)
+    ap.add_argument('--out', default='', help='Файл (по умолчанию — временный)')
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+    frames = [{'seq': k, 'data': (rng.normal(0, 8000, (args.samples, 2))).astype(np.int16)} for k in range(16)]
+    path = args.out or os.path.join(tempfile.mkdtemp(), 'export.' + args.format)
+    t0 = time.perf_counter()
+    with open_exporter(args.format, path, header=True) as ex:
+        for k in range(args.frames):
+            f = frames[k % len(frames)]
+            ex.write({'seq': k & 0xFFFF, 'data': f['data']})
+    dt = (time.perf_counter() - t0) / args.frames
+    # сверка и старый построчный способ
+    if args.format == 'csv':
+        with open(path) as fh:
+            fh.readline()
+            head = [fh.readline() for _ in range(3)]
+        d = frames[0]['data']
+        assert head == [f"0,{i},{int(d[i, 0])},{int(d[i, 1])}\n" for i in range(3)], head
+    elif args.format == 'npy':
+        a = np.load(path)
+        assert a.shape == (args.frames * args.samples, 2) and np.array_equal(a[:args.samples], frames[0]['data'])
+    f = frames[0]; d = f['data']
+    t1 = time.perf_counter()
+    for _ in range(50):
+        rows = []
+        for i in range(d.shape[0]):
+            rows.append(','.join([str(int(f['seq'])), str(i)] + [str(int(d[i, c])) for c in range(d.shape[1])]))
+        '\n'.join(rows)
+    dt_old = (time.perf_counter() - t1) / 50
+    print(f"{args.format}: {1e3 * dt:.3f} мс/кадр ({1.0 / max(dt, 1e-9):.0f} кадр/с), "
+          f"{os.path.getsize(path) / 1e6:.1f} МБ → {path}; построчный CSV {1e3 * dt_old:.3f} мс/кадр")
+
+
+if __name__ == '__main__':
+    main()
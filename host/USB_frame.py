@@ -14,6 +14,126 @@ def hex_bytes(b: bytes, n: int | None = None) -> str:
         return ' '.join(f'{x:02X}' for x in view)
     except Exception:
         return ''
+
+
+# Варианты CRC32: (части тела, init, xor 0xFFFFFFFF). M — MAGIC, h — заголовок, t — таблица, p — payload.
+# «+tbl» — только для special_fmt (там 'incl'/'excl' считаются без таблицы); порядок — как в пробе.
+_CRC_SPECIAL = (
+    ('incl+tbl', 'Mhtp', 0, False), ('incl-ff+tbl', 'Mhtp', 0xFFFFFFFF, True),
+    ('excl+tbl', 'htp', 0, False), ('excl-ff+tbl', 'htp', 0xFFFFFFFF, True),
+    ('incl', 'Mhp', 0, False), ('incl-ff', 'Mhp', 0xFFFFFFFF, True),
+    ('excl', 'hp', 0, False), ('excl-ff', 'hp', 0xFFFFFFFF, True),
+    ('payload', 'p', 0, False), ('payload-ff', 'p', 0xFFFFFFFF, True),
+    ('tbl+payload', 'tp', 0, False), ('tbl+payload-ff', 'tp', 0xFFFFFFFF, True),
+)
+_CRC_PLAIN = (
+    ('incl', 'Mhtp', 0, False), ('incl-ff', 'Mhtp', 0xFFFFFFFF, True),
+    ('excl', 'htp', 0, False), ('excl-ff', 'htp', 0xFFFFFFFF, True),
+    ('payload', 'p', 0, False), ('payload-ff', 'p', 0xFFFFFFFF, True),
+    ('tbl+payload', 'tp', 0, False), ('tbl+payload-ff', 'tp', 0xFFFFFFFF, True),
+)
+LEARN_FRAMES = 2      # столько подряд хороших кадров с одним форматом — и он фиксируется
+RELEARN_AFTER = 3     # столько подряд CRC-ошибок в зафиксированном формате — и снова полная проба
+
+
+def _crc_of(parts: str, init: int, do_xor: bool, hdr: bytes, tbl: bytes, payload: bytes) -> int:
+    """CRC32 частей по очереди (без склейки тела в новый bytes)."""
+    src = {'M': USB_proto.MAGIC, 'h': hdr, 't': tbl, 'p': payload}
+    c = init
+    for k in parts:
+        c = zlib.crc32(src[k], c)
+    c &= 0xFFFFFFFF
+    return (c ^ 0xFFFFFFFF) if do_xor else c
+
+
+class FrameFormat:
+    """Формат кадров конкретного устройства: раскладка заголовка (a/b — какое из полей
+    total/table где) и вариант CRC (тело, init/xor, порядок байт в хвосте).
+
+    Пока формат не зафиксирован, read_frame делает полную пробу (все раскладки по
+    эвристике _plausible, все варианты CRC). После LEARN_FRAMES подряд хороших кадров
+    с одинаковым результатом он фиксируется: дальше на кадр — одна CRC32 и раскладка
+    без угадывания. Кадр с плохой CRC в зафиксированном формате просто отбрасывается;
+    только RELEARN_AFTER таких подряд сбрасывают формат к полной пробе.
+    """
+
+    def __init__(self, learn: int = LEARN_FRAMES, relearn_after: int = RELEARN_AFTER):
+        self.learn = max(1, int(learn))
+        self.relearn_after = max(1, int(relearn_after))
+        self.layout: str | None = None      # 'a' | 'b'
+        self.variant: str | None = None     # имя варианта CRC
+        self.order: str | None = None       # 'le' | 'be'
+        self._cand = None
+        self._streak = 0
+        self.fails = 0          # подряд CRC-ошибок в зафиксированном формате
+        self.probes = 0         # кадров, прошедших полную пробу
+        self.fast = 0           # кадров, проверенных одной CRC
+        self.relearns = 0
+
+    @property
+    def locked(self) -> bool:
+        return self.variant is not None
+
+    def reset(self):
+        self.layout = self.variant = self.order = None
+        self._cand = None
+        self._streak = 0
+        self.fails = 0
+
+    def check(self, layout: str, special: bool, hdr: bytes, tbl: bytes, payload: bytes, tail_crc: bytes):
+        """(ok, вариант) для кадра с хвостом tail_crc."""
+        le = int.from_bytes(tail_crc, 'little')
+        be = int.from_bytes(tail_crc, 'big')
+        table = _CRC_SPECIAL if special else _CRC_PLAIN
+        locked = next((v for v in table if v[0] == self.variant), None)
+        if locked is not None:
+            name, parts, init, do_xor = locked
+            if _crc_of(parts, init, do_xor, hdr, tbl, payload) == (le if self.order == 'le' else be):
+                self.fails = 0
+                self.fast += 1
+                return True, name
+            self.fails += 1
+            if self.fails < self.relearn_after:
+                return False, self.variant
+            self.reset()
+            self.relearns += 1
+        self.probes += 1
+        for name, parts, init, do_xor in table:
+            c = _crc_of(parts, init, do_xor, hdr, tbl, payload)
+            if c == le or c == be:
+                self._learn((layout, name, 'le' if c == le else 'be'))
+                return True, name
+        self._cand = None
+        self._streak = 0
+        return False, None
+
+    def _learn(self, cand):
+        if cand == self._cand:
+            self._streak += 1
+        else:
+            self._cand, self._streak = cand, 1
+        if self._streak >= self.learn:
+            self.layout, self.variant, self.order = cand
+            self.fails = 0
+
+    def candidates(self, special: bool, hdr: bytes, tbl: bytes, payload: bytes) -> str:
+        """Все варианты CRC кадра — для сообщения об ошибке."""
+        table = _CRC_SPECIAL if special else _CRC_PLAIN
+        return '/'.join(f"{name}={_crc_of(parts, init, do_xor, hdr, tbl, payload):08x}" for name, parts, init, do_xor in table)
+
+
+def format_for(ser) -> FrameFormat:
+    """FrameFormat порта ser (живёт вместе с портом, как его CDCReader)."""
+    ff = getattr(ser, '_frame_format', None)
+    if ff is None:
+        ff = FrameFormat()
+        try:
+            ser._frame_format = ff
+        except Exception:
+            pass
+    return ff
+
+
 def read_frame(
     ser: serial.Serial,
     crc_strategy: str = 'auto',
@@ -22,6 +142,7 @@ def read_frame(
     frame_timeout_s: float | None = None,
     max_retries: int = 5,
     fast_drop: bool = False,
+    frame_format: FrameFormat | None = None,
 ) -> Dict:
     import time as _t
     deadline = _t.time() + frame_timeout_s if (frame_timeout_s and frame_timeout_s > 0) else None
@@ -34,10 +155,13 @@ def read_frame(
             raise TimeoutError('Frame timeout')
         return min(default, left)
 
+    # все чтения кадра — через буферизованный читатель порта (байты пачками, поиск MAGIC по буферу)
+    rd = USB_io.reader_for(ser)
+    ff = frame_format if frame_format is not None else format_for(ser)
     last_err: Exception | None = None
     for _ in range(max(1, max_retries)):
         USB_io.sync_to_magic(ser, max_wait_s=_remain(sync_wait_s))
-        hdr = USB_io.read_exact(ser, 16, 'header', timeout_s=_remain(io_timeout_s))
+        hdr = rd.take(16, 'header', timeout_s=_remain(io_timeout_s))
         if len(hdr) < 16:
             last_err = ValueError('Header too short')
             continue
@@ -52,9 +176,16 @@ def read_frame(
         b_table = a_total
         def _plausible(table_val: int) -> bool:
             return (table_val == 0) or (table_val % 4 == 0 and 0 < table_val <= 4096)
-        if _plausible(a_table) and not _plausible(b_table):
-            total_samples_hdr, table_bytes = a_total, a_table
+        # зафиксированная раскладка — пока её поле таблицы правдоподобно, без угадывания
+        if ff.layout == 'a' and _plausible(a_table):
+            layout = 'a'
+        elif ff.layout == 'b' and _plausible(b_table):
+            layout = 'b'
         elif _plausible(b_table) and not _plausible(a_table):
+            layout = 'b'
+        else:
+            layout = 'a'
+        if layout == 'b':
             total_samples_hdr, table_bytes = b_total, b_table
         else:
             total_samples_hdr, table_bytes = a_total, a_table
@@ -75,6 +206,7 @@ def read_frame(
         win_count = 0
         table_bytes_eff = table_bytes
         variant = 'auto'
+        crc_found = False     # CRC уже сошлась при поиске конца payload (fallback-ветки)
 
         per_ch_len_hdr = ((fmt & 0x0004) != 0)
         special_fmt = ((fmt & 0x1000) != 0) and (not per_ch_len_hdr)
@@ -93,12 +225,12 @@ def read_frame(
             payload_len = sum_len * channels * 2
             est = payload_len / bytes_per_sec + 0.5
             dyn_timeout = max(io_timeout_s, est)
-            payload = USB_io.read_exact(ser, payload_len, 'payload(diag)', timeout_s=_remain(dyn_timeout))
+            payload = rd.take(payload_len, 'payload(diag)', timeout_s=_remain(dyn_timeout))
             tail_crc = b''
             variant = 'none'
         elif special_fmt:
             try:
-                tbl = USB_io.read_exact(ser, 4, 'prelude', timeout_s=_remain(io_timeout_s))
+                tbl = rd.take(4, 'prelude', timeout_s=_remain(io_timeout_s))
             except Exception as e:
                 last_err = e
                 continue
@@ -124,13 +256,13 @@ def read_frame(
                         last_err = ValueError('Payload too large without CRC match (special fmt)')
                         break
                     try:
-                        more = USB_io.read_exact(ser, step, 'payload(step)', timeout_s=_remain(io_timeout_s))
+                        more = rd.take(step, 'payload(step)', timeout_s=_remain(io_timeout_s))
                     except Exception as e:
                         last_err = e
                         break
                     payload += more
                     try:
-                        crc_cand = USB_io.read_exact(ser, 4, 'crc32?', timeout_s=_remain(io_timeout_s))
+                        crc_cand = rd.take(4, 'crc32?', timeout_s=_remain(io_timeout_s))
                     except Exception as e:
                         last_err = e
                         break
@@ -158,7 +290,7 @@ def read_frame(
                         if c == cand_le or c == cand_be:
                             tail_crc = crc_cand
                             variant = name
-                            matched = True
+                            matched = crc_found = True
                             break
                     if matched:
                         break
@@ -181,7 +313,7 @@ def read_frame(
                     bytes_per_sec = 11520.0
                 est = payload_len / bytes_per_sec + 0.5
                 dyn_timeout = max(io_timeout_s, est)
-                payload = USB_io.read_exact(ser, payload_len, 'payload', timeout_s=_remain(dyn_timeout))
+                payload = rd.take(payload_len, 'payload', timeout_s=_remain(dyn_timeout))
                 tail_crc = b''
         elif per_ch_len_hdr:
             samples_per_ch = int(total_samples_hdr)
@@ -195,7 +327,7 @@ def read_frame(
                 if table_bytes_eff not in (channels * 2, channels * 4):
                     last_err = ValueError(f'Unexpected table_bytes for per-ch starts: {table_bytes_eff}, ch={channels}')
                     continue
-                tbl = USB_io.read_exact(ser, table_bytes_eff, 'per-ch starts/len', timeout_s=_remain(io_timeout_s))
+                tbl = rd.take(table_bytes_eff, 'per-ch starts/len', timeout_s=_remain(io_timeout_s))
                 if table_bytes_eff == channels * 2:
                     for i in range(channels):
                         s = struct.unpack_from('<H', tbl, i * 2)[0]
@@ -220,8 +352,8 @@ def read_frame(
                 bytes_per_sec = 11520.0
             est = payload_len / bytes_per_sec + 0.5
             dyn_timeout = max(io_timeout_s, est)
-            payload = USB_io.read_exact(ser, payload_len, 'payload', timeout_s=_remain(dyn_timeout))
-            tail_crc = USB_io.read_exact(ser, 4, 'crc32', timeout_s=_remain(io_timeout_s))
+            payload = rd.take(payload_len, 'payload', timeout_s=_remain(dyn_timeout))
+            tail_crc = rd.take(4, 'crc32', timeout_s=_remain(io_timeout_s))
         else:
             if table_bytes_eff == 0:
                 win_count = 1
@@ -231,7 +363,7 @@ def read_frame(
                     last_err = ValueError(f'Bad table_bytes: {table_bytes_eff}')
                     continue
                 win_count = table_bytes_eff // 4
-                tbl = USB_io.read_exact(ser, table_bytes_eff, 'window table', timeout_s=_remain(io_timeout_s))
+                tbl = rd.take(table_bytes_eff, 'window table', timeout_s=_remain(io_timeout_s))
                 sum_len = 0
                 sum_len_alt = 0
                 win_lengths.clear()
@@ -255,8 +387,8 @@ def read_frame(
                     bytes_per_sec = 11520.0
                 est = payload_len / bytes_per_sec + 0.5
                 dyn_timeout = max(io_timeout_s, est)
-                payload = USB_io.read_exact(ser, payload_len, 'payload', timeout_s=_remain(dyn_timeout))
-                tail_crc = USB_io.read_exact(ser, 4, 'crc32', timeout_s=_remain(io_timeout_s))
+                payload = rd.take(payload_len, 'payload', timeout_s=_remain(dyn_timeout))
+                tail_crc = rd.take(4, 'crc32', timeout_s=_remain(io_timeout_s))
             else:
                 payload_len = sum_len * channels * 2
                 if 0 < sum_len <= 32768:
@@ -267,8 +399,8 @@ def read_frame(
                         bytes_per_sec = 11520.0
                     est = payload_len / bytes_per_sec + 0.5
                     dyn_timeout = max(io_timeout_s, est)
-                    payload = USB_io.read_exact(ser, payload_len, 'payload', timeout_s=_remain(dyn_timeout))
-                    tail_crc = USB_io.read_exact(ser, 4, 'crc32', timeout_s=_remain(io_timeout_s))
+                    payload = rd.take(payload_len, 'payload', timeout_s=_remain(dyn_timeout))
+                    tail_crc = rd.take(4, 'crc32', timeout_s=_remain(io_timeout_s))
                 else:
                     if fast_drop:
                         last_err = ValueError('fast_drop: skip CRC search fallback')
@@ -280,13 +412,13 @@ def read_frame(
                             last_err = ValueError('Payload too large without CRC match (fallback)')
                             break
                         try:
-                            more = USB_io.read_exact(ser, step, 'payload(step)', timeout_s=_remain(io_timeout_s))
+                            more = rd.take(step, 'payload(step)', timeout_s=_remain(io_timeout_s))
                         except Exception as e:
                             last_err = e
                             break
                         payload += more
                         try:
-                            crc_cand = USB_io.read_exact(ser, 4, 'crc32?', timeout_s=_remain(io_timeout_s))
+                            crc_cand = rd.take(4, 'crc32?', timeout_s=_remain(io_timeout_s))
                         except Exception as e:
                             last_err = e
                             break
@@ -306,7 +438,7 @@ def read_frame(
                             if c == cand_le or c == cand_be:
                                 tail_crc = crc_cand
                                 variant = name
-                                matched = True
+                                matched = crc_found = True
                                 break
                         if matched:
                             break
@@ -314,72 +446,20 @@ def read_frame(
                     if not payload or not tail_crc:
                         continue
 
-        # 5) CRC
-        if diag_fake:
+        # 5) CRC: в зафиксированном формате — одна CRC32, иначе полная проба (FrameFormat)
+        special_body = special_fmt and not diag_fake
+        if diag_fake or (special_fmt and len(tail_crc) == 0):
             crc_ok = True
             variant = 'none'
-            crc_val = 0
-        elif special_fmt and len(tail_crc) == 0:
+        elif crc_strategy == 'none' and not special_fmt:
             crc_ok = True
             variant = 'none'
-            crc_val = 0
-        else:
-            crc_val = int.from_bytes(tail_crc, 'little') & 0xFFFFFFFF
-            crc_ok = False
-            variant = 'auto'
-        if crc_strategy == 'none' and not (special_fmt or diag_fake):
+        elif crc_found:
             crc_ok = True
-            variant = 'none'
         else:
-            bodies = (
-                [
-                    ('incl+tbl', USB_proto.MAGIC + hdr + tbl + payload, 0, False),
-                    ('incl-ff+tbl', USB_proto.MAGIC + hdr + tbl + payload, 0xFFFFFFFF, True),
-                    ('excl+tbl', hdr + tbl + payload, 0, False),
-                    ('excl-ff+tbl', hdr + tbl + payload, 0xFFFFFFFF, True),
-                ] if (special_fmt and not diag_fake) else []
-            ) + [
-                ('incl', USB_proto.MAGIC + hdr + (payload if special_fmt else (tbl + payload)), 0, False),
-                ('incl-ff', USB_proto.MAGIC + hdr + (payload if special_fmt else (tbl + payload)), 0xFFFFFFFF, True),
-                ('excl', hdr + (payload if special_fmt else (tbl + payload)), 0, False),
-                ('excl-ff', hdr + (payload if special_fmt else (tbl + payload)), 0xFFFFFFFF, True),
-                ('payload', payload, 0, False),
-                ('payload-ff', payload, 0xFFFFFFFF, True),
-                ('tbl+payload', tbl + payload, 0, False),
-                ('tbl+payload-ff', tbl + payload, 0xFFFFFFFF, True),
-            ]
-            for name, body, init, do_xor in bodies:
-                c = zlib.crc32(body, init) & 0xFFFFFFFF
-                if do_xor:
-                    c = (c ^ 0xFFFFFFFF) & 0xFFFFFFFF
-                if c == crc_val or c == int.from_bytes(tail_crc, 'big'):
-                    crc_ok = True
-                    variant = name
-                    break
+            crc_ok, variant = ff.check(layout, special_body, hdr, tbl, payload, tail_crc)
         if not crc_ok:
-            bodies = (
-                [
-                    ('incl+tbl', USB_proto.MAGIC + hdr + tbl + payload, 0, False),
-                    ('incl-ff+tbl', USB_proto.MAGIC + hdr + tbl + payload, 0xFFFFFFFF, True),
-                    ('excl+tbl', hdr + tbl + payload, 0, False),
-                    ('excl-ff+tbl', hdr + tbl + payload, 0xFFFFFFFF, True),
-                ] if (special_fmt and not diag_fake) else []
-            ) + [
-                ('incl', USB_proto.MAGIC + hdr + (payload if special_fmt else (tbl + payload)), 0, False),
-                ('incl-ff', USB_proto.MAGIC + hdr + (payload if special_fmt else (tbl + payload)), 0xFFFFFFFF, True),
-                ('excl', hdr + (payload if special_fmt else (tbl + payload)), 0, False),
-                ('excl-ff', hdr + (payload if special_fmt else (tbl + payload)), 0xFFFFFFFF, True),
-                ('payload', payload, 0, False),
-                ('payload-ff', payload, 0xFFFFFFFF, True),
-                ('tbl+payload', tbl + payload, 0, False),
-                ('tbl+payload-ff', tbl + payload, 0xFFFFFFFF, True),
-            ]
-            cand = []
-            for name, body, init, do_xor in bodies:
-                c = zlib.crc32(body, init) & 0xFFFFFFFF
-                if do_xor:
-                    c = (c ^ 0xFFFFFFFF) & 0xFFFFFFFF
-                cand.append(f"{name}={c:08x}")
+            crc_val = int.from_bytes(tail_crc, 'little') & 0xFFFFFFFF
             try:
                 total_samples_for_crc = (sum_len if (table_bytes_eff != 0 and not special_fmt and not diag_fake) else int(len(payload)//2//max(1,channels)))
             except Exception:
@@ -388,7 +468,8 @@ def read_frame(
                 'CRC mismatch: '
                 f"seq={seq}, wins={win_count}, msec={msec}, total={total_samples_for_crc}, "
                 f"hdr16={hex_bytes(hdr, 16)}, tbl_head={hex_bytes(tbl, 16)}, "
-                f"payload_head={hex_bytes(payload, 16)}, crc_le={crc_val:08x}, cand={'/'.join(cand)}"
+                f"payload_head={hex_bytes(payload, 16)}, crc_le={crc_val:08x}, "
+                f"locked={variant or '-'}, cand={ff.candidates(special_body, hdr, tbl, payload)}"
             )
             continue
 
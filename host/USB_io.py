@@ -2,16 +2,17 @@
 from __future__ import annotations
 import glob
 import os
+import threading
 import time
 from typing import Optional
 import serial  # type: ignore[import-not-found]
 
-# RX стэш, чтобы не терять байты между пробниками
-RX_STASH = bytearray()
-
 MAGIC = b"\x5A\xA5"
 ALT_MAGIC = b"\xA5\x5A"
 OPEN_RTS_LEVEL = None  # None — не трогаем, True/False — установить
+READ_CHUNK = 1 << 16      # максимум байт за одно чтение порта (сколько есть в in_waiting)
+COMPACT_AT = 1 << 20      # сдвигать буфер CDCReader, когда прочитанная голова больше этого
+SCAN_IDLE_S = 0.25        # CDCReader.scanning(): find_magic() вызывался не раньше, чем столько секунд назад
 
 
 def wait_for_cdc_port(port_arg: str, poll_interval: float = 0.5) -> str:
@@ -136,85 +137,178 @@ def open_serial(port: str, timeout: float = 1.0, baudrate: int | None = None) ->
     return ser
 
 
+class CDCReader:
+    """Буферизованное чтение порта (CDC или VendorIO): вместо побайтовых/32-байтных
+    ser.read() байты забираются пачками (всё, что есть в in_waiting, до READ_CHUNK)
+    в один bytearray, а разбор идёт по нему: find_magic()/take(n)/read(n).
+
+    Один читатель на порт (reader_for(ser)), поэтому байты, прочитанные «про запас»
+    при поиске MAGIC, не теряются между вызовами и не нужен глобальный стэш.
+    Прочитанная голова буфера не удаляется на каждом take() — только позиция _pos
+    сдвигается; буфер уплотняется, когда голова перерастает COMPACT_AT.
+    """
+
+    def __init__(self, ser, chunk: int = READ_CHUNK):
+        self.ser = ser
+        self.chunk = int(chunk)
+        self._buf = bytearray()
+        self._pos = 0
+        self.bytes_in = 0      # всего принято с порта
+        self.reads = 0         # вызовов ser.read()
+        self.on_skip = None    # on_skip(bytes) — байты, пропущенные find_magic() (ответы на команды между кадрами)
+        self.lock = threading.RLock()   # читатель кадров (поток) и клиент команд читают порт по очереди
+        self.t_scan = 0.0      # time.time() последнего find_magic()
+
+    def __len__(self) -> int:
+        return len(self._buf) - self._pos
+
+    def scanning(self, idle_s: float = SCAN_IDLE_S) -> bool:
+        """Порт сейчас читает разбор кадров (find_magic() был недавно)."""
+        return time.time() - self.t_scan < idle_s
+
+    def _compact(self):
+        if self._pos >= COMPACT_AT or (self._pos and self._pos == len(self._buf)):
+            del self._buf[:self._pos]
+            self._pos = 0
+
+    def fill(self, need: int = 1) -> int:
+        """Одно чтение порта: не меньше need байт (если успеют до ser.timeout) и всё, что уже
+        лежит в in_waiting. Возвращает, сколько байт добавлено."""
+        ser = self.ser
+        try:
+            avail = int(getattr(ser, 'in_waiting', 0) or 0)
+        except Exception:
+            avail = 0
+        n = max(1, int(need), min(avail, self.chunk))
+        b = ser.read(n)
+        self.reads += 1
+        if b:
+            self._compact()
+            self._buf += b
+            self.bytes_in += len(b)
+        return len(b) if b else 0
+
+    def read(self, n: int) -> bytes:
+        """Как ser.read(n): до n байт — из буфера, а если он пуст, после одного чтения порта."""
+        with self.lock:
+            if not len(self):
+                self.fill(n)
+            k = min(n, len(self))
+            out = bytes(self._buf[self._pos:self._pos + k])
+            self._pos += k
+            return out
+
+    def take(self, n: int, what: str = 'bytes', timeout_s: Optional[float] = None) -> bytes:
+        """Ровно n байт или TimeoutError. Таймаут «скользящий»: продлевается при поступлении данных."""
+        with self.lock:
+            if len(self) < n:
+                ser = self.ser
+                idle = timeout_s if (timeout_s and timeout_s > 0) else max(getattr(ser, 'timeout', 0) or 0, 1.0)
+                deadline = time.time() + idle
+                while len(self) < n:
+                    if time.time() > deadline:
+                        raise TimeoutError(f'Timeout while reading {what}')
+                    if self.fill(n - len(self)):
+                        deadline = time.time() + idle
+                    else:
+                        time.sleep(0.001)
+            p = self._pos
+            self._pos = p + n
+            return bytes(self._buf[p:p + n])
+
+    def find_magic(self, magics: tuple[bytes, ...] = (MAGIC,), max_wait_s: float = 3.0,
+                   consume: bool = True) -> bytes | None:
+        """Сдвинуться к ближайшей из magics (поиск — bytearray.find по буферу, без копий).
+        consume=False — оставить MAGIC в буфере (следующий take() начнётся с неё).
+        None — не нашли до таймаута (всё, кроме хвоста длиной MAGIC-1, отброшено)."""
+        with self.lock:
+            keep = max(len(m) for m in magics) - 1
+            deadline = time.time() + (max_wait_s if max_wait_s and max_wait_s > 0 else 2.0)
+            while True:
+                self.t_scan = time.time()
+                buf = self._buf
+                best = -1; found = None
+                for m in magics:
+                    i = buf.find(m, self._pos)
+                    if i >= 0 and (best < 0 or i < best):
+                        best, found = i, m
+                if found is not None:
+                    if self.on_skip is not None and best > self._pos:
+                        self.on_skip(bytes(buf[self._pos:best]))
+                    self._pos = best + (len(found) if consume else 0)
+                    return found
+                skip_to = max(self._pos, len(buf) - keep)
+                if self.on_skip is not None and skip_to > self._pos:
+                    self.on_skip(bytes(buf[self._pos:skip_to]))
+                self._pos = skip_to
+                if time.time() > deadline:
+                    return None
+                try:
+                    # без in_waiting (VendorIO) — хотя бы пакет, а не по байту
+                    got = self.fill(1 if hasattr(self.ser, 'in_waiting') else 64)
+                except (serial.SerialException, OSError):
+                    time.sleep(0.002); continue
+                if not got:
+                    time.sleep(0.001)
+
+    def push_front(self, data: bytes) -> None:
+        """Вернуть байты в начало: их прочитает следующий take()/find_magic()."""
+        with self.lock:
+            if not data:
+                return
+            n = len(data)
+            if self._pos >= n:
+                self._buf[self._pos - n:self._pos] = data
+                self._pos -= n
+            else:
+                self._buf[self._pos:self._pos] = data
+
+    def clear(self) -> None:
+        with self.lock:
+            self._buf.clear()
+            self._pos = 0
+
+
+def reader_for(ser) -> CDCReader:
+    """CDCReader порта ser (создаётся при первом обращении и живёт вместе с портом)."""
+    rd = getattr(ser, '_cdc_reader', None)
+    if rd is None or rd.ser is not ser:
+        rd = CDCReader(ser)
+        try:
+            ser._cdc_reader = rd
+        except Exception:
+            pass
+    return rd
+
+
 def read_exact(ser: serial.Serial, n: int, what: str = 'bytes', timeout_s: Optional[float] = None) -> bytes:
-    """Читает ровно n байт или кидает TimeoutError.
+    """Читает ровно n байт или кидает TimeoutError (через CDCReader порта).
     Таймаут «скользящий»: дедлайн продлевается при каждом поступлении данных.
     """
-    buf = bytearray()
-    # Сначала из локального стэша
-    global RX_STASH
-    if RX_STASH:
-        take = min(n, len(RX_STASH))
-        buf.extend(RX_STASH[:take])
-        del RX_STASH[:take]
-        n -= take
-        if n <= 0:
-            return bytes(buf)
-    idle = timeout_s if (timeout_s and timeout_s > 0) else max(ser.timeout or 0, 1.0)
-    deadline = time.time() + idle
-    while n > 0:
-        if time.time() > deadline:
-            raise TimeoutError(f'Timeout while reading {what}')
-        chunk = ser.read(n)
-        if not chunk:
-            # маленькая пауза и ещё попытка
-            time.sleep(0.001)
-            continue
-        buf.extend(chunk)
-        n -= len(chunk)
-        # продлеваем дедлайн при прогрессе
-        deadline = time.time() + idle
-    return bytes(buf)
+    return reader_for(ser).take(n, what, timeout_s)
 
 
 def sync_to_magic(ser: serial.Serial, max_wait_s: float = 3.0, *, allow_alt_vendor: bool = False) -> bytes:
-    prev = b''
-    # Если в стэше уже есть байты, учтём их при поиске MAGIC
-    global RX_STASH
-    if RX_STASH:
-        prev = bytes(RX_STASH)
-        RX_STASH.clear()
-    deadline = time.time() + (max_wait_s if max_wait_s and max_wait_s > 0 else 2.0)
-    while True:
-        if time.time() > deadline:
-            try:
-                avail = getattr(ser, 'in_waiting', 0)
-                if avail:
-                    peek = ser.read(min(64, avail))
-                    print(f"[sync] timeout, in_waiting={avail}, peek[:32]={' '.join(f'{x:02x}' for x in peek[:32])}")
-            except Exception:
-                pass
-            if allow_alt_vendor:
-                raise TimeoutError('Timeout while searching magic 0x5A 0xA5/0xA5 0x5A')
-            else:
-                raise TimeoutError('Timeout while searching magic 0x5A 0xA5')
-        try:
-            b = ser.read(32)
-        except (serial.SerialException, OSError):
-            time.sleep(0.002); continue
-        if not b:
-            continue
-        data = prev + b
-        idx = data.find(MAGIC)
-        if idx >= 0:
-            tail = data[idx+2:]
-            if tail:
-                RX_STASH[:0] = tail
-            return MAGIC
-        if data.find(ALT_MAGIC) >= 0:
-            if allow_alt_vendor:
-                tail = data[data.find(ALT_MAGIC)+2:]
-                if tail:
-                    RX_STASH[:0] = tail
-                return ALT_MAGIC
-            else:
-                print('[sync] Найдена последовательность A5 5A (ALT_MAGIC). Продолжаю поиск 5A A5')
-        prev = data[-1:]
+    rd = reader_for(ser)
+    if allow_alt_vendor:
+        found = rd.find_magic((MAGIC, ALT_MAGIC), max_wait_s)
+    else:
+        found = rd.find_magic((MAGIC,), max_wait_s)
+    if found is not None:
+        return found
+    try:
+        avail = getattr(ser, 'in_waiting', 0)
+        if avail:
+            peek = ser.read(min(64, avail))
+            print(f"[sync] timeout, in_waiting={avail}, peek[:32]={' '.join(f'{x:02x}' for x in peek[:32])}")
+    except Exception:
+        pass
+    if allow_alt_vendor:
+        raise TimeoutError('Timeout while searching magic 0x5A 0xA5/0xA5 0x5A')
+    else:
+        raise TimeoutError('Timeout while searching magic 0x5A 0xA5')
 
 
-def push_rx_front(data: bytes) -> None:
-    """Возвращает байты в начало RX_STASH, чтобы их прочитал следующий вызов read_exact/sync."""
-    if not data:
-        return
-    global RX_STASH
-    RX_STASH[:0] = data
+def push_rx_front(ser: serial.Serial, data: bytes) -> None:
+    """Возвращает байты в начало буфера порта, чтобы их прочитал следующий вызов read_exact/sync."""
+    reader_for(ser).push_front(data)
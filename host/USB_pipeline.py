@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""USB_pipeline.py — конвейер приёма CDC-кадров: поток-читатель → ограниченная очередь → потребитель.
+
+Поток-читатель только разбирает кадры (USB_frame.read_frame) и кладёт их в очередь,
+поэтому медленный вывод (CSV, печать в терминал) не останавливает чтение порта
+и не переполняет буфер ОС. Политика при полной очереди:
+  block    — читатель ждёт потребителя (ничего не теряется, буфер — сама очередь);
+  drop_new — новый кадр отбрасывается;
+  drop_old — вытесняется самый старый кадр в очереди.
+
+Потребитель итерирует FrameReader: for frame in reader: ...; по выходу из цикла
+reader.error — причина остановки читателя (TimeoutError/Exception) или None.
+stop() ждёт, пока поток-читатель выйдет (не дольше одного read_frame — его таймаутов),
+поэтому порт можно закрывать сразу после него.
+
+Кадры: frames — разобрано читателем, delivered — выдано потребителю, dropped — отброшено
+политикой очереди (и брошено при остановке); frames = delivered + dropped + оставшиеся в очереди.
+
+Счётчики по стадиям (мс/кадр): read — разбор кадра, put — ожидание места в очереди
+(block), queue — время кадра в очереди, out — обработка кадра потребителем.
+summary() — строка за интервал с прошлого вызова.
+"""
+from __future__ import annotations
+import queue
+import threading
+import time
+
+import USB_frame
+
+POLICIES = ('block', 'drop_new', 'drop_old')
+QUEUE_SIZE = 64
+_END = object()
+
+
+class FrameReader:
+    """Поток-читатель кадров порта ser в очередь maxsize; read_kw — аргументы read_frame.
+    stop_on_error=False — ошибки и таймауты только считаются, чтение продолжается."""
+    def __init__(self, ser, maxsize: int = QUEUE_SIZE, policy: str = 'block', stop_on_error: bool = True, **read_kw):
+        if policy not in POLICIES:
+            raise ValueError(f'неизвестная политика очереди: {policy}')
+        self.ser = ser
+        self.policy = policy
+        self.stop_on_error = stop_on_error
+        self.read_kw = read_kw
+        self.q: "queue.Queue" = queue.Queue(maxsize=max(1, int(maxsize)))
+        self.error: Exception | None = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._th: threading.Thread | None = None
+        # всего с начала
+        self.frames = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.q_max = 0
+        # за интервал summary(): [сумма секунд, число]
+        self._acc = {k: [0.0, 0] for k in ('read', 'put', 'queue', 'out')}
+
+    def _add(self, stage: str, dt: float):
+        with self._lock:
+            a = self._acc[stage]
+            a[0] += dt; a[1] += 1
+
+    def start(self) -> 'FrameReader':
+        self._th = threading.Thread(target=self._run, name='frame-reader', daemon=True)
+        self._th.start()
+        return self
+
+    def stop(self, timeout: float | None = None):
+        """Остановить читатель и дождаться выхода потока (timeout=None — без ограничения)."""
+        self._stop.set()
+        th = self._th
+        if th is not None and th is not threading.current_thread():
+            th.join(timeout)
+
+    def _put(self, item) -> bool:
+        """Положить элемент по политике; False — кадр отброшен (или остановка во время ожидания)."""
+        q = self.q
+        if self.policy == 'block' or item is _END:
+            t0 = time.perf_counter()
+            put = False
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    put = True
+                    break
+                except queue.Full:
+                    continue
+            if item is not _END:
+                self._add('put', time.perf_counter() - t0)
+            return put
+        try:
+            q.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        if self.policy == 'drop_new':
+            return False
+        try:
+            q.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            return False
+        return True
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    frame = USB_frame.read_frame(self.ser, **self.read_kw)
+                except TimeoutError as e:
+                    self.timeouts += 1
+                    if self.stop_on_error:
+                        self.error = e
+                        break
+                    continue
+                except Exception as e:
+                    self.errors += 1
+                    if self.stop_on_error:
+                        self.error = e
+                        break
+                    continue
+                t1 = time.perf_counter()
+                self._add('read', t1 - t0)
+                self.frames += 1
+                if self._put((t1, frame)):
+                    n = self.q.qsize()
+                    if n > self.q_max:
+                        self.q_max = n
+                else:
+                    self.dropped += 1
+        finally:
+            if not self._put(_END):
+                self._put_end_now()
+
+    def _put_end_now(self):
+        """После stop() места не ждём: конец кладётся сразу, при полной очереди — вместо старейшего кадра."""
+        try:
+            self.q.put_nowait(_END)
+            return
+        except queue.Full:
+            pass
+        try:
+            self.q.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self.q.put_nowait(_END)
+        except queue.Full:
+            pass
+
+    def __iter__(self):
+        """Кадры по порядку, пока читатель не остановится; время между выдачами — стадия out."""
+        if self._th is None:
+            self.start()
+        try:
+            while True:
+                try:
+                    item = self.q.get(timeout=0.2)   # с таймаутом — чтобы Ctrl+C ловился
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    return
+                t_put, frame = item
+                t0 = time.perf_counter()
+                self._add('queue', t0 - t_put)
+                self.delivered += 1
+                yield frame
+                self._add('out', time.perf_counter() - t0)
+        finally:
+            self.stop()
+
+    def summary(self) -> str:
+        """Средние по стадиям за интервал с прошлого вызова и счётчики очереди."""
+        with self._lock:
+            parts = []
+            for k, a in self._acc.items():
+                parts.append(f"{k} {1e3 * a[0] / a[1]:.3f}" if a[1] else f"{k} -")
+                a[0] = 0.0; a[1] = 0
+        return (f"{' | '.join(parts)} мс/кадр | q {self.q.qsize()}/{self.q.maxsize} max {self.q_max} "
+                f"| frames={self.frames} delivered={self.delivered} dropped={self.dropped} "
+                f"err={self.errors} tmo={self.timeouts}")
@@ -59,11 +59,13 @@ def run_plot_fast(
         q: "queue.Queue[np.ndarray]" = queue.Queue(maxsize=4)
         stop = False
 
+        rd = USB_io.reader_for(ser)
+
         def reader():
             nonlocal stop
             while not stop:
                 try:
-                    raw = USB_io.read_exact(ser, samples * 4, timeout_s=1.0)
+                    raw = rd.take(samples * 4, timeout_s=1.0)
                     arr = np.frombuffer(raw, dtype='<i2').reshape(-1, 2)
                     q.put(arr, timeout=0.1)
                 except Exception:
@@ -298,6 +300,8 @@ def run_plot_fast_frames(
             'parse_ms_acc': 0.0, 'send_ms_acc': 0.0, 'q_ms_acc': 0.0, 'timed_frames': 0,
         }
 
+        rd = USB_io.reader_for(ser)
+
         def reader():
             nonlocal stop
             err_since = 0; last_log = 0.0
@@ -312,16 +316,18 @@ def run_plot_fast_frames(
                             reader._vn_half = {}
                         half = reader._vn_half  # type: ignore[attr-defined]
 
-                        # Синхронизация по 0x5A 0xA5 (LE от 0xA55A)
-                        USB_io.sync_to_magic(ser, max_wait_s=2.0)
-                        hdr = USB_io.read_exact(ser, 32, 'vnd-hdr', timeout_s=1.0)
+                        # Синхронизация по 0x5A 0xA5 (LE от 0xA55A); MAGIC остаётся в буфере —
+                        # это первые 2 байта 32-байтного заголовка
+                        if rd.find_magic(max_wait_s=2.0, consume=False) is None:
+                            raise TimeoutError('Timeout while searching magic 0x5A 0xA5')
+                        hdr = rd.take(32, 'vnd-hdr', timeout_s=1.0)
                         (magic, ver, flags, seq, ts, total_samples,
                          zone_count, zone1_off, zone1_len, reserved, reserved2, crc16v) = _st.unpack('<H B B I I H H I I I H H', hdr)
                         if magic != 0xA55A:
                             # неверная магия — ресинхронизация
                             raise TimeoutError('bad vendor magic')
                         payload_len = int(total_samples) * 2
-                        payload = USB_io.read_exact(ser, payload_len, 'vnd-payload', timeout_s=1.0)
+                        payload = rd.take(payload_len, 'vnd-payload', timeout_s=1.0)
                         # Флаги АЦП: ровно один из {0x01 (ADC0), 0x02 (ADC1)} установлен в рабочих кадрах
                         if (flags & 0x01):
                             adc_id = 0
@@ -6,6 +6,8 @@ import zlib
 from typing import Optional, Tuple
 import serial  # type: ignore[import-not-found]
 
+from usb_vendor.control import cdc_client, RSP_ACK, RSP_NACK, RSP_STATUS  # type: ignore
+
 # Команды
 CMD_PING         = 0x01
 CMD_SET_WINDOWS  = 0x10  # payload: start0(uint16), len0(uint16), start1(uint16), len1(uint16), LE
@@ -14,10 +16,7 @@ CMD_START        = 0x20
 CMD_STOP         = 0x21
 CMD_GET_STATUS   = 0x30
 
-# Ответы
-RSP_ACK    = 0x80
-RSP_NACK   = 0x81
-RSP_STATUS = 0x82
+# Ответы: RSP_ACK (0x80) / RSP_NACK (0x81) / RSP_STATUS (0x82) — из usb_vendor.control
 
 # MAGIC кадра
 MAGIC = b"\x5A\xA5"
@@ -41,62 +40,29 @@ def send_cmd(
     stream_aware: bool = False,
     timeout: float = 1.0,
 ):
-    ser.write(bytes([cmd]) + payload)
-    ser.flush()
+    """Команда через общий клиент порта (usb_vendor.control): ответ читается через
+    буфер CDCReader порта, а в stream_aware ACK ищется среди байт между кадрами
+    (их подаёт разбор кадров, а если он не идёт — порт читается здесь же)."""
     if not expect_ack:
+        ser.write(bytes([cmd]) + payload)
+        ser.flush()
         return None
-
-    if not stream_aware:
-        b = ser.read(1)
-        if not b:
-            raise TimeoutError("Timeout while reading rsp id")
-        if b[0] == RSP_ACK:
-            echo = ser.read(1)
-            if not echo:
-                raise TimeoutError("Timeout while reading ack echo")
-            if echo[0] != cmd:
-                raise RuntimeError(f"ACK echo mismatch: got 0x{echo[0]:02X}, expected 0x{cmd:02X}")
-            return ("ACK", None)
-        elif b[0] == RSP_NACK:
-            echo = ser.read(1)
-            code = ser.read(1)
-            if not echo or not code:
-                raise TimeoutError("Timeout while reading nack body")
-            return ("NACK", code[0])
-        elif b[0] == RSP_STATUS:
-            ser.timeout, t_old = 0.02, ser.timeout
-            try:
-                rest = ser.read(256)
-            finally:
-                ser.timeout = t_old
-            return ("STATUS", bytes(rest))
-        else:
-            raise RuntimeError(f"Unknown response id: 0x{b[0]:02X}")
-    else:
-        # stream-aware: читаем с короткими таймаутами, не валим сессию на таймауте
-        t_old = ser.timeout
-        try:
-            ser.timeout = timeout
-            b = ser.read(1)
-            if not b:
-                raise TimeoutError("Timeout while reading rsp id")
-            if b[0] == RSP_ACK:
-                echo = ser.read(1)
-                if not echo:
-                    raise TimeoutError("Timeout while reading ack echo")
-                return ("ACK", None)
-            elif b[0] == RSP_NACK:
-                echo = ser.read(1); code = ser.read(1)
-                if not echo or not code:
-                    raise TimeoutError("Timeout while reading nack body")
-                return ("NACK", code[0])
-            elif b[0] == RSP_STATUS:
-                rest = ser.read(256)
-                return ("STATUS", bytes(rest))
-            else:
-                return ("UNKNOWN", b[0])
-        finally:
-            ser.timeout = t_old
+    cl = cdc_client(ser)
+    if stream_aware:
+        return cl.send(cmd, payload, timeout=timeout, stream_aware=True)
+    t = getattr(ser, 'timeout', None)
+    res = cl.send(cmd, payload, timeout=(t if t else timeout), stream_aware=False)
+    if res[0] == "MISMATCH":
+        raise RuntimeError(f"ACK echo mismatch: got 0x{res[1]:02X}, expected 0x{cmd:02X}")
+    if res[0] == "UNKNOWN":
+        raise RuntimeError(f"Unknown response id: 0x{res[1]:02X}")
+    return res
+
+
+def send_burst(ser: serial.Serial, cmds, *, stream_aware: bool = False, timeout: float = 1.0):
+    """Несколько команд одной записью, ответы — по эху cmd: [('ACK', None) | ('NACK', code) | …]."""
+    cl = cdc_client(ser)
+    return cl.wait(cl.burst(cmds), timeout=timeout, stream_aware=stream_aware)
 
 
 def send_cmd_no_ack(ser: serial.Serial, cmd: int, payload: bytes = b""):
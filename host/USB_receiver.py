@@ -11,6 +11,8 @@ import USB_io
 import USB_proto
 import USB_frame
 import USB_plot
+import USB_pipeline
+import USB_export
 import json
 
 
@@ -62,9 +64,14 @@ def main():
     parser.add_argument("--print-csv", action="store_true", help="Печатать данные кадра в CSV (seq,index,<ch0>..<chN>)")
     parser.add_argument("--csv-header", action="store_true", help="Печатать заголовок CSV один раз")
     parser.add_argument("--csv-limit", type=int, default=0, help="Лимит строк CSV на кадр (0 = весь кадр)")
+    parser.add_argument("--export", type=str, default="", help="Выгружать кадры в файл ('-' = stdout) в формате --export-format")
+    parser.add_argument("--export-format", choices=USB_export.FORMATS, default='csv', help="csv (как --print-csv), raw (int16 LE), npy, parquet (нужен pyarrow)")
     parser.add_argument("--print-head-i16", type=int, default=0, help="Печатать первые N значений int16 на канал для кадра")
     parser.add_argument("--print-head-hex", type=int, default=0, help="Печатать первые N байт payload в hex для кадра")
     parser.add_argument("--max-frames", type=int, default=0, help="Остановиться после N кадров (0 = без ограничений)")
+    parser.add_argument("--queue-size", type=int, default=USB_pipeline.QUEUE_SIZE, help="Кадров в очереди между потоком чтения и выводом")
+    parser.add_argument("--queue-policy", choices=USB_pipeline.POLICIES, default='block', help="Полная очередь: block — читатель ждёт, drop_new/drop_old — отбросить новый/старый кадр")
+    parser.add_argument("--stats-sec", type=float, default=1.0, help="Период печати счётчиков конвейера в stderr (0 = только итог сессии)")
     parser.add_argument("--print-raw-loop", action="store_true", help="Непрерывно печатать сырые байты из порта (hex)")
     parser.add_argument("--line-bytes", type=int, default=32, help="Сколько байт показывать в строке при raw-loop")
     parser.add_argument("--sync-first", action="store_true", help="Перед raw-loop выровняться по MAGIC (5A A5)")
@@ -113,7 +120,7 @@ def main():
     if not (
         args.sniff or args.dump_raw or args.probe_frame or args.plot or args.plot_fast or args.plot_fast_frames
         or (getattr(args, 'print_csv', False)) or (getattr(args, 'print_head_i16', 0) and args.print_head_i16 > 0)
-        or (getattr(args, 'print_head_hex', 0) and args.print_head_hex > 0)
+        or (getattr(args, 'print_head_hex', 0) and args.print_head_hex > 0) or args.export
     ):
         # Режим работы из конфигурации
         mode = cfg_get('mode', '')
@@ -124,7 +131,7 @@ def main():
         elif mode == 'plot-fast-frames':
             args.plot_fast_frames = True
     # Если заданы флаги печати — выключаем любые plot-режимы (приоритет печати)
-    if (getattr(args, 'print_csv', False)) or (getattr(args, 'print_head_i16', 0) and args.print_head_i16 > 0) or (getattr(args, 'print_head_hex', 0) and args.print_head_hex > 0):
+    if (getattr(args, 'print_csv', False)) or (getattr(args, 'print_head_i16', 0) and args.print_head_i16 > 0) or (getattr(args, 'print_head_hex', 0) and args.print_head_hex > 0) or args.export:
         args.plot = False
         args.plot_fast = False
         args.plot_fast_frames = False
@@ -298,9 +305,10 @@ def main():
             status_bytes = b''
             status_block = b''
             t_stat_deadline = time.time() + 2.0
+            rd = USB_io.reader_for(ser)  # байты после фейковых кадров уже могут лежать в буфере читателя
             while time.time() < t_stat_deadline and not status_block:
                 try:
-                    chunk = ser.read(64)
+                    chunk = rd.read(64)
                 except Exception:
                     chunk = b''
                 if not chunk:
@@ -402,9 +410,10 @@ def main():
             print(f"[raw-loop] Чтение из {port}. Ctrl+C для остановки.")
             ln = int(max(1, args.line_bytes))
             buf = b''
+            rd = USB_io.reader_for(ser)  # продолжаем с байта после MAGIC, а не с порта
             while True:
                 try:
-                    chunk = ser.read(512)
+                    chunk = rd.read(512)
                     if chunk:
                         buf += chunk
                         while len(buf) >= ln:
@@ -623,29 +632,22 @@ def main():
         return rc
 
     # Режим: максимально быстрый приём кадров без отрисовки (sink)
-    if not (args.plot or args.plot_fast or args.plot_fast_frames) and args.max_frames == 0 and not (args.print_csv or args.print_head_i16 or args.print_head_hex):
+    if not (args.plot or args.plot_fast or args.plot_fast_frames) and args.max_frames == 0 and not (args.print_csv or args.print_head_i16 or args.print_head_hex or args.export):
         port = USB_io.wait_for_cdc_port(args.port)
         ser = USB_io.open_serial(port, timeout=0.0, baudrate=args.baudrate)
         try:
             print(f"[sink] Приём кадров без обработки из {port}. Ctrl+C для остановки.")
             shown = 0; t0 = time.time(); last = t0; total_bytes = 0; last_bytes = 0; last_seq = None; lost = 0
-            while True:
-                try:
-                    frame = USB_frame.read_frame(
-                        ser,
-                        crc_strategy=('none' if crc_none_eff else 'auto'),
-                        sync_wait_s=0.5,
-                        frame_timeout_s=0.5,
-                        fast_drop=True,
-                        max_retries=1,
-                    )
-                except TimeoutError:
-                    continue
-                except KeyboardInterrupt:
-                    break
-                except Exception as e:
-                    print(f"[sink] err: {e}")
-                    continue
+            # чтение — в отдельном потоке; ошибки разбора только считаются (их число — в строке статистики)
+            reader = USB_pipeline.FrameReader(
+                ser, args.queue_size, args.queue_policy, stop_on_error=False,
+                crc_strategy=('none' if crc_none_eff else 'auto'),
+                sync_wait_s=0.5,
+                frame_timeout_s=0.5,
+                fast_drop=True,
+                max_retries=1,
+            )
+            for frame in reader:
                 shown += 1
                 data = frame.get('data')
                 ch = int(frame.get('channels', data.shape[1] if getattr(data, 'ndim', 1) == 2 else 1))
@@ -662,9 +664,15 @@ def main():
                     dur = now - last
                     fps = shown / max(1e-6, (now - t0))
                     kBps = (total_bytes - last_bytes) / max(1e-6, dur) / 1000.0
-                    print(f"[sink] {fps:.1f} fps, {kBps:.1f} kB/s, lost={lost}")
+                    print(f"[sink] {fps:.1f} fps, {kBps:.1f} kB/s, lost={lost} | {reader.summary()}")
                     last = now; last_bytes = total_bytes; shown = 0
+        except KeyboardInterrupt:
+            pass
         finally:
+            try:
+                reader.stop()
+            except Exception:
+                pass
             try:
                 ser.close()
             except Exception:
@@ -711,6 +719,20 @@ def main():
                 pass
         return 0
 
+    # CSV/выгрузка — кадр форматируется целиком и пишется крупными блоками (USB_export);
+    # один экспортёр на все сессии — файл не перезаписывается при переподключении
+    exporter = None
+    if args.export or args.print_csv:
+        try:
+            exporter = USB_export.open_exporter(
+                args.export_format if args.export else 'csv', args.export or '-',
+                limit=args.csv_limit, header=args.csv_header,
+            )
+        except Exception as e:
+            print(f"[export] {e}", flush=True)
+            return 2
+    to_stdout = exporter is not None and exporter.path == '-'
+
     session = 0
     try:
         while True:
@@ -775,15 +797,16 @@ def main():
                     print(f'Порт закрыт (конец сессии #{session})', flush=True)
                     return 2
                 # Основной цикл: читаем и при необходимости печатаем содержимое кадров
+                # Кадры читает отдельный поток в ограниченную очередь: медленный вывод не тормозит порт
                 shown = 0
-                csv_header_printed = False
-                while True:
-                    try:
-                        frame = USB_frame.read_frame(
-                            ser,
-                            crc_strategy=('none' if args.crc_none else 'auto'),
-                            frame_timeout_s=args.frame_timeout_sec,
-                        )
+                reader = USB_pipeline.FrameReader(
+                    ser, args.queue_size, args.queue_policy,
+                    crc_strategy=('none' if args.crc_none else 'auto'),
+                    frame_timeout_s=args.frame_timeout_sec,
+                )
+                stats_last = time.time()
+                try:
+                    for frame in reader:
                         shown += 1
                         print(f"seq={frame['seq']}, total={frame['total_samples']}, crc={frame['crc_variant']}", flush=True)
 
@@ -821,38 +844,41 @@ def main():
                             except Exception as e:
                                 print(f"  [print_head_i16] err: {e}")
 
-                        # CSV вывод: seq,index,<ch0>..<chN>
-                        if args.print_csv:
+                        # CSV вывод (seq,index,<ch0>..<chN>) или выгрузка в файл
+                        if exporter is not None:
                             try:
-                                import numpy as _np
-                                data = frame.get('data')
-                                if data is not None:
-                                    ch = int(frame.get('channels', data.shape[1]))
-                                    # Заголовок
-                                    if args.csv_header and not csv_header_printed:
-                                        header = ["seq", "index"] + [f"ch{c}" for c in range(ch)]
-                                        print(','.join(header))
-                                        csv_header_printed = True
-                                    # Данные
-                                    limit = int(args.csv_limit) if args.csv_limit and args.csv_limit > 0 else data.shape[0]
-                                    limit = max(0, min(limit, data.shape[0]))
-                                    for i in range(limit):
-                                        row = [str(int(frame['seq'])), str(i)] + [str(int(data[i, c])) for c in range(ch)]
-                                        print(','.join(row))
+                                if to_stdout:
+                                    sys.stdout.flush()   # строки кадра не должны перемешаться с print()
+                                exporter.write(frame)
+                                if to_stdout:
+                                    exporter.flush()
                             except Exception as e:
-                                print(f"  [print_csv] err: {e}")
+                                print(f"  [export] err: {e}")
+
+                        # Счётчики конвейера — в stderr, чтобы не смешивались с CSV
+                        if args.stats_sec > 0 and not args.quiet:
+                            now = time.time()
+                            if now - stats_last >= args.stats_sec:
+                                print(f"[pipe] {reader.summary()}", file=sys.stderr, flush=True)
+                                stats_last = now
 
                         # Лимит кадров
                         if args.max_frames and shown >= args.max_frames:
                             print(f"Достигнут лимит кадров (--max-frames={args.max_frames})", flush=True)
                             break
-                    except TimeoutError as e:
-                        # Если поток временно пропал — выйдем в следующую сессию
-                        print(f'[loop] Таймаут чтения: {e}', flush=True)
-                        break
-                    except Exception as e:
-                        print(f'[loop] Ошибка чтения: {e}', flush=True)
-                        break
+                finally:
+                    reader.stop()
+                    print(f"[pipe] итог: {reader.summary()}", file=sys.stderr, flush=True)
+                    if exporter is not None:
+                        try:
+                            exporter.flush()
+                        except Exception as e:
+                            print(f"[export] err: {e}", file=sys.stderr, flush=True)
+                if isinstance(reader.error, TimeoutError):
+                    # Если поток временно пропал — выйдем в следующую сессию
+                    print(f'[loop] Таймаут чтения: {reader.error}', flush=True)
+                elif reader.error is not None:
+                    print(f'[loop] Ошибка чтения: {reader.error}', flush=True)
             except Exception as e:
                 print(f'[session] Ошибка: {e}', flush=True)
             finally:
@@ -863,6 +889,14 @@ def main():
                 print(f'Порт закрыт (конец сессии #{session})', flush=True)
     except KeyboardInterrupt:
         print('Остановлено по Ctrl+C', flush=True)
+    finally:
+        if exporter is not None:
+            try:
+                exporter.close()
+                if not to_stdout:
+                    print(f"[export] {exporter.path}: кадров={exporter.frames}, строк={exporter.rows}, {exporter.bytes / 1e6:.1f} МБ", flush=True)
+            except Exception as e:
+                print(f"[export] err: {e}", flush=True)
 
 
 if __name__ == '__main__':
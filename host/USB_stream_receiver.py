@@ -26,17 +26,8 @@ STREAM_PACKET_SIZE = 2048  # Header(6) + Data(2042)
 VID, PID = 0xCAFE, 0x4001
 ENDPOINT_IN = 0x81  # Bulk IN endpoint
 
-# CRC16-CCITT
-def crc16_ccitt(data, crc=0xFFFF):
-    """Compute CRC16-CCITT checksum"""
-    for byte in data:
-        crc ^= (byte << 8)
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
-            else:
-                crc = (crc << 1) & 0xFFFF
-    return crc
+# CRC16-CCITT (poly 0x1021, init 0xFFFF), shared with usb_vendor (binascii.crc_hqx fast path)
+from usb_vendor.crc16 import crc16_ccitt_false as crc16_ccitt
 
 # ===== USB Communication =====
 class StreamReceiver:
@@ -96,9 +87,8 @@ class StreamReceiver:
                 crc_received = struct.unpack_from('<H', data, 4)[0]
                 
                 # Compute CRC (with CRC field = 0)
-                data_for_crc = bytearray(data)
-                struct.pack_into('<H', data_for_crc, 4, 0)
-                crc_computed = crc16_ccitt(data_for_crc)
+                data_for_crc = memoryview(data)
+                crc_computed = crc16_ccitt(data_for_crc[6:], crc16_ccitt(b'\x00\x00', crc16_ccitt(data_for_crc[:4])))
                 
                 self.stats['packets_received'] += 1
                 self.stats['total_bytes'] += len(data)
@@ -1,6 +1,9 @@
 import sys, time, struct
 import usb.core, usb.util
 
+from usb_vendor.deframe import scan, HDR_SIZE, STAT_SIZE
+from usb_vendor.recorder import Recorder
+
 VID, PID = 0xCAFE, 0x4001
 INTF = 2
 EP_OUT = 0x03
@@ -9,35 +12,23 @@ EP_IN  = 0x83
 MAGIC = b"\x5A\xA5\x01"
 
 
-def parse_frames(buf):
-    out = []
-    i = 0
-    n = len(buf)
-    while i + 32 <= n:
-        if buf[i:i+4] == b"STAT" and i + 64 <= n:
-            out.append(("STAT", 64, None, None, None))
-            i += 64
-            continue
-        if buf[i:i+3] != MAGIC:
-            j = buf.find(MAGIC, i+1)
-            if j == -1:
-                break
-            i = j
-            continue
-        flags = buf[i+3]
-        seq   = struct.unpack_from("<I", buf, i+4)[0]
-        ts    = struct.unpack_from("<I", buf, i+8)[0]
-        total = struct.unpack_from("<H", buf, i+12)[0]
-        frame_len = 32 + total*2
-        if i + frame_len > n:
-            break
+def parse_frames(buf, rec=None):
+    """(used, [(kind, size, seq, ts, total)]) по порядку в потоке; разбор — usb_vendor.deframe.scan.
+    rec — Recorder: все кадры дописываются в него как есть."""
+    b = scan(buf, ver=MAGIC[2])
+    if rec is not None:
+        for h, i in b.rows:
+            rec.add_frame(memoryview(buf)[i:i + HDR_SIZE + 2*h[5]], h[3], h[4])
+    items = [(i, ("STAT", STAT_SIZE, None, None, None)) for i in b.stats]
+    for (_, _, flags, seq, ts, total, *_), i in b.rows:
         kind = 'TEST' if (flags & 0x80) else ('A' if (flags & 0x01) else ('B' if (flags & 0x02) else 'F'))
-        out.append((kind, frame_len, seq, ts, total))
-        i += frame_len
-    return i, out
+        items.append((i, (kind, HDR_SIZE + total*2, seq, ts, total)))
+    if b.stats:
+        items.sort(key=lambda it: it[0])
+    return b.consumed, [it for _, it in items]
 
 
-def main(duration_s=60):
+def main(duration_s=60, record=None):
     d = usb.core.find(idVendor=VID, idProduct=PID)
     if not d:
         print('Device not found')
@@ -70,6 +61,7 @@ def main(duration_s=60):
     d.write(EP_OUT, bytes([0x20]), timeout=300)
 
     buf = bytearray()
+    rec = Recorder(record) if record else None
     t0 = time.time()
     last_stat = t0
     last_report = t0
@@ -91,7 +83,7 @@ def main(duration_s=60):
                     continue
                 print('USB read error:', e)
                 break
-            used, frames = parse_frames(buf)
+            used, frames = parse_frames(buf, rec)
             if used:
                 del buf[:used]
             for kind, size, seq, ts, total in frames:
@@ -110,7 +102,8 @@ def main(duration_s=60):
                 # ignore F*
             if now - last_report >= 5.0:
                 rate_pairs = min(cnt_A, cnt_B) / max(1e-6, now - t0)
-                print(f"[burn-in] t={int(now-t0)}s pairs={min(cnt_A,cnt_B)} A={cnt_A} B={cnt_B} TEST={cnt_TEST} STAT={cnt_STAT} gaps={gaps} r={rate_pairs:.1f}/s")
+                print(f"[burn-in] t={int(now-t0)}s pairs={min(cnt_A,cnt_B)} A={cnt_A} B={cnt_B} TEST={cnt_TEST} STAT={cnt_STAT} gaps={gaps} r={rate_pairs:.1f}/s"
+                      + (f" rec={rec.records} rec_drop={rec.dropped_records}" if rec else ""))
                 last_report = now
     finally:
         try:
@@ -121,6 +114,9 @@ def main(duration_s=60):
             usb.util.release_interface(d, INTF)
         except Exception:
             pass
+        if rec is not None:
+            rec.close()
+            print(f"recorded {rec.records} frames to {record} ({rec.chunks} chunks, dropped {rec.dropped_records})")
     print(f"DONE: pairs={min(cnt_A,cnt_B)} A={cnt_A} B={cnt_B} TEST={cnt_TEST} STAT={cnt_STAT} gaps={gaps}")
 
 
@@ -131,4 +127,5 @@ if __name__ == '__main__':
             dur = int(sys.argv[1])
         except Exception:
             pass
-    main(dur)
+    # второй аргумент — файл записи .bmr (см. usb_vendor/recorder.py)
+    main(dur, sys.argv[2] if len(sys.argv) > 2 else None)
@@ -5,6 +5,9 @@ import argparse
 import usb.core
 import usb.util
 
+from usb_vendor.deframe import scan, HDR_SIZE, STAT_SIZE
+from usb_vendor.control import bulk_client
+
 MAGIC = b"\x5A\xA5\x01"
 
 
@@ -33,46 +36,27 @@ def claim(dev, intf):
     usb.util.claim_interface(dev, intf)
 
 
-def send_cmd(dev, ep_out, cmd, payload=b""):
-    data = bytes([cmd]) + payload
-    return dev.write(ep_out, data, timeout=500)
+def cmd_client(dev, ep_out):
+    """Команды через общий клиент (usb_vendor.control): пакет на команду, без фиксированных пауз."""
+    return bulk_client(lambda pkt: dev.write(ep_out, pkt, timeout=300))
 
 
 def parse_frames(buf, out):
-    consumed = 0
-    frames = []
-    i = 0
-    n = len(buf)
-    while i + 32 <= n:
-        # STAT at head
-        if buf[i:i+4] == b"STAT" and (i + 64) <= n:
-            out.append(("STAT", bytes(buf[i:i+64])))
-            i += 64
-            continue
-        # Align to next magic
-        if buf[i:i+3] != MAGIC:
-            j = buf.find(MAGIC, i+1)
-            if j == -1:
-                break
-            i = j
-            continue
-        # header present
-        flags = buf[i+3]
-        seq = struct.unpack_from("<I", buf, i+4)[0]
-        ts = struct.unpack_from("<I", buf, i+8)[0]
-        total = struct.unpack_from("<H", buf, i+12)[0]
-        frame_len = 32 + total * 2
-        if i + frame_len > n:
-            break
+    """Дописать в out STAT/кадры по порядку в потоке, вернуть число разобранных байт."""
+    b = scan(buf, ver=MAGIC[2])
+    items = [(i, ("STAT", bytes(buf[i:i+STAT_SIZE]))) for i in b.stats]
+    for (_, _, flags, seq, ts, total, *_), i in b.rows:
+        frame_len = HDR_SIZE + total * 2
         fr = bytes(buf[i:i+frame_len])
         kind = (
             "TEST" if (flags & 0x80) else
             ("A" if (flags & 0x01) else ("B" if (flags & 0x02) else f"F{flags:02X}"))
         )
-        out.append((kind, fr, seq, ts, total))
-        i += frame_len
-    consumed = i
-    return consumed
+        items.append((i, (kind, fr, seq, ts, total)))
+    if b.stats:
+        items.sort(key=lambda it: it[0])
+    out.extend(it for _, it in items)
+    return b.consumed
 
 
 def main():
@@ -104,17 +88,20 @@ def main():
     except Exception:
         pass
 
+    ctrl = cmd_client(dev, args.ep_out)
     # Basic opts (harmless if ignored)
     try:
-        dev.write(args.ep_out, struct.pack("<B4H", 0x10, 100, 300, 700, 300), timeout=300)
-        dev.write(args.ep_out, struct.pack("<BH", 0x11, 100), timeout=300)
-        dev.write(args.ep_out, struct.pack("<BB", 0x13, 1), timeout=300)
-        dev.write(args.ep_out, struct.pack("<BB", 0x14, 2), timeout=300)
+        ctrl.burst([
+            (0x10, struct.pack("<4H", 100, 300, 700, 300)),
+            (0x11, struct.pack("<H", 100)),
+            (0x13, b"\x01"),
+            (0x14, b"\x02"),
+        ])
     except Exception:
         pass
 
     # START
-    dev.write(args.ep_out, bytes([0x20]), timeout=300)
+    ctrl.send(0x20)
 
     buf = bytearray()
     seenA = seenB = 0
@@ -14,16 +14,8 @@ ENDPOINT_IN = 0x83  # Bulk IN endpoint
 STREAM_PACKET_SIZE = 64  # USB Full-Speed Bulk max packet size (2048/64 = 32 packets per buffer)
 STREAM_SAMPLES_PER_CHANNEL = 1000
 
-def crc16_ccitt(data, crc=0xFFFF):
-    """Compute CRC16-CCITT checksum"""
-    for byte in data:
-        crc ^= (byte << 8)
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
-            else:
-                crc = (crc << 1) & 0xFFFF
-    return crc
+# CRC16-CCITT (poly 0x1021, init 0xFFFF), shared with usb_vendor (binascii.crc_hqx fast path)
+from usb_vendor.crc16 import crc16_ccitt_false as crc16_ccitt
 
 def test_stream():
     print("=" * 60)
@@ -65,9 +57,8 @@ def test_stream():
                 crc_rx = struct.unpack_from('<H', data, 4)[0]
                 
                 # Compute CRC
-                data_crc = bytearray(data)
-                struct.pack_into('<H', data_crc, 4, 0)
-                crc_computed = crc16_ccitt(data_crc)
+                data_crc = memoryview(data)
+                crc_computed = crc16_ccitt(data_crc[6:], crc16_ccitt(b'\x00\x00', crc16_ccitt(data_crc[:4])))
                 
                 total_bytes += len(data)
                 
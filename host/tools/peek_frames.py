@@ -1,6 +1,7 @@
 import sys, time, numpy as np
 sys.path.insert(0, "usb_vendor")
 from usb_stream import USBStream
+from deframe import scan
 
 CMD_SET_PROFILE = 0x14
 CMD_START_STREAM = 0x20
@@ -55,6 +56,7 @@ def try_mode(stream: USBStream, full: bool, wait_s: float = 3.0, max_pairs: int
             f"len0={len(ch0)} len1={len(ch1)} f0={a.flags:#04x} f1={b.flags:#04x}"
         )
         print(f"  ch0[:8]={ch0[:8]}\n  ch1[:8]={ch1[:8]}")
+        a.release(); b.release()
         pairs += 1
     try:
         stream.send_cmd(CMD_STOP_STREAM, b"")
@@ -68,6 +70,25 @@ def try_mode(stream: USBStream, full: bool, wait_s: float = 3.0, max_pairs: int
     return pairs
 
 
+def peek_dump(paths) -> None:
+    """Разбор сырых дампов EP IN без устройства: заголовки кадров массивами NumPy."""
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        b = scan(data)
+        print(f"{path}: кадров={len(b)} STAT={len(b.stats)} мусор={b.skipped}B хвост={len(data) - b.consumed}B")
+        if not len(b):
+            continue
+        seq, flags = b.seq, b.flags
+        for i in range(min(len(b), 8)):
+            print(f"  off={b.offsets[i]} seq={seq[i]:#010x} flags={flags[i]:#04x} ts={b.timestamp[i]} total={b.total_samples[i]}")
+        for bit, name in ((0x01, "A"), (0x02, "B")):
+            s = seq[(flags & bit) != 0].astype(np.int64)
+            if len(s) > 1:
+                gaps = int(np.count_nonzero(np.diff(s) != 1))
+                print(f"  {name}: кадров={len(s)} seq {s[0]:#x}..{s[-1]:#x} разрывов={gaps}")
+
+
 def main():
     stream = None
     try:
@@ -91,4 +112,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1:
+        peek_dump(sys.argv[1:])
+    else:
+        main()
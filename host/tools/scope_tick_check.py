@@ -0,0 +1,86 @@
+"""Проверка ScopeWindow._tick без Qt: во всех SCOPE_MODES должны двигаться last_seq и gap_count.
+
+Окно собирается без __init__ (виджеты — заглушки), пары пишутся прямо в SampleRing;
+тики без новых пар чередуются с тиками по 3 пары, в середине — разрыв seq на 5.
+
+Запуск из host/: python3 tools/scope_tick_check.py
+"""
+import importlib.util
+import os
+import sys
+
+import numpy as np
+
+HOST = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOST)
+from usb_vendor.sample_ring import SampleRing  # noqa: E402
+
+_spec = importlib.util.spec_from_file_location("bmi30_200", os.path.join(HOST, "BMI30.200.py"))
+scope = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(scope)
+
+
+class Stub:
+    """Любой виджет: любой метод принимает что угодно и возвращает 0."""
+    def __getattr__(self, name):
+        return lambda *a, **kw: 0
+
+
+class FakeStream:
+    disconnected = False
+
+    def __init__(self):
+        self.sample_ring = SampleRing(1 << 14, 256)
+        self.last_rx_t = 0.0
+
+    def set_pair_queue(self, on):
+        pass
+
+
+def make_window(mode: str):
+    w = scope.ScopeWindow.__new__(scope.ScopeWindow)
+    w.__dict__.update(
+        stream=FakeStream(), scope_mode=mode, _ring_owner=None, _blk_cursor=0, base_buf_len=None,
+        _last_rx_seen=0.0, _status_hold_text=None, _status_hold_until=0.0, _last_sample_ts=None,
+        gap_count=0, last_seq=None, y_auto=False, _persist=None, _trig=None, _spec=None,
+        persist_frames=8, persist_bins=64, y_min=-100, y_max=100, max_int16_span=65536,
+        initial_expected=912, data0=np.zeros(0), frames_sec_pairs=0, fps=0.0, last_fps_t=0.0,
+        last_range_t=0.0, _last_default_update_t=0.0, connect_t=0, no_data_warned=True,
+        stop_warn_after=float("inf"), diag_interval=float("inf"), last_diag_t=0.0, last_frame_t=0.0,
+        view_start=0, view_len=0, _dirty=False, trig_lines=[], _connecting=False,
+        diag_to_console=True, auto_soft_kick=False, errors=[])
+    for k in ("slider_start", "slider_len", "lbl_start_value", "lbl_len_value", "legend_lbl",
+              "mode_box", "p0", "p1", "img0", "img1", "usb_retry_timer", "num_group"):
+        setattr(w, k, Stub())
+    w._set_status = lambda text, hold_sec=0: w.errors.append(text) if "Ошибка" in text else None
+    return w
+
+
+def run(mode: str, ticks: int = 6, n: int = 912):
+    w = make_window(mode)
+    ring = w.stream.sample_ring
+    t = np.arange(n)
+    seq = 100
+    for tick in range(ticks):
+        if tick == 2:
+            seq += 5   # разрыв
+        for _ in range(3 if tick % 2 == 0 else 0):
+            x = (1000 * np.sin(2 * np.pi * t / 50 + seq)).astype(np.int16)
+            ring.write(x, -x, seq, seq * 3333)
+            seq += 1
+        scope.ScopeWindow._tick(w)
+    assert not w.errors, (mode, w.errors)
+    assert w.last_seq == seq - 1, (mode, w.last_seq, seq - 1)
+    assert w.gap_count == 1, (mode, w.gap_count)
+    return w
+
+
+def main():
+    scope.QtCore = Stub()   # _persist_add строит QRectF
+    for mode in scope.SCOPE_MODES:
+        w = run(mode)
+        print(f"{mode:9s} last_seq={w.last_seq} gaps={w.gap_count} ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""bench_bulk_in.py — sync vs async bulk IN на фейковом устройстве (без железа).
+
+Модель устройства: кадры A/B рождаются с частотой --rate (кадров/с) в FIFO
+устройства глубиной --fifo кадров; шина отдаёт кадр только в стоящий IN-запрос.
+Если хост не держит запрос (sync: между read'ами, пока Python разбирает кадр
+или GUI держит GIL), FIFO переполняется и кадр теряется — это и есть «паузы
+между блоками» в BMI30.200.py.
+
+Usage:
+  python -m usb_vendor.bench_bulk_in --duration 5 --rate 600 --stall-ms 25 --stall-every 0.25
+  python -m usb_vendor.bench_bulk_in --urbs 4 --urb-size 16384 --call-us 150
+
+Печатает для sync и async: кадров/с, потерь в FIFO устройства, латентность p50/p99.
+"""
+from __future__ import annotations
+import argparse, ctypes, threading, time
+from collections import deque
+
+try:
+    from .bulk_in import SyncBulkIn, AsyncBulkIn, ST_COMPLETED, ST_CANCELLED
+    from .rx_ring import RxRing
+    from .bench_rx import synth_frame
+    from .measure_frame_rate import percentiles
+except ImportError:
+    from bulk_in import SyncBulkIn, AsyncBulkIn, ST_COMPLETED, ST_CANCELLED
+    from rx_ring import RxRing
+    from bench_rx import synth_frame
+    from measure_frame_rate import percentiles
+
+
+class FakeLink:
+    """Устройство + шина: производитель в отдельном потоке, FIFO ограниченной глубины."""
+    def __init__(self, rate: float, samples: int, fifo: int, bus_mbps: float):
+        self.period = 1.0 / rate
+        self.frames = [synth_frame(0, 0x01, samples), synth_frame(0, 0x02, samples)]
+        self.fifo_depth = fifo
+        self.xfer_s = len(self.frames[0]) / (bus_mbps * 1e6)
+        self.fifo = deque()
+        self.born = {}
+        self.dropped = 0
+        self.cv = threading.Condition()
+        self.pending = deque()   # async: поданные transfer'ы
+        self.running = False
+
+    def _frame(self, k: int) -> bytes:
+        f = bytearray(self.frames[k & 1])
+        f[4:8] = (k // 2).to_bytes(4, 'little')
+        f[8:12] = k.to_bytes(4, 'little')   # timestamp = сквозной номер кадра (для латентности)
+        return bytes(f)
+
+    def start(self):
+        self.running = True
+        self.th = threading.Thread(target=self._produce, daemon=True)
+        self.th.start()
+
+    def stop(self):
+        self.running = False
+        self.th.join()
+
+    def _produce(self):
+        t0 = time.perf_counter(); k = 0
+        while self.running:
+            t_due = t0 + k * self.period
+            dt = t_due - time.perf_counter()
+            if dt > 0:
+                time.sleep(dt)
+            with self.cv:
+                self.born[k] = time.perf_counter()
+                if self.pending:
+                    self._fill(self.pending.popleft(), self._frame(k))
+                elif len(self.fifo) >= self.fifo_depth:
+                    self.dropped += 1
+                else:
+                    self.fifo.append(self._frame(k))
+                self.cv.notify_all()
+            k += 1
+
+    @staticmethod
+    def _fill(slot, data: bytes):
+        n = min(len(data), len(slot.buf))
+        slot.mv[:n] = data[:n]
+        slot.actual = n; slot.status = ST_COMPLETED; slot.done = True
+
+    # --- sync: usb.core.Device.read() ---
+    def read(self, ep, buff, timeout=None):
+        t_end = time.perf_counter() + (timeout or 1000) / 1000.0
+        with self.cv:
+            while not self.fifo:
+                left = t_end - time.perf_counter()
+                if left <= 0:
+                    import usb.core, errno
+                    raise usb.core.USBTimeoutError('Operation timed out', -7, errno.ETIMEDOUT)
+                self.cv.wait(left)
+            data = self.fifo.popleft()
+        time.sleep(self.xfer_s)
+        addr, n = buff.buffer_info()
+        n = min(n, len(data))
+        ctypes.memmove(addr, data, n)
+        return n
+
+    # --- async: backend для AsyncBulkIn ---
+    def alloc(self, slot):
+        slot.handle = object()
+    def submit(self, slot):
+        with self.cv:
+            slot.done = False
+            if self.fifo:
+                self._fill(slot, self.fifo.popleft())
+                self.cv.notify_all()
+            else:
+                self.pending.append(slot)
+    def cancel(self, slot):
+        with self.cv:
+            if slot in self.pending:
+                self.pending.remove(slot)
+                slot.status = ST_CANCELLED; slot.actual = 0; slot.done = True
+                self.cv.notify_all()
+    def pump(self, timeout_s):
+        with self.cv:
+            self.cv.wait(timeout_s)
+    def free(self, slot):
+        slot.handle = None
+
+
+class _Overhead:
+    """Оборачивает dev.read(): фиксированная цена одного синхронного вызова (submit+reap)."""
+    def __init__(self, link, call_s):
+        self.link = link; self.call_s = call_s
+    def read(self, ep, buff, timeout=None):
+        t_end = time.perf_counter() + self.call_s
+        while time.perf_counter() < t_end:
+            pass
+        return self.link.read(ep, buff, timeout)
+
+
+def run(mode: str, args) -> dict:
+    link = FakeLink(args.rate, args.samples, args.fifo, args.bus_mbps)
+    if mode == 'sync':
+        rx = SyncBulkIn(_Overhead(link, args.call_us * 1e-6), 0x83, 4096)
+    else:
+        rx = AsyncBulkIn(count=args.urbs, size=args.urb_size, backend=link)
+    ring = RxRing()
+    lat = []; got = 0
+    link.start()
+    t0 = time.perf_counter(); next_stall = t0 + args.stall_every
+    try:
+        while time.perf_counter() - t0 < args.duration:
+            try:
+                rx.read_into(ring, 200)
+            except Exception:
+                continue
+            for h, off in ring.take_frames().rows:
+                lat.append(time.perf_counter() - link.born.pop(h[4], time.perf_counter()))
+                got += 1
+                t_end = time.perf_counter() + args.proc_us * 1e-6
+                while time.perf_counter() < t_end:
+                    pass
+            now = time.perf_counter()
+            if args.stall_ms and now >= next_stall:
+                # GUI-перерисовка держит GIL/поток: никто не читает USB
+                t_end = now + args.stall_ms / 1000.0
+                while time.perf_counter() < t_end:
+                    pass
+                next_stall = now + args.stall_every
+    finally:
+        link.stop()
+        rx.close()
+    dt = time.perf_counter() - t0
+    p = percentiles(lat, (50, 99))
+    return {'frames': got, 'fps': got / dt, 'dropped': link.dropped,
+            'p50_ms': (p[50] or 0) * 1e3, 'p99_ms': (p[99] or 0) * 1e3}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--duration', type=float, default=5.0)
+    ap.add_argument('--rate', type=float, default=600.0, help='Кадров A+B в секунду (300 пар/с = 600)')
+    ap.add_argument('--samples', type=int, default=912)
+    ap.add_argument('--fifo', type=int, default=2, help='Глубина FIFO устройства, кадров (двойной буфер)')
+    ap.add_argument('--bus-mbps', type=float, default=40.0, help='Полезная скорость шины, МБ/с')
+    ap.add_argument('--call-us', type=float, default=150.0, help='Цена одного sync read (submit+reap), мкс')
+    ap.add_argument('--proc-us', type=float, default=200.0, help='Разбор одного кадра на хосте, мкс')
+    ap.add_argument('--stall-ms', type=float, default=20.0, help='Пауза хоста (перерисовка GUI), мс; 0 — без пауз')
+    ap.add_argument('--stall-every', type=float, default=0.25, help='Период пауз хоста, с')
+    ap.add_argument('--urbs', type=int, default=8)
+    ap.add_argument('--urb-size', type=int, default=16384)
+    args = ap.parse_args()
+    for mode in ('sync', 'async'):
+        r = run(mode, args)
+        tag = mode if mode == 'sync' else f"async({args.urbs}x{args.urb_size})"
+        print(f"{tag:20s} frames={r['frames']} fps={r['fps']:.1f} dropped={r['dropped']} lat p50={r['p50_ms']:.2f}ms p99={r['p99_ms']:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
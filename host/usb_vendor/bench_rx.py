@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""bench_rx.py — сравнение дефрейминга Vendor Bulk IN: старый путь (bytes/extend/del) и RxRing.
+
+Usage:
+  python -m usb_vendor.bench_rx                      # синтетика: 200 Гц, 1360 семплов, STAT каждые 100 кадров
+  python -m usb_vendor.bench_rx --raw ../full_mismatch_1_n300_fmt0004.bin --repeat 2000
+  python -m usb_vendor.bench_rx --samples 912 --frames 20000
+  python -m usb_vendor.bench_rx --crc                # кадры с VF_CRC: ring без проверки vs ring+CRC
+
+Сырые дампы (--raw) — байты с EP 0x83 подряд; режутся на чтения по --chunk байт.
+Выводит кадров/с и мкс/кадр для обоих путей и коэффициент ускорения.
+С --crc дополнительно: стоимость CRC одного кадра по бэкендам crc16 и ring с проверкой CRC.
+"""
+from __future__ import annotations
+import argparse, array, ctypes, struct, time
+
+try:
+    from .usb_stream import Frame, HDR_SIZE, MAGIC, RX_READ_SIZE, STAT_SIZE, EP_IN, VF_CRC
+    from .rx_ring import RxRing
+    from .crc16 import BACKENDS, vendor_frame_crc
+except ImportError:
+    from usb_stream import Frame, HDR_SIZE, MAGIC, RX_READ_SIZE, STAT_SIZE, EP_IN, VF_CRC
+    from rx_ring import RxRing
+    from crc16 import BACKENDS, vendor_frame_crc
+
+
+def synth_frame(seq: int, flags: int, samples: int, ts: int = 0) -> bytes:
+    hdr = struct.pack('<HBBIIHHIIIHH', MAGIC, 1, flags, seq, ts, samples, 0, 0, 0, 0, 0, 0)
+    payload = struct.pack(f'<{samples}h', *(((i * 37 + seq) & 0x7FFF) for i in range(samples)))
+    f = bytearray(hdr + payload)
+    if flags & VF_CRC:
+        struct.pack_into('<H', f, HDR_SIZE - 2, vendor_frame_crc(f, 0, len(f)))
+    return bytes(f)
+
+
+def synth_chunks(frames: int, samples: int, stat_every: int = 100, crc: bool = False) -> list[bytes]:
+    """Одно чтение = один кадр (short packet закрывает transfer), изредка STAT."""
+    stat = b'STAT' + bytes(STAT_SIZE - 4)
+    extra = VF_CRC if crc else 0
+    out = []
+    for i in range(frames):
+        if stat_every and i % stat_every == 0:
+            out.append(stat)
+        out.append(synth_frame(i // 2, (0x01 if i % 2 == 0 else 0x02) | extra, samples))
+    return out
+
+
+def raw_chunks(paths: list[str], chunk: int, repeat: int) -> list[bytes]:
+    data = b''.join(open(p, 'rb').read() for p in paths) * max(1, repeat)
+    return [data[i:i+chunk] for i in range(0, len(data), chunk)]
+
+
+class ReplayDev:
+    """Заменитель usb.core.Device.read(): по куску на вызов, с той же работой с буфером,
+    что у PyUSB+libusb (создать array под size, «DMA» в него, срез по факту)."""
+    def __init__(self, chunks):
+        self.chunks = chunks; self.i = 0
+    def read(self, ep, size_or_buffer, timeout=None):
+        c = self.chunks[self.i]; self.i += 1
+        if isinstance(size_or_buffer, array.array):
+            buff = size_or_buffer
+        else:
+            buff = array.array('B', b'\x00' * size_or_buffer)
+        addr, n = buff.buffer_info()
+        ret = min(n, len(c))
+        ctypes.memmove(addr, c, ret)
+        if buff is size_or_buffer:
+            return ret
+        return buff[:ret] if ret != n else buff
+
+
+def run_legacy(chunks) -> int:
+    """Копия прежнего USBStream._rx_loop (без USB-ошибок и CRC)."""
+    dev = ReplayDev(chunks)
+    buf = bytearray()
+    frames = 0
+    for _ in range(len(chunks)):
+        data = bytes(dev.read(EP_IN, 4096, timeout=1000))
+        mv = memoryview(data); pos = 0; n = len(mv)
+        while pos + 4 <= n and mv[pos:pos+4] == b'STAT':
+            if pos + 64 <= n:
+                pos += 64; continue
+            break
+        if pos < n:
+            buf.extend(mv[pos:].tobytes())
+        while True:
+            if len(buf) < HDR_SIZE:
+                break
+            if not (buf[0] == 0x5A and buf[1] == 0xA5):
+                idx = buf.find(b"\x5A\xA5")
+                if idx == -1:
+                    del buf[:max(0, len(buf)-1)]; break
+                del buf[:idx]
+                if len(buf) < HDR_SIZE:
+                    break
+            hdr_bytes = bytes(buf[:HDR_SIZE])
+            (magic,ver,flags,seq,timestamp,total_samples,_,_,_,_,_,_) = struct.unpack('<H B B I I H H I I I H H', hdr_bytes)
+            frame_total = HDR_SIZE + int(total_samples)*2
+            if len(buf) < frame_total:
+                break
+            payload = bytes(buf[HDR_SIZE:frame_total])
+            Frame(seq, timestamp, 0 if flags & 1 else 1, flags, total_samples, payload)
+            frames += 1
+            del buf[:frame_total]
+    return frames
+
+
+def run_ring(chunks, check_crc: bool = False) -> tuple[int, RxRing]:
+    dev = ReplayDev(chunks)
+    ring = RxRing()
+    frames = 0
+    for _ in range(len(chunks)):
+        n = ring.read_usb(dev, EP_IN, RX_READ_SIZE, 1000)
+        w0 = ring.wpos - n
+        while n >= 4 and ring.buf[w0:w0+4] == b'STAT' and n >= STAT_SIZE:
+            if ring.rpos == w0:
+                ring.skip(STAT_SIZE); w0 += STAT_SIZE
+            else:
+                ring.cut(w0, STAT_SIZE)
+            n -= STAT_SIZE
+        mv = ring.mv
+        for h, off in ring.take_frames().rows:
+            frame_total = HDR_SIZE + 2 * h[5]
+            if check_crc and h[2] & VF_CRC and vendor_frame_crc(mv, off, frame_total) != h[11]:
+                raise ValueError(f"crc mismatch seq={h[3]}")
+            Frame(h[3], h[4], 0 if h[2] & 1 else 1, h[2], h[5], mv[off+HDR_SIZE:off+frame_total])
+            frames += 1
+    return frames, ring
+
+
+def bench(name, fn, chunks, loops):
+    best = None
+    for _ in range(loops):
+        t0 = time.perf_counter()
+        r = fn(chunks)
+        dt = time.perf_counter() - t0
+        best = dt if best is None or dt < best else best
+    frames = r[0] if isinstance(r, tuple) else r
+    print(f"{name:8s} frames={frames} best={best*1000:.1f}ms  {frames/best:,.0f} frames/s  {best/max(1,frames)*1e6:.2f} us/frame")
+    return best, r
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--raw', nargs='*', default=None, help='Сырые дампы EP IN (байты подряд)')
+    ap.add_argument('--chunk', type=int, default=RX_READ_SIZE, help='Размер одного чтения для --raw')
+    ap.add_argument('--repeat', type=int, default=1000, help='Повторить --raw N раз')
+    ap.add_argument('--frames', type=int, default=20000, help='Синтетика: число кадров A+B')
+    ap.add_argument('--samples', type=int, default=1360, help='Синтетика: семплов на кадр (912/1360)')
+    ap.add_argument('--loops', type=int, default=5)
+    ap.add_argument('--crc', action='store_true', help='Синтетика с VF_CRC; сравнить ring с проверкой CRC и без')
+    args = ap.parse_args()
+
+    chunks = raw_chunks(args.raw, args.chunk, args.repeat) if args.raw else synth_chunks(args.frames, args.samples, crc=args.crc)
+    print(f"[bench] reads={len(chunks)} bytes={sum(map(len, chunks))}")
+    t_old, _ = bench('legacy', run_legacy, chunks, args.loops)
+    t_new, (_, ring) = bench('ring', run_ring, chunks, args.loops)
+    print(f"speedup x{t_old/t_new:.2f} zero_copy={ring.zero_copy}")
+    if args.crc:
+        t_crc, _ = bench('ring+crc', lambda c: run_ring(c, True), chunks, args.loops)
+        print(f"crc overhead {100.0*(t_crc/t_new-1):+.1f}%")
+        frame = synth_frame(0, 0x01 | VF_CRC, args.samples)
+        for name, fn in BACKENDS.items():
+            n = 20 if name == 'bitwise' else 2000
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn(frame[HDR_SIZE:], fn(frame[:HDR_SIZE-2]))
+            dt = (time.perf_counter() - t0) / n
+            # 300 пар/с = 600 кадров/с: какую долю одного ядра съедает CRC в потоке RX
+            print(f"crc16 {name:8s} {dt*1e6:9.2f} us/frame ({len(frame)} B)  at 600 frames/s: {dt*600*100:.1f}% CPU")
+
+
+if __name__ == '__main__':
+    main()
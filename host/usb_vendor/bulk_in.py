@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""bulk_in.py — способы чтения Vendor Bulk IN (EP 0x83) для USBStream.
+
+SyncBulkIn  — как раньше: один синхронный dev.read() за раз (прямо в RxRing).
+AsyncBulkIn — N асинхронных bulk transfer'ов libusb всегда стоят в очереди,
+              поэтому шина не простаивает, пока Python разбирает кадр или GUI
+              держит GIL. Завершения забираются строго по порядку подачи и
+              копируются в RxRing; transfer сразу уходит обратно в очередь.
+
+Оба дают одинаковый контракт read_into(ring, timeout_ms) -> n и те же
+исключения usb.core.USBError (errno 110 — таймаут), поэтому keepalive и
+рестарт в USBStream._rx_loop работают без изменений. Перед рестартом EP
+(STOP/CLEAR_HALT/alt) очередь снимается pause() и ставится заново resume();
+transfer, не вернувшийся после cancel, не подаётся и не освобождается, пока
+libusb не вызовет его callback.
+"""
+from __future__ import annotations
+import ctypes, errno, time
+from collections import deque
+
+import usb.core
+
+URB_COUNT = 8          # сколько transfer'ов держать в полёте
+URB_SIZE = 16384       # размер одного transfer'а (кратен 512)
+
+ST_COMPLETED, ST_ERROR, ST_TIMED_OUT, ST_CANCELLED, ST_STALL, ST_NO_DEVICE, ST_OVERFLOW = range(7)
+_STATUS_ERRNO = {
+    ST_ERROR: errno.EIO, ST_TIMED_OUT: errno.ETIMEDOUT, ST_CANCELLED: errno.EINTR,
+    ST_STALL: errno.EPIPE, ST_NO_DEVICE: errno.ENODEV, ST_OVERFLOW: errno.EOVERFLOW,
+}
+
+
+# transfer'ы, так и не вернувшиеся после cancel к close(): libusb ещё может писать
+# в их буфер, поэтому не освобождаем и держим (backend, slot) до конца процесса
+_orphans = []
+
+
+def _timeout_error():
+    return usb.core.USBTimeoutError('Operation timed out', -7, errno.ETIMEDOUT)
+
+
+class SyncBulkIn:
+    """Один синхронный read за раз (прежнее поведение)."""
+    mode = 'sync'
+    def __init__(self, dev, ep: int, size: int = 4096):
+        self.dev = dev; self.ep = ep; self.size = size
+    def read_into(self, ring, timeout_ms: int) -> int:
+        return ring.read_usb(self.dev, self.ep, self.size, timeout_ms)
+    def pause(self):
+        pass
+    def resume(self):
+        pass
+    def close(self):
+        pass
+
+
+class Slot:
+    """Один bulk transfer: свой буфер + статус последнего завершения."""
+    __slots__ = ('buf', 'mv', 'addr', 'done', 'status', 'actual', 'handle')
+    def __init__(self, size: int):
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.addr = 0
+        self.done = False; self.status = ST_COMPLETED; self.actual = 0
+        self.handle = None      # libusb_transfer* (или объект фейкового backend'а)
+
+
+class LibusbAsync:
+    """Асинхронные transfer'ы через libusb-1.0, загруженную PyUSB (тот же контекст и handle).
+
+    Используется ctypes-прототип struct libusb_transfer из usb.backend.libusb1;
+    libusb_fill_bulk_transfer — inline-функция, поэтому поля заполняем сами."""
+    def __init__(self, dev, ep: int):
+        from usb.backend import libusb1 as _l1
+        be = dev._ctx.backend
+        if not isinstance(be, _l1._LibUSB):
+            raise RuntimeError('async bulk IN requires the libusb1 backend')
+        self._l1 = _l1
+        self.lib = be.lib
+        self.ctx = be.ctx
+        self.handle = dev._ctx.managed_open().handle
+        self.ep = ep
+        lib = self.lib
+        lib.libusb_cancel_transfer.argtypes = [_l1._libusb_transfer_p]
+        lib.libusb_cancel_transfer.restype = ctypes.c_int
+        lib.libusb_handle_events_timeout_completed.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(ctypes.c_int)]
+        lib.libusb_handle_events_timeout_completed.restype = ctypes.c_int
+        self._cbs = []
+
+    class _timeval(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_usec', ctypes.c_long)]
+
+    def alloc(self, slot: Slot):
+        t = self.lib.libusb_alloc_transfer(0)
+        if not t:
+            raise MemoryError('libusb_alloc_transfer failed')
+        cbuf = (ctypes.c_char * len(slot.buf)).from_buffer(slot.buf)
+        slot.addr = ctypes.addressof(cbuf)
+        def _cb(tp, slot=slot, cbuf=cbuf):
+            tr = tp.contents
+            slot.status = int(tr.status)
+            slot.actual = int(tr.actual_length)
+            slot.done = True
+        cb = self._l1._libusb_transfer_cb_fn_p(_cb)
+        self._cbs.append(cb)
+        tr = t.contents
+        tr.dev_handle = self.handle
+        tr.flags = 0
+        tr.endpoint = self.ep
+        tr.type = 2  # LIBUSB_TRANSFER_TYPE_BULK
+        tr.timeout = 0  # таймаут считаем сами, transfer живёт до завершения/cancel
+        tr.length = len(slot.buf)
+        tr.actual_length = 0
+        tr.callback = cb
+        tr.buffer = slot.addr
+        tr.num_iso_packets = 0
+        slot.handle = t
+
+    def submit(self, slot: Slot):
+        slot.done = False
+        r = self.lib.libusb_submit_transfer(slot.handle)
+        if r != 0:
+            slot.done = True
+            slot.status = ST_NO_DEVICE if r == -4 else ST_ERROR  # LIBUSB_ERROR_NO_DEVICE
+            slot.actual = 0
+
+    def cancel(self, slot: Slot):
+        self.lib.libusb_cancel_transfer(slot.handle)
+
+    def pump(self, timeout_s: float):
+        tv = self._timeval(int(timeout_s), int((timeout_s % 1.0) * 1e6))
+        self.lib.libusb_handle_events_timeout_completed(self.ctx, ctypes.byref(tv), None)
+
+    def free(self, slot: Slot):
+        if slot.handle:
+            self.lib.libusb_free_transfer(slot.handle)
+            slot.handle = None
+
+
+class AsyncBulkIn:
+    """Очередь из count transfer'ов по size байт над backend (LibusbAsync или фейк)."""
+    mode = 'async'
+    def __init__(self, dev=None, ep: int = 0x83, count: int = URB_COUNT, size: int = URB_SIZE, backend=None):
+        self.be = backend if backend is not None else LibusbAsync(dev, ep)
+        self.count = max(2, int(count))
+        self.size = max(512, int(size) // 512 * 512)
+        self.slots = [Slot(self.size) for _ in range(self.count)]
+        for s in self.slots:
+            self.be.alloc(s)
+        self.q = deque()        # в полёте, в порядке подачи
+        self.stuck = []         # отменены в pause(), но callback ещё не пришёл — не подавать и не освобождать
+        self.running = False
+        self.completed = 0      # завершённых transfer'ов с данными
+        self.max_inflight_done = 0  # макс. число готовых, ожидавших разбора (глубина «запаса»)
+        self.resume()
+
+    def _reap(self) -> list:
+        """Вернуть слоты из stuck, по которым callback уже пришёл."""
+        back = [s for s in self.stuck if s.done]
+        if back:
+            self.stuck = [s for s in self.stuck if not s.done]
+        return back
+
+    def resume(self):
+        if self.running:
+            return
+        self._reap()
+        for s in self.slots:
+            if s in self.stuck:
+                continue
+            self.be.submit(s)
+            self.q.append(s)
+        self.running = True
+
+    def pause(self, timeout_s: float = 1.0):
+        """Снять все transfer'ы (перед STOP/CLEAR_HALT/alt) и дождаться их завершения."""
+        if not self.running:
+            return
+        for s in self.q:
+            if not s.done:
+                self.be.cancel(s)
+        t_end = time.monotonic() + timeout_s
+        while any(not s.done for s in self.q) and time.monotonic() < t_end:
+            self.be.pump(0.05)
+        self.stuck.extend(s for s in self.q if not s.done)
+        self.q.clear()
+        self.running = False
+
+    def read_into(self, ring, timeout_ms: int) -> int:
+        if not self.running:
+            self.resume()
+        q = self.q
+        t_end = time.monotonic() + timeout_ms / 1000.0
+        if self.stuck:
+            # отменённые transfer'ы возвращаются в очередь, только когда libusb их отдал
+            for s in self._reap():
+                self.be.submit(s)
+                q.append(s)
+            while not q:
+                left = t_end - time.monotonic()
+                if left <= 0:
+                    raise _timeout_error()
+                self.be.pump(min(left, 0.1))
+                for s in self._reap():
+                    self.be.submit(s)
+                    q.append(s)
+        head = q[0]
+        if not head.done:
+            while not head.done:
+                left = t_end - time.monotonic()
+                if left <= 0:
+                    raise _timeout_error()
+                self.be.pump(min(left, 0.1))
+        q.popleft()
+        st = head.status; n = head.actual
+        if st == ST_COMPLETED or (st == ST_TIMED_OUT and n):
+            if n:
+                ring.write(head.mv[:n])
+                self.completed += 1
+            self.be.submit(head)
+            q.append(head)
+            k = sum(1 for s in q if s.done)
+            if k > self.max_inflight_done:
+                self.max_inflight_done = k
+            return n
+        if st in (ST_NO_DEVICE, ST_STALL, ST_ERROR):
+            # транспорт встаёт целиком; верхний уровень решит (disconnect/рестарт),
+            # следующий read_into() поставит очередь заново
+            self.pause(0.2)
+        else:
+            self.be.submit(head)
+            q.append(head)
+        eno = _STATUS_ERRNO.get(st, errno.EIO)
+        raise usb.core.USBError(f'async bulk IN status={st}', st, eno)
+
+    def close(self):
+        try:
+            self.pause()
+        finally:
+            self._reap()
+            for s in self.slots:
+                if s in self.stuck:
+                    _orphans.append((self.be, s))   # ещё в полёте: free() здесь — use-after-free
+                    continue
+                try:
+                    self.be.free(s)
+                except Exception:
+                    pass
+            self.stuck = []
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""control.py — единый клиент команд устройства (CDC и vendor bulk OUT): очередь, seq, конвейер.
+
+Команда — пакет [cmd][payload]. Ответы по CDC (в том же потоке байт, что и кадры):
+  ACK    — 0x80 cmd
+  NACK   — 0x81 cmd code
+  STATUS — 0x82 + тело (STATUS_LEN байт) — только на GET_STATUS (0x30)
+По vendor bulk ответов нет: команда считается выполненной, когда bulk OUT принят.
+
+ControlClient(write, read=None, ack=True, …):
+  submit(cmd, payload) — отправить без ожидания, вернуть Pending (seq, cmd, result);
+  burst([(cmd, payload), …]) — пачка команд подряд (по CDC — одной записью), без пауз;
+  wait(p | [p…], timeout, stream_aware=None) — дождаться ответов; send(cmd, payload) = submit + wait;
+  feed(data, stream_aware=None) — разобрать байты ответа. Ответ сопоставляется самой
+  старой ожидающей команде с тем же cmd (ACK/NACK несут эхо cmd), поэтому конвейер
+  из нескольких команд разбирается без блокирующего чтения после каждой.
+
+Кто читает ответы (режим — на вызов, stream_aware=None — умолчание клиента):
+  strict — поток не идёт, wait() сам читает порт (read) ровно по ответу и разбирает;
+  stream_aware — ответы приходят между кадрами: пока порт читает разбор кадров
+  (active() — USB_io.CDCReader.scanning()), их подаёт он сам (CDCReader.on_skip —
+  байты, пропущенные до MAGIC), а wait() только ждёт; если читателя кадров нет,
+  wait() читает порт сам короткими порциями (байты кадров при этом отбрасываются).
+  В stream_aware посторонние байты пропускаются, ACK/NACK принимаются лишь с эхом
+  ожидающей команды (0x80 внутри мусора иначе дал бы ложное совпадение), а 0x82 —
+  лишь пока ждёт GET_STATUS, и тело берётся только целиком (STATUS_LEN байт).
+Чтение порта в wait() идёт под read_lock (CDCReader.lock) — тем же, что у разбора кадров.
+
+Пауза между командами пачки — gap_s (BMI30_CMD_GAP_S, по умолчанию 0): вместо
+фиксированного sleep(0.02) после каждой команды.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import deque
+
+RSP_ACK = 0x80
+RSP_NACK = 0x81
+RSP_STATUS = 0x82
+STATUS_MAX = 256
+STATUS_LEN = 25         # тело STATUS: ver, streaming, rate u16, seq u32, win_count + 16 байт окон (rpi_cdc_client)
+CMD_GET_STATUS = 0x30   # STATUS завершает только её
+STATUS_WAIT_S = 0.02    # минимум ожидания тела STATUS после id (как в прежнем send_cmd)
+PUMP_SLICE_S = 0.05     # stream_aware без читателя кадров: порция чтения порта (потом — снова проверка active())
+
+
+def _gap_from_env() -> float:
+    try:
+        return max(0.0, float(os.getenv('BMI30_CMD_GAP_S', '0') or 0))
+    except ValueError:
+        return 0.0
+
+
+class Pending:
+    """Отправленная команда; result — ('ACK', None) | ('NACK', code) | ('STATUS', bytes) | ('UNKNOWN', id) | ('MISMATCH', эхо) | ('SENT', что вернул write)."""
+    __slots__ = ('seq', 'cmd', 'payload', 't_sent', 't_done', 'result', '_ev')
+
+    def __init__(self, seq: int, cmd: int, payload: bytes):
+        self.seq = seq
+        self.cmd = cmd
+        self.payload = payload
+        self.t_sent = 0.0
+        self.t_done = 0.0
+        self.result = None
+        self._ev = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._ev.is_set()
+
+    @property
+    def rtt(self) -> float | None:
+        return (self.t_done - self.t_sent) if self.done else None
+
+    def _finish(self, result):
+        self.result = result
+        self.t_done = time.perf_counter()
+        self._ev.set()
+
+    def __repr__(self):
+        return f'Pending(seq={self.seq}, cmd=0x{self.cmd:02X}, result={self.result})'
+
+
+class ControlClient:
+    def __init__(self, write, read=None, ack: bool = True, stream_aware: bool = False,
+                 coalesce: bool = True, gap_s: float | None = None, read_lock=None, active=None):
+        self._write = write
+        self._read = read           # read(n, timeout_s) -> bytes; None — ответы подаются через feed()
+        self._read_lock = read_lock if read_lock is not None else threading.RLock()
+        self._active = active       # active() -> True, пока ответы подаёт читатель кадров
+        self.ack = ack
+        self.stream_aware = stream_aware
+        self.coalesce = coalesce    # пачку — одной записью (CDC); vendor — пакет на команду
+        self.gap_s = _gap_from_env() if gap_s is None else max(0.0, float(gap_s))
+        self._lock = threading.RLock()
+        self._pending: deque = deque()
+        self._rx = bytearray()
+        self._seq = 0
+        self.sent = 0
+        self.acked = 0
+        self.nacked = 0
+        self.junk = 0               # байт, не ставших ответом (stream_aware)
+        self.unmatched = 0          # ответов без ожидающей команды
+        self.rtt_sum = 0.0
+
+    # --- отправка
+
+    def _new(self, cmd: int, payload: bytes) -> Pending:
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        return Pending(self._seq, int(cmd) & 0xFF, bytes(payload))
+
+    def _sent(self, ps):
+        t = time.perf_counter()
+        for p in ps:
+            p.t_sent = t
+            self.sent += 1
+        if self.ack:
+            self._pending.extend(ps)
+
+    def _wrote(self, ps, r):
+        """Без ответов команда выполнена, когда запись прошла: результат — что вернул write (для bulk — байт)."""
+        if not self.ack:
+            for p in ps:
+                p._finish(('SENT', r))
+
+    def submit(self, cmd: int, payload: bytes = b'') -> Pending:
+        return self.burst([(cmd, payload)])[0]
+
+    def burst(self, cmds) -> list:
+        """Отправить команды подряд, не дожидаясь ответов; [Pending] в том же порядке."""
+        with self._lock:
+            ps = [self._new(c, pl) for c, pl in cmds]
+            if self.coalesce and not self.gap_s:
+                # ожидание регистрируем до записи: быстрый ответ не должен опередить pending
+                self._sent(ps)
+                try:
+                    r = self._write(b''.join(bytes([p.cmd]) + p.payload for p in ps))
+                except Exception:
+                    self._drop(ps)
+                    raise
+                self._wrote(ps, r)
+                return ps
+            for i, p in enumerate(ps):
+                if i and self.gap_s:
+                    time.sleep(self.gap_s)
+                self._sent([p])
+                try:
+                    r = self._write(bytes([p.cmd]) + p.payload)
+                except Exception:
+                    self._drop(ps[i:])
+                    raise
+                self._wrote([p], r)
+            return ps
+
+    def _drop(self, ps):
+        for p in ps:
+            try:
+                self._pending.remove(p)
+            except ValueError:
+                pass
+
+    # --- ответы
+
+    def _match(self, cmd: int | None, result) -> bool:
+        """Завершить самую старую ожидающую команду cmd (None — любую)."""
+        for p in self._pending:
+            if cmd is None or p.cmd == cmd:
+                self._pending.remove(p)
+                p._finish(result)
+                if result[0] == 'ACK':
+                    self.acked += 1
+                elif result[0] == 'NACK':
+                    self.nacked += 1
+                self.rtt_sum += p.t_done - p.t_sent
+                return True
+        self.unmatched += 1
+        return False
+
+    def _waiting(self, cmd: int) -> bool:
+        return any(p.cmd == cmd for p in self._pending)
+
+    def feed(self, data, stream_aware: bool | None = None) -> None:
+        """Разобрать байты ответов (неполный ответ ждёт следующих байт)."""
+        if not data:
+            return
+        lax = self.stream_aware if stream_aware is None else stream_aware
+        with self._lock:
+            rx = self._rx
+            rx += data
+            i = 0
+            n = len(rx)
+            while i < n:
+                b = rx[i]
+                if b == RSP_ACK or b == RSP_NACK:
+                    need = 2 if b == RSP_ACK else 3
+                    if n - i < need:
+                        break
+                    echo = rx[i + 1]
+                    if not self._waiting(echo):
+                        if lax:
+                            i += 1; self.junk += 1
+                            continue
+                        self._match(None, ('MISMATCH', echo))   # strict: эхо не той команды
+                        i += need
+                        continue
+                    self._match(echo, ('ACK', None) if b == RSP_ACK else ('NACK', rx[i + 2]))
+                    i += need
+                elif b == RSP_STATUS and (not lax or self._waiting(CMD_GET_STATUS)):
+                    # 0x82 между кадрами может быть и байтом семпла: тело берётся только целиком
+                    if n - i < 1 + STATUS_LEN:
+                        break
+                    body = bytes(rx[i + 1:i + 1 + STATUS_LEN])
+                    # только GET_STATUS; отложенный STATUS после SET_* (strict) уходит в unmatched
+                    self._match(CMD_GET_STATUS, ('STATUS', body))
+                    i += 1 + STATUS_LEN
+                elif lax:
+                    i += 1; self.junk += 1
+                else:
+                    self._match(None, ('UNKNOWN', b))
+                    i += 1
+            del rx[:i]
+
+    def _pump(self, deadline: float, lax: bool) -> bool:
+        """Прочитать порт до deadline и разобрать: strict — ровно один ответ,
+        stream_aware — всё, что пришло (посторонние байты отбрасываются)."""
+        with self._read_lock:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                return False
+            if lax:
+                data = self._read(STATUS_MAX, left)
+            else:
+                b = self._read(1, left)
+                if not b:
+                    return False
+                rid = b[0]
+                if rid == RSP_ACK:
+                    tail = self._read(1, max(0.0, deadline - time.perf_counter()))
+                    if not tail:
+                        raise TimeoutError('Timeout while reading ack echo')
+                elif rid == RSP_NACK:
+                    tail = self._read(2, max(0.0, deadline - time.perf_counter()))
+                    if len(tail) < 2:
+                        raise TimeoutError('Timeout while reading nack body')
+                elif rid == RSP_STATUS:
+                    tail = self._read(STATUS_LEN, max(STATUS_WAIT_S, deadline - time.perf_counter()))
+                    if len(tail) < STATUS_LEN:
+                        raise TimeoutError('Timeout while reading status body')
+                else:
+                    tail = b''
+                data = b + tail
+        # разбор — уже без блокировки порта (on_skip читателя кадров берёт её в обратном порядке)
+        self.feed(data, stream_aware=lax)
+        return bool(data)
+
+    def _fed(self) -> bool:
+        """Ответы сейчас подаёт читатель кадров (stream_aware)."""
+        try:
+            return self._active is not None and bool(self._active())
+        except Exception:
+            return False
+
+    def wait(self, ps, timeout: float = 1.0, stream_aware: bool | None = None):
+        """Результат (или список результатов) ответов; TimeoutError, если не дождались."""
+        lax = self.stream_aware if stream_aware is None else stream_aware
+        single = isinstance(ps, Pending)
+        lst = [ps] if single else list(ps)
+        deadline = time.perf_counter() + max(0.0, float(timeout))
+        for p in lst:
+            while not p.done:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if self._read is None or (lax and self._fed()):
+                    p._ev.wait(min(PUMP_SLICE_S, deadline - now) if lax else deadline - now)
+                else:
+                    self._pump(min(deadline, now + PUMP_SLICE_S) if lax else deadline, lax)
+            if not p.done:
+                with self._lock:
+                    self._drop(lst)
+                raise TimeoutError('Timeout while reading rsp id')
+        return lst[0].result if single else [p.result for p in lst]
+
+    def send(self, cmd: int, payload: bytes = b'', timeout: float = 1.0, stream_aware: bool | None = None):
+        return self.wait(self.submit(cmd, payload), timeout, stream_aware)
+
+    def stats(self) -> dict:
+        done = self.acked + self.nacked
+        return {'sent': self.sent, 'acked': self.acked, 'nacked': self.nacked, 'pending': len(self._pending),
+                'unmatched': self.unmatched, 'junk': self.junk,
+                'rtt_ms': (1e3 * self.rtt_sum / done) if done else None}
+
+
+def cdc_client(ser) -> ControlClient:
+    """Клиент CDC-порта ser (один на порт, как USB_io.reader_for): ответы — через CDCReader порта
+    и под его блокировкой; байты, пропущенные разбором кадров до MAGIC, подаются в feed() как
+    stream_aware. Режим ожидания (strict/stream_aware) задаётся на вызов send()/wait()."""
+    import USB_io  # type: ignore[import-not-found]
+    rd = USB_io.reader_for(ser)
+    cl = getattr(ser, '_ctrl_client', None)
+    if cl is None or cl._read_lock is not rd.lock:
+        def write(pkt: bytes):
+            ser.write(pkt)
+            try:
+                ser.flush()
+            except Exception:
+                pass
+
+        def read(n: int, timeout_s: float) -> bytes:
+            t_old = getattr(ser, 'timeout', None)
+            try:
+                ser.timeout = max(0.0, timeout_s)
+            except Exception:
+                pass
+            try:
+                return rd.read(n)
+            finally:
+                try:
+                    ser.timeout = t_old
+                except Exception:
+                    pass
+
+        cl = ControlClient(write, read, ack=True, read_lock=rd.lock, active=rd.scanning)
+        try:
+            ser._ctrl_client = cl
+        except Exception:
+            pass
+        rd.on_skip = lambda data: cl.feed(data, stream_aware=True)
+    return cl
+
+
+def bulk_client(write) -> ControlClient:
+    """Клиент без ответов (vendor bulk OUT): write(pkt) на команду, без фиксированных пауз."""
+    return ControlClient(write, ack=False, coalesce=False)
+
+
+def vendor_client(stream) -> ControlClient:
+    """Клиент vendor-потока (USBStream): bulk OUT через stream.send_cmd (с его повторами/CLEAR_HALT),
+    ответов нет — пакет на команду, без фиксированных пауз."""
+    return bulk_client(lambda pkt: stream.send_cmd(pkt[0], bytes(pkt[1:])))
+
+
+def main():
+    """Конвейер против «команда — sleep(0.02)» на эмуляции устройства с задержкой ответа."""
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--latency-ms', type=float, default=1.0, help='Задержка ответа устройства')
+    ap.add_argument('--cmds', type=int, default=4, help='Команд в пачке (профиль/режим/кадр/START)')
+    args = ap.parse_args()
+    lat = args.latency_ms / 1e3
+
+    arg_len = {0x14: 1, 0x13: 1, 0x17: 2, 0x20: 0}
+
+    class Dev:
+        """Отвечает ACK на каждую команду через lat; ответы — в тот же клиент (stream_aware)."""
+        def __init__(self):
+            self.client = None
+
+        def write(self, pkt: bytes):
+            cmds = []; i = 0
+            while i < len(pkt):
+                cmds.append(pkt[i]); i += 1 + arg_len.get(pkt[i], 0)
+            def reply():
+                time.sleep(lat)
+                # ответы вперемешку с «кадром»: мусор, ACK-и и снова мусор
+                self.client.feed(b'\x5A\xA5\x80\x00' + b''.join(bytes([RSP_ACK, c]) for c in cmds) + b'\x80\x99')
+            threading.Thread(target=reply, daemon=True).start()
+
+    dev = Dev()
+    cl = ControlClient(dev.write, ack=True, stream_aware=True)
+    dev.client = cl
+    cmds = [(0x14, b'\x01'), (0x13, b'\x01'), (0x17, (912).to_bytes(2, 'little')), (0x20, b'')][:max(1, args.cmds)]
+    t0 = time.perf_counter()
+    res = cl.wait(cl.burst(cmds), timeout=1.0)
+    t_burst = time.perf_counter() - t0
+    assert all(r == ('ACK', None) for r in res), res
+    t0 = time.perf_counter()
+    for c in cmds:
+        cl.send(*c, timeout=1.0)
+        time.sleep(0.02)
+    t_seq = time.perf_counter() - t0
+    print(f"{len(cmds)} команд: конвейер {1e3 * t_burst:.1f} мс, по одной с sleep(0.02) {1e3 * t_seq:.1f} мс; {cl.stats()}")
+
+
+if __name__ == '__main__':
+    main()
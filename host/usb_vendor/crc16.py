@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""crc16.py — CRC-16/CCITT-FALSE (poly=0x1021, init=0xFFFF, без refin/refout), как в crc16.c.
+
+crc16_ccitt_false(data, init) — основная функция, принимает bytes/bytearray/memoryview
+и продолжение с init (заголовок, затем payload). Бэкенды:
+  'binascii' — binascii.crc_hqx (C, тот же полином без отражения; init передаётся как value);
+  'table'    — табличный на Python (256 записей, один шаг на байт), запасной вариант;
+  'bitwise'  — эталон (8 сдвигов на байт), только для сверки и бенчмарка.
+По умолчанию 'binascii'; BMI30_CRC_BACKEND=table|bitwise переключает.
+"""
+from __future__ import annotations
+import os
+
+try:
+    from binascii import crc_hqx as _crc_hqx
+except ImportError:  # pragma: no cover - урезанные сборки Python
+    _crc_hqx = None
+
+POLY = 0x1021
+INIT = 0xFFFF
+
+
+def _make_table() -> tuple[int, ...]:
+    t = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ POLY) if crc & 0x8000 else (crc << 1)
+        t.append(crc & 0xFFFF)
+    return tuple(t)
+
+
+TABLE = _make_table()
+
+
+def crc16_bitwise(data, init: int = INIT) -> int:
+    crc = init
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ POLY
+            else:
+                crc <<= 1
+            crc &= 0xFFFF
+    return crc
+
+
+def crc16_table(data, init: int = INIT) -> int:
+    crc = init
+    t = TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFF00) ^ t[(crc >> 8) ^ b]
+    return crc
+
+
+def crc16_binascii(data, init: int = INIT) -> int:
+    return _crc_hqx(data, init)
+
+
+BACKENDS = {'bitwise': crc16_bitwise, 'table': crc16_table}
+if _crc_hqx is not None:
+    BACKENDS['binascii'] = crc16_binascii
+
+
+def _pick(name: str | None):
+    name = (name or '').strip().lower()
+    if name in BACKENDS:
+        return name, BACKENDS[name]
+    if 'binascii' in BACKENDS:
+        return 'binascii', crc16_binascii
+    return 'table', crc16_table
+
+
+BACKEND, crc16_ccitt_false = _pick(os.getenv('BMI30_CRC_BACKEND'))
+
+
+def vendor_frame_crc(buf, off: int, frame_total: int) -> int:
+    """CRC кадра Vendor в buf с off: 30 байт заголовка (без поля crc16), затем payload."""
+    with memoryview(buf) as mv:   # отпускаем экспорт сразу: bytearray потом режут del buf[:n]
+        crc = crc16_ccitt_false(mv[off:off+30])
+        return crc16_ccitt_false(mv[off+32:off+frame_total], crc)
+
+
+if __name__ == '__main__':
+    # контрольное значение CRC-16/CCITT-FALSE для "123456789" — 0x29B1
+    for name, fn in BACKENDS.items():
+        print(f"{name:8s} 0x{fn(b'123456789'):04X}")
+    print('default ', BACKEND)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""deframe.py — пакетный дефреймер Vendor Bulk IN (общий для USBStream и утилит).
+
+scan(buf, start, end) за один проход находит в куске все полные кадры
+(магия 0xA55A, длина 32 + 2*total_samples) и 64-байтные STAT на границах
+кадров, а 32-байтные заголовки декодирует разом в массив NumPy со
+структурным dtype HDR_DTYPE (раскладка VendorHdr из USBprotocol.txt).
+
+Обход идёт по границам кадров, поэтому «магия» внутри payload не ломает
+разбор; по магии ищем только при рассинхроне. Если кадры лежат подряд и
+одной длины (обычный поток), заголовки берутся одним strided-срезом.
+"""
+from __future__ import annotations
+import struct
+
+import numpy as np
+
+MAGIC = 0xA55A
+MAGIC_LE = b"\x5A\xA5"
+HDR_SIZE = 32
+STAT_SIZE = 64
+
+HDR_STRUCT = struct.Struct('<H B B I I H H I I I H H')
+HDR_DTYPE = np.dtype([
+    ('magic', '<u2'), ('ver', 'u1'), ('flags', 'u1'),
+    ('seq', '<u4'), ('timestamp', '<u4'),
+    ('total_samples', '<u2'), ('zone_count', '<u2'),
+    ('zone1_offset', '<u4'), ('zone1_length', '<u4'),
+    ('reserved', '<u4'), ('reserved2', '<u2'), ('crc16', '<u2'),
+])
+assert HDR_DTYPE.itemsize == HDR_SIZE == HDR_STRUCT.size
+
+_HDR_IDX = np.arange(HDR_SIZE, dtype=np.intp)
+_EMPTY_HDR = np.zeros(0, dtype=HDR_DTYPE)
+
+
+class FrameBatch:
+    """Результат scan(): кадры по порядку + где остановился разбор.
+
+    rows     — [(header_tuple, offset)] для поштучной обработки (поля как в HDR_STRUCT);
+    offsets  — смещения заголовков в buf (list[int]);
+    stats    — смещения STAT-пакетов на границах кадров;
+    consumed — позиция, до которой buf разобран (хвост начинается здесь);
+    skipped  — сколько байт мусора пропущено при поиске магии."""
+    __slots__ = ('buf', 'rows', 'offsets', 'stats', 'consumed', 'skipped', '_hdr')
+
+    def __init__(self, buf, rows, offsets, stats, consumed, skipped):
+        self.buf = buf; self.rows = rows; self.offsets = offsets
+        self.stats = stats; self.consumed = consumed; self.skipped = skipped
+        self._hdr = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def hdr(self) -> np.ndarray:
+        """Заголовки всех кадров как структурный массив HDR_DTYPE."""
+        if self._hdr is None:
+            self._hdr = decode_headers(self.buf, self.offsets)
+        return self._hdr
+
+    @property
+    def seq(self) -> np.ndarray:
+        return self.hdr['seq']
+
+    @property
+    def flags(self) -> np.ndarray:
+        return self.hdr['flags']
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self.hdr['timestamp']
+
+    @property
+    def total_samples(self) -> np.ndarray:
+        return self.hdr['total_samples']
+
+
+def decode_headers(buf, offsets) -> np.ndarray:
+    """Декодировать заголовки по смещениям разом в массив HDR_DTYPE."""
+    k = len(offsets)
+    if k == 0:
+        return _EMPTY_HDR
+    o0 = offsets[0]
+    step = offsets[1] - o0 if k > 1 else HDR_SIZE
+    if step >= HDR_SIZE and offsets[-1] - o0 == step * (k - 1) \
+            and all(b - a == step for a, b in zip(offsets, offsets[1:])):
+        # равный шаг (кадры подряд одной длины): strided-вид, копия только 32*k байт заголовков
+        # (вид на bytearray запретил бы вызывающему del buf[:n])
+        return np.ndarray(shape=(k,), dtype=HDR_DTYPE, buffer=buf, offset=o0, strides=(step,)).copy()
+    a = np.frombuffer(buf, dtype=np.uint8)
+    idx = np.asarray(offsets, dtype=np.intp)[:, None] + _HDR_IDX
+    return a[idx].view(HDR_DTYPE).reshape(k)
+
+
+def scan(buf, start: int = 0, end: int | None = None, *, ver: int | None = None, stat: bool = True) -> FrameBatch:
+    """Найти все полные кадры в buf[start:end].
+
+    ver  — требовать такой байт версии сразу после магии (как MAGIC b"\\x5A\\xA5\\x01");
+    stat — распознавать 64-байтные STAT на границах кадров."""
+    n = len(buf) if end is None else end
+    i = start
+    rows = []; offsets = []; stats = []
+    skipped = 0
+    find = buf.find; unpack = HDR_STRUCT.unpack_from
+    while n - i >= HDR_SIZE:
+        # длину кадра всё равно надо прочитать из заголовка — берём его целиком
+        # кортежем для поштучных потребителей (tolist() структурного массива медленнее)
+        h = unpack(buf, i)
+        if h[0] == MAGIC and (ver is None or h[1] == ver):
+            flen = HDR_SIZE + 2 * h[5]
+            if i + flen > n:
+                break
+            rows.append((h, i)); offsets.append(i)
+            i += flen
+            continue
+        if stat and buf[i] == 0x53 and buf[i:i+4] == b'STAT':
+            if i + STAT_SIZE > n:
+                break
+            stats.append(i)
+            i += STAT_SIZE
+            continue
+        # рассинхрон: до следующей магии (или STAT)
+        j = find(MAGIC_LE, i + 1, n)
+        if stat:
+            k = find(b'STAT', i + 1, n if j == -1 else j)
+            if k != -1:
+                j = k
+        if j == -1:
+            # оставим последний байт — возможно, начало магии
+            skipped += (n - 1) - i
+            i = n - 1
+            break
+        skipped += j - i
+        i = j
+    return FrameBatch(buf, rows, offsets, stats, i, skipped)
@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""device_sim.py — программная модель BMI30 по USBprotocol.txt (VendorHdr v1, STAT v1, команды).
+
+DeviceSim — само «устройство»: команды 0x13/0x14/0x15/0x17/0x20/0x21/0x30 по bulk OUT,
+GET_STATUS/SET_ALT/SOFT_RESET/DEEP_RESET по EP0, тестовый кадр 0x81 после START,
+пары A/B заданного размера (912/944/976/1360) с заданной частотой пар, STAT на
+STOP/GET_STATUS. FIFO устройства ограничен: если хост не успевает читать, кадры
+теряются так же, как на железе (dropped).
+
+Транспорты (подставляются в USBStream(dev=...) вместо PyUSB-устройства):
+  SimDevice(sim)          — в том же процессе, прямые вызовы;
+  SocketDevice(host,port) — через локальный TCP-сокет к SimServer (симулятор в отдельном процессе).
+Оба повторяют нужную USBStream часть usb.core.Device: дескрипторы, read/write,
+ctrl_transfer, set_interface_altsetting, таймауты как USBTimeoutError(errno=110).
+
+Ошибки (faults, вероятность на пару): gap — пропуск seq, dup — повтор кадра A,
+magic — испорченная магия, crc — неверный CRC16, stat — STAT между A и B,
+stall — устройство молчит stall_ms. Строкой: "gap=0.001,crc=0.01,stall=0.0005,stall_ms=3000".
+
+Окружение для USBStream: BMI30_SIM=1 (в процессе) или BMI30_SIM=host:port (сокет),
+BMI30_SIM_SAMPLES, BMI30_SIM_RATE (пар/с), BMI30_SIM_FAULTS, BMI30_SIM_CRC.
+
+Usage:
+  python -m usb_vendor.device_sim --run 10 --rate 3000 --samples 1360 --faults gap=0.001,stat=0.01
+  python -m usb_vendor.device_sim --serve 127.0.0.1:5555 --rate 2000
+"""
+from __future__ import annotations
+import argparse, array, ctypes, errno, math, os, random, socket, socketserver, struct, threading, time
+from collections import deque
+
+import numpy as np
+import usb.core
+
+try:
+    from .crc16 import vendor_frame_crc
+    from .deframe import HDR_STRUCT, HDR_SIZE, STAT_SIZE, MAGIC
+except ImportError:
+    from crc16 import vendor_frame_crc
+    from deframe import HDR_STRUCT, HDR_SIZE, STAT_SIZE, MAGIC
+
+VID, PID = 0xCAFE, 0x4001
+EP_IN, EP_OUT = 0x83, 0x03
+CDC_IN, CDC_OUT = 0x81, 0x01
+VENDOR_INTF = 2
+
+CMD_SET_FULL_MODE = 0x13
+CMD_SET_PROFILE = 0x14
+CMD_SET_ROI_US = 0x15
+CMD_SET_FRAME_SAMPLES = 0x17
+CMD_START_STREAM = 0x20
+CMD_STOP_STREAM = 0x21
+CMD_GET_STATUS = 0x30
+CMD_SET_ALT = 0x31
+CMD_SOFT_RESET = 0x7E
+CMD_DEEP_RESET = 0x7F
+
+VF_ADC0, VF_ADC1, VF_CRC, VF_TEST = 0x01, 0x02, 0x04, 0x80
+FRAME_SIZES = (912, 944, 976, 1360)
+PROFILE_RATES = {1: 200.0, 2: 300.0}   # пар/с по профилю, если rate не задан явно
+TEST_SAMPLES = 8
+FIFO_FRAMES = 32
+
+# STAT v1 (USBprotocol.txt §4) + биты готовности, которые читает USBStream._parse_stat_ready:
+# @50 u16 bit15 — alt1, @53 bit7 — out_armed
+STAT_STRUCT = struct.Struct('<4sBBHHH IIIIIIIII HH BB')
+FAULTS = ('gap', 'dup', 'magic', 'crc', 'stat', 'stall')
+
+
+def parse_faults(spec) -> dict:
+    """'gap=0.001,crc=0.01,stall_ms=500' → dict; неизвестные ключи — ValueError."""
+    if not spec:
+        return {}
+    if isinstance(spec, dict):
+        return dict(spec)
+    out = {}
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        k, _, v = part.partition('=')
+        k = k.strip()
+        if k not in FAULTS and k != 'stall_ms':
+            raise ValueError(f"unknown fault: {k}")
+        out[k] = float(v) if v else 1.0
+    return out
+
+
+class DeviceSim:
+    """Протокольная модель устройства; потокобезопасна (RX и команды из разных потоков)."""
+    def __init__(self, samples: int = 912, pair_rate: float | None = None, crc: bool = True,
+                 fifo: int = FIFO_FRAMES, faults=None, seed: int = 0):
+        self.samples = int(samples)
+        self.pair_rate = pair_rate
+        self.crc = crc
+        self.fifo_depth = max(2, int(fifo))
+        self.faults = parse_faults(faults)
+        self.stall_s = self.faults.get('stall_ms', 2000.0) / 1000.0
+        self.rng = random.Random(seed)
+        self.cv = threading.Condition()
+        self.profile = 1; self.full = 1; self.roi_us = 0
+        self.alt = 0
+        self.injected = {k: 0 for k in FAULTS}
+        self._waves = {}
+        self._reset_state()
+
+    def _reset_state(self):
+        self.streaming = False
+        self.fifo = deque()
+        self._partial = None
+        self.seq = 0
+        self.dropped = 0
+        self.test_frames = 0; self.produced_seq = 0; self.sent0 = 0; self.sent1 = 0
+        self.tx_cplt = 0; self.frame_wr_seq = 0
+        self._t0 = 0.0; self._k = 0; self._stall_until = 0.0
+
+    @property
+    def rate(self) -> float:
+        return float(self.pair_rate or PROFILE_RATES.get(self.profile, 200.0))
+
+    # --- кадры ---
+    def _wave(self, ch: int) -> bytes:
+        """Период сигнала канала (дважды подряд — срез любой фазы без склейки)."""
+        w = self._waves.get(ch)
+        if w is None:
+            period = 4096
+            t = np.arange(period) * (2 * math.pi / period)
+            x = (8000 if ch == 0 else 6000) * np.sin(t * (3 if ch == 0 else 5) + ch * 0.7)
+            w = np.tile(np.round(x).astype('<i2'), 2).tobytes()
+            self._waves[ch] = w
+        return w
+
+    def _frame(self, seq: int, flags: int, samples: int, ts: int) -> bytearray:
+        if flags & VF_TEST:
+            payload = struct.pack(f'<{samples}h', *range(samples))
+        else:
+            ch = 1 if flags & VF_ADC1 else 0
+            off = 2 * ((seq * samples) % 4096)
+            payload = self._wave(ch)[off:off + 2 * samples]
+        if self.crc:
+            flags |= VF_CRC
+        f = bytearray(HDR_STRUCT.pack(MAGIC, 1, flags, seq & 0xFFFFFFFF, ts & 0xFFFFFFFF, samples, 0, 0, 0, 0, 0, 0))
+        f += payload
+        if self.crc:
+            struct.pack_into('<H', f, HDR_SIZE - 2, vendor_frame_crc(f, 0, len(f)))
+        return f
+
+    def stat(self) -> bytes:
+        cur = self.samples if self.produced_seq else 0
+        flags_runtime = (1 if self.streaming else 0) | (2 if self.full else 0)
+        flags2 = 0x8000 if self.alt == 1 else 0
+        st = STAT_STRUCT.pack(b'STAT', 1, 0, cur, (HDR_SIZE + 2 * cur) if cur else 0, self.test_frames & 0xFFFF,
+                              self.produced_seq & 0xFFFFFFFF, self.sent0, self.sent1, self.tx_cplt, 0, 0,
+                              self.produced_seq, self.produced_seq, self.frame_wr_seq & 0xFFFFFFFF,
+                              flags_runtime, flags2, 0, 0x80)
+        return st + bytes(STAT_SIZE - len(st))
+
+    def _push(self, pkt) -> bool:
+        if len(self.fifo) >= self.fifo_depth:
+            self.dropped += 1
+            return False
+        self.fifo.append(pkt)
+        return True
+
+    def _pump(self, now: float):
+        """Дорисовать пары, «созревшие» к now (под self.cv)."""
+        if not self.streaming or now < self._stall_until:
+            return
+        due = int((now - self._t0) * self.rate)
+        f = self.faults; rnd = self.rng.random
+        n = self.samples
+        while self._k < due:
+            if len(self.fifo) >= self.fifo_depth:
+                # хост не читает: DMA крутится, кадры пропадают целыми парами
+                self.dropped += 2 * (due - self._k)
+                self.seq += due - self._k
+                self.produced_seq += due - self._k
+                self._k = due
+                break
+            ts = int(self._k * 1000 / self.rate)
+            self._k += 1
+            if f.get('gap') and rnd() < f['gap']:
+                self.seq += 1; self.injected['gap'] += 1
+            seq = self.seq
+            a = self._frame(seq, VF_ADC0, n, ts)
+            b = self._frame(seq, VF_ADC1, n, ts)
+            if f.get('crc') and rnd() < f['crc']:
+                a[HDR_SIZE] ^= 0xFF; self.injected['crc'] += 1
+            if f.get('magic') and rnd() < f['magic']:
+                a[0] ^= 0xFF; self.injected['magic'] += 1
+            self._push(a); self.sent0 += 1
+            if f.get('stat') and rnd() < f['stat']:
+                self._push(self.stat()); self.injected['stat'] += 1
+            self._push(b); self.sent1 += 1
+            if f.get('dup') and rnd() < f['dup']:
+                self._push(bytes(a)); self.injected['dup'] += 1
+            self.seq += 1
+            self.produced_seq += 1
+            self.frame_wr_seq += 2
+            if f.get('stall') and rnd() < f['stall']:
+                # устройство замолкает; по окончании — продолжает с текущего момента
+                self.injected['stall'] += 1
+                self._stall_until = now + self.stall_s
+                self._t0 += self.stall_s
+                break
+
+    # --- транспортный уровень ---
+    def read(self, size: int, timeout_s: float) -> bytes | None:
+        """Один bulk IN transfer до size байт (кадр/STAT; длинный — по частям) или None по таймауту."""
+        t_end = time.monotonic() + max(0.0, timeout_s)
+        with self.cv:
+            while True:
+                if self._partial:
+                    pkt = self._partial; self._partial = None
+                else:
+                    self._pump(time.monotonic())
+                    pkt = self.fifo.popleft() if self.fifo else None
+                if pkt is not None:
+                    if len(pkt) > size:
+                        self._partial = pkt[size:]
+                        pkt = pkt[:size]
+                    else:
+                        self.tx_cplt += 1
+                    return bytes(pkt)
+                now = time.monotonic()
+                left = t_end - now
+                if left <= 0:
+                    return None
+                if self.streaming:
+                    # ждём следующую пару (или конец паузы stall)
+                    nxt = max(self._stall_until, self._t0 + (self._k + 1) / self.rate) - now
+                    left = min(left, max(0.0002, nxt))
+                self.cv.wait(left)
+
+    def command(self, pkt: bytes):
+        """Bulk OUT: первый байт — код команды (USBprotocol.txt §3)."""
+        if not pkt:
+            return
+        cmd = pkt[0]; arg = bytes(pkt[1:])
+        with self.cv:
+            if cmd == CMD_SET_PROFILE and arg:
+                self.profile = arg[0]
+            elif cmd == CMD_SET_FULL_MODE and arg:
+                self.full = arg[0]
+            elif cmd == CMD_SET_ROI_US and len(arg) >= 4:
+                self.roi_us = int.from_bytes(arg[:4], 'little')
+            elif cmd == CMD_SET_FRAME_SAMPLES and len(arg) >= 2:
+                ns = int.from_bytes(arg[:2], 'little')
+                if ns:
+                    self.samples = ns
+            elif cmd == CMD_START_STREAM:
+                self.fifo.clear(); self._partial = None
+                self._push(self._frame(0, VF_ADC0 | VF_TEST, TEST_SAMPLES, 0))
+                self.test_frames += 1
+                self.streaming = True
+                self._t0 = time.monotonic(); self._k = 0; self._stall_until = 0.0
+            elif cmd == CMD_STOP_STREAM:
+                self.streaming = False
+                self.fifo.clear(); self._partial = None
+                self._push(self.stat())
+            elif cmd == CMD_GET_STATUS:
+                self._push(self.stat())
+            self.cv.notify_all()
+
+    def control(self, bm: int, req: int, value: int, index: int, data_or_len=None):
+        """EP0: vendor GET_STATUS (IN), SET_ALT/SOFT_RESET/DEEP_RESET, стандартный SET_INTERFACE."""
+        with self.cv:
+            if bm & 0x80:
+                if req == CMD_GET_STATUS:
+                    n = int(data_or_len or STAT_SIZE)
+                    return self.stat()[:n]
+                raise usb.core.USBError('Pipe error', errno.EPIPE, errno.EPIPE)
+            if req in (CMD_SET_ALT, 0x0B):
+                self.alt = int(value)
+            elif req == CMD_SOFT_RESET:
+                self.streaming = False; self.fifo.clear(); self._partial = None
+            elif req == CMD_DEEP_RESET:
+                self._reset_state()
+            self.cv.notify_all()
+            return 0
+
+    def set_alt(self, alt: int):
+        with self.cv:
+            self.alt = int(alt)
+
+    def reset(self):
+        with self.cv:
+            self._reset_state()
+            self.alt = 0
+            self.cv.notify_all()
+
+
+# --- PyUSB-совместимые дескрипторы ---
+class _Ep:
+    def __init__(self, addr: int):
+        self.bEndpointAddress = addr; self.bmAttributes = 2; self.wMaxPacketSize = 512
+
+
+class _Intf:
+    def __init__(self, num: int, alt: int, cls: int, eps):
+        self.bInterfaceNumber = num; self.bAlternateSetting = alt; self.bInterfaceClass = cls
+        self._eps = [_Ep(e) for e in eps]
+    def endpoints(self):
+        return list(self._eps)
+    def __iter__(self):
+        return iter(self._eps)
+
+
+class _Cfg:
+    bConfigurationValue = 1
+    def __init__(self):
+        self._intfs = [_Intf(0, 0, 0x02, ()), _Intf(1, 0, 0x0A, (CDC_OUT, CDC_IN)),
+                       _Intf(VENDOR_INTF, 0, 0xFF, (EP_OUT, EP_IN)), _Intf(VENDOR_INTF, 1, 0xFF, (EP_OUT, EP_IN))]
+    def __iter__(self):
+        return iter(self._intfs)
+
+
+class _Ctx:
+    """Заглушка dev._ctx для usb.util.claim_interface/release_interface/dispose_resources."""
+    def managed_claim_interface(self, dev, intf):
+        pass
+    def managed_release_interface(self, dev, intf):
+        pass
+    def dispose(self, dev, close_handle=True):
+        pass
+
+
+def _timeout_error():
+    return usb.core.USBTimeoutError('Operation timed out', errno.ETIMEDOUT, errno.ETIMEDOUT)
+
+
+def _store(buff, data: bytes):
+    """Положить data в приёмник dev.read(): int (вернуть array), array/окно RxRing (buffer_info) или буфер."""
+    if isinstance(buff, int):
+        return array.array('B', data)
+    n = len(data)
+    if hasattr(buff, 'buffer_info'):
+        addr, cap = buff.buffer_info()
+        n = min(n, cap * getattr(buff, 'itemsize', 1))
+        ctypes.memmove(addr, data, n)
+    else:
+        mv = memoryview(buff).cast('B')
+        n = min(n, len(mv))
+        mv[:n] = data[:n]
+    return n
+
+
+class _UsbLike:
+    """Общая часть «устройства» для USBStream: дескрипторы и служебные методы PyUSB."""
+    idVendor = VID; idProduct = PID
+    bus = None; address = None; port_numbers = None
+    def __init__(self):
+        self._cfg = _Cfg()
+        self._ctx = _Ctx()
+    def __iter__(self):
+        return iter([self._cfg])
+    def get_active_configuration(self):
+        return self._cfg
+    def set_configuration(self, cfg=None):
+        pass
+    def is_kernel_driver_active(self, intf):
+        return False
+    def detach_kernel_driver(self, intf):
+        pass
+    def clear_halt(self, ep):
+        pass
+    def read(self, ep, buff, timeout=None):
+        if ep != EP_IN:
+            raise _timeout_error()
+        size = buff if isinstance(buff, int) else (buff.buffer_info()[1] if hasattr(buff, 'buffer_info') else len(buff))
+        data = self._read(size, (timeout or 1000) / 1000.0)
+        if data is None:
+            raise _timeout_error()
+        return _store(buff, data)
+    def write(self, ep, data, timeout=None):
+        data = bytes(data)
+        if ep in (EP_OUT, CDC_OUT):
+            self._write(data)
+        return len(data)
+
+
+class SimDevice(_UsbLike):
+    """Транспорт «в процессе»: USBStream(dev=SimDevice(DeviceSim(...)))."""
+    def __init__(self, sim: DeviceSim):
+        super().__init__()
+        self.sim = sim
+    def _read(self, size, timeout_s):
+        return self.sim.read(size, timeout_s)
+    def _write(self, data):
+        self.sim.command(data)
+    def ctrl_transfer(self, bm, req, wValue=0, wIndex=0, data_or_wLength=None, timeout=None):
+        r = self.sim.control(bm, req, wValue, wIndex, data_or_wLength)
+        return array.array('B', r) if isinstance(r, bytes) else r
+    def set_interface_altsetting(self, interface=None, alternate_setting=None):
+        self.sim.set_alt(alternate_setting or 0)
+    def reset(self):
+        self.sim.reset()
+
+
+# --- транспорт через сокет ---
+# запрос: op, ep, bmRequestType, bRequest, wValue, wIndex, длина (данных или макс. чтения), timeout_ms
+REQ = struct.Struct('<BBBBHHII')
+RESP = struct.Struct('<iI')        # 0 или -errno, длина данных
+OP_READ, OP_WRITE, OP_CTRL, OP_ALT, OP_RESET = range(1, 6)
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        part = sock.recv(n - len(buf))
+        if not part:
+            raise ConnectionError('closed')
+        buf += part
+    return bytes(buf)
+
+
+class _SimHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sim = self.server.sim
+        s = self.request
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                op, ep, bm, req, value, index, n, tmo = REQ.unpack(_recv_exact(s, REQ.size))
+                data = _recv_exact(s, n) if (op == OP_WRITE or (op == OP_CTRL and not bm & 0x80)) and n else b''
+                st = 0; out = b''
+                try:
+                    if op == OP_READ:
+                        r = sim.read(n, tmo / 1000.0)
+                        if r is None:
+                            st = -errno.ETIMEDOUT
+                        else:
+                            out = r
+                    elif op == OP_WRITE:
+                        sim.command(data)
+                    elif op == OP_CTRL:
+                        r = sim.control(bm, req, value, index, n if bm & 0x80 else data)
+                        out = r if isinstance(r, bytes) else b''
+                    elif op == OP_ALT:
+                        sim.set_alt(value)
+                    elif op == OP_RESET:
+                        sim.reset()
+                except usb.core.USBError as e:
+                    st = -(e.errno or errno.EIO)
+                s.sendall(RESP.pack(st, len(out)) + out)
+        except (ConnectionError, OSError):
+            pass
+
+
+class SimServer(socketserver.ThreadingTCPServer):
+    """DeviceSim за TCP-сокетом; каждое подключение — свой поток (RX и команды идут параллельно)."""
+    daemon_threads = True
+    allow_reuse_address = True
+    def __init__(self, sim: DeviceSim, host: str = '127.0.0.1', port: int = 0):
+        self.sim = sim
+        super().__init__((host, port), _SimHandler)
+
+
+class SocketDevice(_UsbLike):
+    """Транспорт через сокет: два соединения — bulk IN отдельно от команд/EP0."""
+    def __init__(self, host: str = '127.0.0.1', port: int = 5555):
+        super().__init__()
+        self._addr = (host, int(port))
+        self._rx = socket.create_connection(self._addr)
+        self._tx = socket.create_connection(self._addr)
+        for s in (self._rx, self._tx):
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._tx_lock = threading.Lock()
+    def _call(self, sock, op, ep=0, bm=0, req=0, value=0, index=0, n=0, tmo=0, data=b''):
+        try:
+            sock.sendall(REQ.pack(op, ep, bm, req, value & 0xFFFF, index & 0xFFFF, n, tmo) + data)
+            st, ln = RESP.unpack(_recv_exact(sock, RESP.size))
+            out = _recv_exact(sock, ln) if ln else b''
+        except (ConnectionError, OSError):
+            raise usb.core.USBError('No such device', errno.ENODEV, errno.ENODEV)
+        if st == -errno.ETIMEDOUT:
+            return None
+        if st < 0:
+            raise usb.core.USBError(os.strerror(-st), -st, -st)
+        return out
+    def _read(self, size, timeout_s):
+        return self._call(self._rx, OP_READ, EP_IN, n=size, tmo=int(timeout_s * 1000))
+    def _write(self, data):
+        with self._tx_lock:
+            self._call(self._tx, OP_WRITE, EP_OUT, n=len(data), data=data)
+    def ctrl_transfer(self, bm, req, wValue=0, wIndex=0, data_or_wLength=None, timeout=None):
+        with self._tx_lock:
+            if bm & 0x80:
+                out = self._call(self._tx, OP_CTRL, 0, bm, req, wValue, wIndex, n=int(data_or_wLength or 0))
+                return array.array('B', out or b'')
+            data = bytes(data_or_wLength or b'')
+            self._call(self._tx, OP_CTRL, 0, bm, req, wValue, wIndex, n=len(data), data=data)
+            return len(data)
+    def set_interface_altsetting(self, interface=None, alternate_setting=None):
+        with self._tx_lock:
+            self._call(self._tx, OP_ALT, value=int(alternate_setting or 0))
+    def reset(self):
+        with self._tx_lock:
+            self._call(self._tx, OP_RESET)
+    def close(self):
+        for s in (self._rx, self._tx):
+            try:
+                s.close()
+            except Exception:
+                pass
+
+
+def from_env():
+    """PyUSB-совместимое устройство по BMI30_SIM (1 — в процессе, host:port — сокет) или None."""
+    spec = (os.getenv('BMI30_SIM') or '').strip()
+    if not spec or spec.lower() in ('0', 'false', 'no'):
+        return None
+    if ':' in spec:
+        host, _, port = spec.rpartition(':')
+        return SocketDevice(host or '127.0.0.1', int(port))
+    try:
+        samples = int(os.getenv('BMI30_SIM_SAMPLES', '912'))
+    except Exception:
+        samples = 912
+    try:
+        rate = float(os.getenv('BMI30_SIM_RATE', '0')) or None
+    except Exception:
+        rate = None
+    crc = str(os.getenv('BMI30_SIM_CRC', '1')).lower() not in ('0', 'false', 'no')
+    return SimDevice(DeviceSim(samples, rate, crc=crc, faults=os.getenv('BMI30_SIM_FAULTS')))
+
+
+def _run(sim: DeviceSim, duration: float, dev=None):
+    """Нагрузочный прогон: USBStream поверх симулятора, считаем пары и разрывы seq."""
+    try:
+        from .usb_stream import USBStream
+    except ImportError:
+        from usb_stream import USBStream
+    us = USBStream(dev=dev or SimDevice(sim), profile=1, full=True)
+    dst0 = np.zeros(4096, dtype=np.int16); dst1 = np.zeros(4096, dtype=np.int16)
+    pairs = 0; gaps = 0; last = None
+    t0 = time.perf_counter()
+    try:
+        while time.perf_counter() - t0 < duration:
+            r = us.get_stereo_into(dst0, dst1, timeout=0.2)
+            if r is None:
+                continue
+            seq = r[0]
+            if last is not None and seq != last + 1:
+                gaps += 1
+            last = seq; pairs += 1
+    finally:
+        us.close()
+    dt = time.perf_counter() - t0
+    ps = us.pool.stats()
+    print(f"pairs={pairs} ({pairs/dt:.0f}/s, устройство {sim.rate:.0f}/s × {sim.samples}) seq_gaps={gaps} "
+          f"crc_bad={us.crc_bad} magic_bad={us.magic_bad} orphans={ps['orphans_a']}/{ps['orphans_b']} "
+          f"pair_drop={ps['dropped_pairs']} dev_dropped={sim.dropped} injected={sim.injected}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--samples', type=int, default=912, help='Семплов в кадре: 912/944/976/1360')
+    ap.add_argument('--rate', type=float, default=None, help='Пар/с (по умолчанию — по профилю: 200/300)')
+    ap.add_argument('--no-crc', action='store_true')
+    ap.add_argument('--fifo', type=int, default=FIFO_FRAMES, help='Глубина FIFO устройства, кадров')
+    ap.add_argument('--faults', default=os.getenv('BMI30_SIM_FAULTS', ''), help='gap=..,dup=..,magic=..,crc=..,stat=..,stall=..,stall_ms=..')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--serve', default=None, metavar='HOST:PORT', help='Отдавать симулятор через TCP (BMI30_SIM=HOST:PORT)')
+    ap.add_argument('--run', type=float, default=None, metavar='SEC', help='Прогнать USBStream поверх симулятора')
+    args = ap.parse_args()
+    sim = DeviceSim(args.samples, args.rate, crc=not args.no_crc, fifo=args.fifo, faults=args.faults, seed=args.seed)
+    if args.serve:
+        host, _, port = args.serve.rpartition(':')
+        srv = SimServer(sim, host or '127.0.0.1', int(port))
+        print(f"[sim] {srv.server_address[0]}:{srv.server_address[1]} samples={sim.samples} faults={sim.faults or '-'}")
+        try:
+            srv.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            srv.server_close()
+        return
+    _run(sim, args.run or 5.0)
+
+
+if __name__ == '__main__':
+    main()
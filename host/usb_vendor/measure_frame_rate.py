@@ -15,8 +15,10 @@ import argparse, time, statistics as stats
 
 try:
     from .usb_stream import USBStream  # type: ignore
+    from .replay import ReplayStream  # type: ignore
 except Exception:
     from usb_stream import USBStream  # type: ignore
+    from replay import ReplayStream  # type: ignore
 
 
 def percentiles(values: list[float], qs=(50,90,99)):
@@ -44,10 +46,16 @@ def main():
     ap.add_argument('--frame-samples', type=int, default=None, help='Запросить размер кадра (u16) перед START, например 10 для ~20 FPS @200Hz')
     ap.add_argument('--show-bytes', action='store_true', help='Печатать первые 16 int16 из A/B для первых кадров')
     ap.add_argument('--pause-threshold', type=float, default=5.0, help='Порог длинной паузы, сек')
+    ap.add_argument('--replay', default=None, help='Вместо устройства воспроизвести запись (.bmr или сырой дамп)')
+    ap.add_argument('--speed', type=float, default=1.0, help='Темп воспроизведения: 1 — реальное время, 0 — как можно быстрее')
     args = ap.parse_args()
 
-    stream = USBStream(profile=args.profile, full=args.full, test_as_data=False, frame_samples=args.frame_samples)
-    print(f"[open] stream profile={args.profile} full={args.full} ns={args.frame_samples}")
+    if args.replay:
+        stream = ReplayStream(args.replay, speed=args.speed, frame_samples=args.frame_samples)
+        print(f"[open] replay {args.replay} speed={args.speed}")
+    else:
+        stream = USBStream(profile=args.profile, full=args.full, test_as_data=False, frame_samples=args.frame_samples)
+        print(f"[open] stream profile={args.profile} full={args.full} ns={args.frame_samples}")
 
     t0 = time.time()
     warm_until = t0 + args.warmup
@@ -71,6 +79,7 @@ def main():
             a, b = pair
             now = time.time()
             if now < warm_until:
+                a.release(); b.release()
                 last_pair_t = now
                 continue
             pairs += 1
@@ -81,6 +90,7 @@ def main():
                 print('[A] len=', len(ch0), 'first16=', ch0[:16].tolist())
                 print('[B] len=', len(ch1), 'first16=', ch1[:16].tolist())
                 shown += 1
+            a.release(); b.release()
             if last_pair_t is not None:
                 dt = now - last_pair_t
                 intervals.append(dt)
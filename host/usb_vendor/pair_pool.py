@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""pair_pool.py — преаллоцированное хранилище стереопар A/B для USBStream.
+
+Полукадры копируются из приёмного кольца в массив (capacity, 2, samples) int16.
+Слоты выдаются по счётчику пар, по кругу: первый полукадр пары занимает следующий
+слот, второй находит его по seq партнёра (ожидающие полукадры — в массивах по
+каналу с индексом seq % capacity, без аллокаций на кадр), поэтому и при relaxed-паре (B.seq == A.seq + 1) заняты все capacity слотов. Готовые пары
+уходят в кольцевую очередь индексов; потребитель забирает их через get() (виды
+на слот до release()) или pop_into() (копия в свои буферы, слот освобождается сразу).
+
+Поток RX никогда не ждёт потребителя: если следующий слот занят непрочитанной
+парой, срабатывает политика
+  drop_oldest — старая пара выбрасывается (по умолчанию, GUI нужен свежий поток);
+  drop_newest — выбрасывается входящий полукадр.
+Слоты, выданные через get() и ещё не отпущенные, не отбираются никогда — они
+пропускаются; если заняты все, входящий полукадр отбрасывается и считается в overruns.
+Полукадры без пары, вытесненные новым, считаются в orphans_a / orphans_b.
+"""
+from __future__ import annotations
+import os, threading, time
+
+import numpy as np
+
+PAIR_CAPACITY = 256
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+
+_EMPTY, _HALF, _READY, _OUT = range(4)
+
+
+class PairHalf:
+    """Полукадр пары: те же поля, что у Frame, payload — байтовый вид на слот пула."""
+    __slots__ = ('seq', 'timestamp', 'adc_id', 'flags', 'samples', 'payload', '_pool', '_slot', '_gen')
+    def __init__(self, pool, slot: int, adc_id: int):
+        self.seq = 0; self.timestamp = 0; self.adc_id = adc_id; self.flags = 0; self.samples = 0
+        self.payload = b''
+        self._pool = pool; self._slot = slot; self._gen = -1
+    def release(self):
+        """Слот пары можно переиспользовать после release() обеих половин."""
+        self._pool._release(self)
+
+
+class PairPool:
+    def __init__(self, capacity: int = PAIR_CAPACITY, samples: int | None = None,
+                 policy: str = DROP_OLDEST, relaxed: bool = True):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"unknown pair policy: {policy}")
+        self.cap = max(2, int(capacity))
+        self.policy = policy
+        self.relaxed = relaxed          # допускаем B.seq == A.seq + 1 (seq на каждый кадр)
+        cap = self.cap
+        self.key = [-1] * cap           # seq первого пришедшего полукадра в слоте
+        self.have = [0] * cap           # биты: 1 — A, 2 — B
+        self.state = [_EMPTY] * cap
+        self.gen = [0] * cap            # поколение слота: меняется, когда готовую пару выбрасывают
+        # ожидающие полукадры по каналу: [adc_id][seq % cap] → seq (проверка) и слот (state == _HALF)
+        self.pend_seq = [[-1] * cap, [-1] * cap]
+        self.pend_slot = [[0] * cap, [0] * cap]
+        self._next = 0                  # счётчик пар: следующий слот под новую пару
+        self.out = [0] * cap            # биты ещё не отпущенных половин (state == _OUT)
+        self.halves = [(PairHalf(self, s, 0), PairHalf(self, s, 1)) for s in range(cap)]
+        # очередь готовых пар: (slot, gen) в двух параллельных кольцах
+        self._rq = [0] * (2 * cap); self._rg = [0] * (2 * cap)
+        self._rh = 0; self._rt = 0
+        self.cv = threading.Condition(threading.Lock())
+        self.on_pair = None             # callback(slot, a, b) при сборке пары (в потоке RX, под lock)
+        self.queue_pairs = True         # False — пары только отдаются в on_pair, слот сразу свободен
+        self.samples = 0
+        self.data = None
+        if samples:
+            self._alloc(int(samples))
+        # счётчики
+        self.pairs = 0
+        self.orphans_a = 0; self.orphans_b = 0
+        self.dropped_pairs = 0          # готовые пары, вытесненные drop_oldest
+        self.dropped_frames = 0         # входящие полукадры, отброшенные drop_newest
+        self.overruns = 0               # входящие полукадры, отброшенные: все слоты у потребителя (get() без release())
+        self.resized = 0
+
+    @classmethod
+    def from_env(cls, capacity: int | None = None, policy: str | None = None, samples: int | None = None):
+        """Параметры по умолчанию из BMI30_PAIR_CAPACITY / BMI30_PAIR_POLICY / BMI30_RELAXED_PAIRING."""
+        try:
+            capacity = int(capacity if capacity is not None else os.getenv('BMI30_PAIR_CAPACITY', PAIR_CAPACITY))
+        except Exception:
+            capacity = PAIR_CAPACITY
+        policy = (policy or os.getenv('BMI30_PAIR_POLICY', DROP_OLDEST)).strip().lower()
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            policy = DROP_OLDEST
+        try:
+            relaxed = str(os.getenv('BMI30_RELAXED_PAIRING', '1')).lower() not in ('0', 'false', 'no')
+        except Exception:
+            relaxed = True
+        return cls(capacity, samples, policy, relaxed)
+
+    def _alloc(self, samples: int):
+        self.samples = samples
+        self.data = np.zeros((self.cap, 2, samples), dtype=np.int16)
+        self._rows = [(memoryview(self.data[s, 0]).cast('B'), memoryview(self.data[s, 1]).cast('B'))
+                      for s in range(self.cap)]
+
+    def _reset(self):
+        cap = self.cap
+        for s in range(cap):
+            self.gen[s] += 1
+        self.key = [-1] * cap; self.have = [0] * cap
+        self.state = [_EMPTY] * cap; self.out = [0] * cap
+        self.pend_seq = [[-1] * cap, [-1] * cap]; self._next = 0
+        self._rh = self._rt = 0
+
+    # --- производитель (поток RX) ---
+    def push(self, adc_id: int, seq: int, timestamp: int, flags: int, payload) -> bool:
+        """Положить полукадр (payload — байты int16 LE). False — полукадр отброшен политикой."""
+        nb = len(payload)
+        n = nb >> 1
+        with self.cv:
+            if n > self.samples:
+                # кадр длиннее слотов (сменили frame_samples) — пул заново
+                if self.data is not None:
+                    self.resized += 1
+                    self._reset()
+                self._alloc(n)
+            state = self.state; have = self.have; cap = self.cap
+            bit = 1 << adc_id
+            ps = self.pend_seq[adc_id ^ 1]
+            t = -1
+            h = seq % cap
+            if ps[h] == seq:
+                ps[h] = -1; t = self.pend_slot[adc_id ^ 1][h]
+            elif self.relaxed:
+                sq = (seq - 1 if adc_id else seq + 1) & 0xFFFFFFFF
+                h = sq % cap
+                if ps[h] == sq:
+                    ps[h] = -1; t = self.pend_slot[adc_id ^ 1][h]
+            if t < 0:
+                # первый полукадр новой пары — в следующий слот по счётчику
+                t = self._take_slot()
+                if t < 0:
+                    return False
+                self.key[t] = seq; have[t] = bit; state[t] = _HALF
+                h = seq % cap
+                self.pend_seq[adc_id][h] = seq; self.pend_slot[adc_id][h] = t
+            else:
+                have[t] = 3; state[t] = _READY
+            row = self._rows[t][adc_id]
+            row[:nb] = payload
+            hf = self.halves[t][adc_id]
+            hf.seq = seq; hf.timestamp = timestamp; hf.flags = flags; hf.samples = n
+            hf.payload = row if n == self.samples else row[:nb]
+            if state[t] == _READY:
+                self.pairs += 1
+                if self.on_pair is not None:
+                    a, b = self.halves[t]
+                    self.on_pair(t, a, b)
+                if not self.queue_pairs:
+                    self.key[t] = -1; have[t] = 0; state[t] = _EMPTY
+                    return True
+                self._enqueue(t)
+                self.cv.notify()
+            return True
+
+    def _take_slot(self) -> int:
+        """Следующий слот под новую пару (слоты у потребителя пропускаются); -1 — полукадр отброшен."""
+        cap = self.cap
+        state = self.state
+        for k in range(cap):
+            s = (self._next + k) % cap
+            st = state[s]
+            if st == _OUT:
+                continue
+            if st == _READY:
+                if self.policy == DROP_NEWEST:
+                    self.dropped_frames += 1
+                    return -1
+                self.dropped_pairs += 1
+                self.gen[s] += 1
+            elif st == _HALF:
+                h = self.have[s]
+                if h & 1:
+                    self.orphans_a += 1
+                if h & 2:
+                    self.orphans_b += 1
+                ch = 0 if h & 1 else 1
+                ks = self.key[s]; i = ks % cap
+                if self.pend_seq[ch][i] == ks and self.pend_slot[ch][i] == s:
+                    self.pend_seq[ch][i] = -1
+            self._next = (s + 1) % cap
+            return s
+        self.overruns += 1
+        return -1
+
+    def _enqueue(self, slot: int):
+        q = len(self._rq)
+        if self._rt - self._rh >= q:
+            # очередь индексов переполнена устаревшими записями — самая старая уходит
+            self._drop_head()
+        i = self._rt % q
+        self._rq[i] = slot; self._rg[i] = self.gen[slot]
+        self._rt += 1
+
+    def _drop_head(self):
+        i = self._rh % len(self._rq)
+        s = self._rq[i]
+        if self._rg[i] == self.gen[s] and self.state[s] == _READY:
+            self.dropped_pairs += 1
+            self.gen[s] += 1
+            self.key[s] = -1; self.have[s] = 0; self.state[s] = _EMPTY
+        self._rh += 1
+
+    # --- потребитель ---
+    def _pop(self) -> int:
+        """Индекс следующей готовой пары или -1 (под self.cv)."""
+        q = len(self._rq)
+        while self._rh < self._rt:
+            i = self._rh % q
+            s = self._rq[i]
+            self._rh += 1
+            if self._rg[i] == self.gen[s] and self.state[s] == _READY:
+                return s
+        return -1
+
+    def _wait(self, timeout: float) -> int:
+        s = self._pop()
+        if s < 0 and timeout and timeout > 0:
+            t_end = time.monotonic() + timeout
+            while s < 0:
+                left = t_end - time.monotonic()
+                if left <= 0:
+                    break
+                self.cv.wait(left)
+                s = self._pop()
+        return s
+
+    def get(self, timeout: float = 0.0):
+        """(a, b) — половины пары с видами на слот; после работы a.release(); b.release()."""
+        with self.cv:
+            s = self._wait(timeout)
+            if s < 0:
+                return None
+            self.state[s] = _OUT; self.out[s] = 3
+            a, b = pair = self.halves[s]
+            a._gen = b._gen = self.gen[s]
+            return pair
+
+    def pop_into(self, dst0: np.ndarray, dst1: np.ndarray, timeout: float = 0.0):
+        """Скопировать следующую пару в dst0/dst1 и сразу освободить слот.
+        Возвращает (seq_a, timestamp_a, samples) или None."""
+        with self.cv:
+            s = self._wait(timeout)
+            if s < 0:
+                return None
+            a, b = self.halves[s]
+            n = min(a.samples, b.samples, len(dst0), len(dst1))
+            dst0[:n] = self.data[s, 0, :n]
+            dst1[:n] = self.data[s, 1, :n]
+            res = (a.seq, a.timestamp, n)
+            self.key[s] = -1; self.have[s] = 0; self.state[s] = _EMPTY
+            return res
+
+    def _release(self, half: PairHalf):
+        s = half._slot
+        with self.cv:
+            if half._gen != self.gen[s] or self.state[s] != _OUT:
+                return
+            self.out[s] &= ~(1 << half.adc_id)
+            if not self.out[s]:
+                self.key[s] = -1; self.have[s] = 0; self.state[s] = _EMPTY
+
+    def ready(self) -> int:
+        """Сколько готовых пар ждёт потребителя (с точностью до устаревших записей)."""
+        return self._rt - self._rh
+
+    def stats(self) -> dict:
+        return {'pairs': self.pairs, 'ready': self.ready(), 'orphans_a': self.orphans_a, 'orphans_b': self.orphans_b,
+                'dropped_pairs': self.dropped_pairs, 'dropped_frames': self.dropped_frames,
+                'overruns': self.overruns, 'resized': self.resized}
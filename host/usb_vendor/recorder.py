@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""recorder.py — запись Vendor-потока в чанкованный файл с индексом (.bmr).
+
+Формат (всё little-endian, блоки выровнены на ALIGN=4096 — годится для O_DIRECT):
+  [заголовок файла, 4096 байт]  FILE_HDR: b'BMI30REC', версия, kind (кадры/пары), created
+  [чанк]*                       CHUNK_HDR (64 байта) + записи, паддинг нулями до ALIGN
+  [индекс]                      INDEX_DTYPE × count (по строке на чанк)
+  [трейлер, 16 байт]            b'BMRE', count, смещение индекса
+Записи чанка:
+  KIND_FRAMES — сырые кадры Vendor как пришли (32 байта заголовка + payload);
+  KIND_PAIRS  — PAIR_HDR (seq, timestamp, n) + n int16 канала A + n int16 канала B.
+Заголовок чанка хранит диапазоны seq / timestamp устройства / времени хоста и CRC32
+записей, поэтому файл без индекса (оборванная запись) восстанавливается проходом
+по заголовкам чанков, а выборка диапазона читает только нужные чанки.
+seq и timestamp устройства 32-битные и переполняются; в заголовке чанка и индексе
+они «развёрнуты» (сквозные, монотонные: +2^32 на каждое переполнение с начала
+записи), так что [seq0, seq1] — настоящий диапазон и через переполнение. В самих
+записях лежат исходные 32-битные значения; диапазоны выборки задаются сквозными.
+
+Recorder.add_*() вызывается из потока RX: только memcpy в текущий чанк.
+Полный чанк (или старше flush_s) уходит фоновому писателю; если диск не успевает
+и очередь полна — чанк выбрасывается целиком и считается в dropped_chunks, RX не ждёт.
+
+Usage:
+  python -m usb_vendor.recorder FILE                 # сводка по чанкам
+  python -m usb_vendor.recorder FILE --seq 100 200   # записи в диапазоне seq (сквозном)
+"""
+from __future__ import annotations
+import mmap, os, queue, struct, sys, threading, time, zlib
+
+import numpy as np
+
+try:
+    from .deframe import scan, HDR_SIZE
+except ImportError:
+    from deframe import scan, HDR_SIZE
+
+ALIGN = 4096
+CHUNK_BYTES = 1 << 20          # ~0.6 с потока 300 пар/с × 912 семплов
+FLUSH_S = 1.0                  # чанк уходит на диск не позже, чем через столько секунд
+QUEUE_CHUNKS = 64              # чанков в очереди к писателю (64 МБ при CHUNK_BYTES)
+
+KIND_FRAMES = 0
+KIND_PAIRS = 1
+VERSION = 1
+
+FILE_MAGIC = b'BMI30REC'
+FILE_HDR = struct.Struct('<8sHHd')                     # magic, version, kind, created (unix)
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HDR = struct.Struct('<4sIII QQQQ dd')            # magic, nrec, nbytes, crc32, seq0, seq1, ts0, ts1, t0, t1
+TRAILER_MAGIC = b'BMRE'
+TRAILER = struct.Struct('<4sIQ')                       # magic, count, index_offset
+PAIR_HDR = struct.Struct('<IIII')                      # seq, timestamp, n, резерв
+assert CHUNK_HDR.size == 64
+
+INDEX_DTYPE = np.dtype([
+    ('seq0', '<u8'), ('seq1', '<u8'), ('ts0', '<u8'), ('ts1', '<u8'),
+    ('t0', '<f8'), ('t1', '<f8'), ('offset', '<u8'), ('nrec', '<u4'), ('nbytes', '<u4'),
+])
+
+_SEQ_TS = struct.Struct('<II')   # seq, timestamp в заголовке кадра (смещение 4)
+_MASK = 0xFFFFFFFF
+_HALF = 1 << 31
+
+
+def _unwrap(ref: int, raw: int) -> int:
+    """Сквозное значение 32-битного счётчика raw, ближайшее к сквозному ref (ref < 0 — первое)."""
+    if ref < 0:
+        return raw & _MASK
+    return ref + ((raw - ref + _HALF) & _MASK) - _HALF
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class Recorder:
+    """Писатель .bmr: add_frame()/add_pair() из потока RX, запись на диск — фоновым потоком."""
+    def __init__(self, path: str, kind: int = KIND_FRAMES, chunk_bytes: int = CHUNK_BYTES,
+                 flush_s: float = FLUSH_S, queue_chunks: int = QUEUE_CHUNKS, direct: bool | None = None):
+        self.path = path
+        self.kind = kind
+        self.cap = _aligned(max(int(chunk_bytes), 2 * ALIGN))
+        self.flush_s = flush_s
+        if direct is None:
+            direct = str(os.getenv('BMI30_REC_DIRECT', '0')).lower() not in ('0', 'false', 'no')
+        self.direct = False
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        fd = -1
+        if direct and hasattr(os, 'O_DIRECT'):
+            try:
+                fd = os.open(path, flags | os.O_DIRECT, 0o644)
+                self.direct = True
+            except OSError:
+                fd = -1   # tmpfs и т.п. не умеют O_DIRECT — пишем через page cache
+        if fd < 0:
+            fd = os.open(path, flags, 0o644)
+        self._fd = fd
+        hdr = mmap.mmap(-1, ALIGN)   # mmap выровнен на страницу — требование O_DIRECT
+        FILE_HDR.pack_into(hdr, 0, FILE_MAGIC, VERSION, kind, time.time())
+        self._write(hdr)
+        hdr.close()
+        self.offset = ALIGN
+        self.index = []               # строки INDEX_DTYPE (кортежи), пополняет писатель
+        # счётчики
+        self.records = 0; self.chunks = 0; self.bytes_written = ALIGN
+        self.dropped_chunks = 0; self.dropped_records = 0
+        self.error = None
+        self._useq = self._uts = -1   # последние сквозные seq / timestamp (см. _unwrap)
+        self._free = []
+        self._q = queue.Queue(max(1, int(queue_chunks)))
+        self._lock = threading.Lock()   # add_*() из RX против close()/flush() из другого потока
+        self._closed = False
+        self._new_chunk()
+        self._th = threading.Thread(target=self._writer, name='bmr-writer', daemon=True)
+        self._th.start()
+
+    # --- производитель (поток RX) ---
+    def _new_chunk(self, need: int = 0):
+        buf = self._free.pop() if self._free else None
+        if buf is None or len(buf) < CHUNK_HDR.size + need:
+            buf = mmap.mmap(-1, max(self.cap, _aligned(CHUNK_HDR.size + need)))
+        self._buf = buf
+        self._pos = CHUNK_HDR.size
+        self._nrec = 0
+        self._seq0 = self._seq1 = self._ts0 = self._ts1 = 0
+        self._t0 = self._t1 = 0.0
+
+    def _room(self, n: int):
+        if self._pos + n > len(self._buf):
+            self._flush()
+            if CHUNK_HDR.size + n > len(self._buf):
+                self._free.append(self._buf)
+                self._new_chunk(n)
+
+    def _account(self, seq: int, ts: int):
+        now = time.time()
+        seq = self._useq = _unwrap(self._useq, seq)
+        ts = self._uts = _unwrap(self._uts, ts)
+        if self._nrec == 0:
+            self._seq0 = seq; self._ts0 = ts; self._t0 = now
+        self._seq1 = seq; self._ts1 = ts; self._t1 = now
+        self._nrec += 1
+        self.records += 1
+        if now - self._t0 >= self.flush_s:
+            self._flush()
+
+    def add_frame(self, frame, seq: int | None = None, timestamp: int | None = None):
+        """Сырой кадр Vendor (заголовок + payload); seq/timestamp по умолчанию — из заголовка."""
+        n = len(frame)
+        if seq is None or timestamp is None:
+            seq, timestamp = _SEQ_TS.unpack_from(frame, 4)
+        with self._lock:
+            if self._closed:
+                return
+            self._room(n)
+            p = self._pos
+            self._buf[p:p+n] = frame
+            self._pos = p + n
+            self._account(seq, timestamp)
+
+    def add_pair(self, ch0, ch1, seq: int, timestamp: int):
+        """Стереопара: ch0/ch1 — int16 (массивы или байтовые виды) одинаковой длины."""
+        b0 = memoryview(ch0).cast('B'); b1 = memoryview(ch1).cast('B')
+        nb = min(len(b0), len(b1)) & ~1
+        with self._lock:
+            if self._closed:
+                return
+            self._room(PAIR_HDR.size + 2 * nb)
+            p = self._pos
+            buf = self._buf
+            PAIR_HDR.pack_into(buf, p, seq & 0xFFFFFFFF, timestamp & 0xFFFFFFFF, nb >> 1, 0)
+            p += PAIR_HDR.size
+            buf[p:p+nb] = b0[:nb]; p += nb
+            buf[p:p+nb] = b1[:nb]; p += nb
+            self._pos = p
+            self._account(seq, timestamp)
+
+    def flush(self):
+        """Отдать текущий чанк писателю (не ждёт диска)."""
+        with self._lock:
+            if not self._closed:
+                self._flush()
+
+    def _flush(self):
+        if self._nrec == 0:
+            return
+        item = (self._buf, self._pos, self._nrec, self._seq0, self._seq1, self._ts0, self._ts1, self._t0, self._t1)
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            # диск не успевает: теряем чанк целиком, но не тормозим RX
+            self.dropped_chunks += 1
+            self.dropped_records += self._nrec
+            self._free.append(self._buf)
+        self._new_chunk()
+
+    # --- фоновый писатель ---
+    def _write(self, mv):
+        mv = memoryview(mv)
+        while len(mv):
+            k = os.write(self._fd, mv)
+            mv = mv[k:]
+
+    def _writer(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            buf, used, nrec, seq0, seq1, ts0, ts1, t0, t1 = item
+            if self.error is None:
+                try:
+                    nbytes = used - CHUNK_HDR.size
+                    crc = zlib.crc32(memoryview(buf)[CHUNK_HDR.size:used])
+                    CHUNK_HDR.pack_into(buf, 0, CHUNK_MAGIC, nrec, nbytes, crc, seq0, seq1, ts0, ts1, t0, t1)
+                    total = _aligned(used)
+                    buf[used:total] = bytes(total - used)
+                    self._write(memoryview(buf)[:total])
+                    self.index.append((seq0, seq1, ts0, ts1, t0, t1, self.offset, nrec, nbytes))
+                    self.offset += total
+                    self.bytes_written += total
+                    self.chunks += 1
+                except OSError as e:
+                    # диск кончился/отвалился — дальше только считаем потери
+                    self.error = e
+            if self.error is not None:
+                self.dropped_chunks += 1
+                self.dropped_records += nrec
+            self._free.append(buf)
+
+    def close(self):
+        """Дописать всё, индекс и трейлер; закрыть файл."""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush()
+            self._closed = True
+        self._q.put(None)
+        self._th.join()
+        os.close(self._fd)
+        if self.error is None:
+            # индекс пишем обычным (не O_DIRECT) дескриптором — его длина не кратна ALIGN
+            idx = np.array(self.index, dtype=INDEX_DTYPE)
+            with open(self.path, 'r+b') as f:
+                f.seek(self.offset)
+                f.write(idx.tobytes())
+                f.write(TRAILER.pack(TRAILER_MAGIC, len(idx), self.offset))
+                f.truncate()
+        for b in self._free:
+            b.close()
+        self._free = []
+
+    def stats(self) -> dict:
+        return {'records': self.records, 'chunks': self.chunks, 'bytes': self.bytes_written,
+                'queued': self._q.qsize(), 'dropped_chunks': self.dropped_chunks,
+                'dropped_records': self.dropped_records, 'direct': self.direct}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordReader:
+    """Чтение .bmr через mmap: index (INDEX_DTYPE), выборка по seq / timestamp / времени хоста."""
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        self.verify = verify
+        self._f = open(path, 'rb')
+        self.mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.kind, self.created = FILE_HDR.unpack_from(self.mm, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError(f'{path}: не .bmr файл')
+        self.recovered = False
+        self.index = self._load_index()
+
+    def _load_index(self) -> np.ndarray:
+        mm = self.mm
+        n = len(mm)
+        if n >= ALIGN + TRAILER.size:
+            magic, count, off = TRAILER.unpack_from(mm, n - TRAILER.size)
+            if magic == TRAILER_MAGIC and off + count * INDEX_DTYPE.itemsize == n - TRAILER.size:
+                return np.frombuffer(mm, dtype=INDEX_DTYPE, count=count, offset=off).copy()
+        # нет трейлера (запись оборвалась) — идём по заголовкам чанков
+        self.recovered = True
+        rows = []
+        off = ALIGN
+        while off + CHUNK_HDR.size <= n:
+            magic, nrec, nbytes, crc, seq0, seq1, ts0, ts1, t0, t1 = CHUNK_HDR.unpack_from(mm, off)
+            if magic != CHUNK_MAGIC or off + CHUNK_HDR.size + nbytes > n:
+                break
+            rows.append((seq0, seq1, ts0, ts1, t0, t1, off, nrec, nbytes))
+            off += _aligned(CHUNK_HDR.size + nbytes)
+        return np.array(rows, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def records(self) -> int:
+        return int(self.index['nrec'].sum())
+
+    def select(self, seq=None, ts=None, t=None) -> np.ndarray:
+        """Номера чанков, пересекающих диапазоны (lo, hi) включительно; None — без ограничения.
+        seq/ts — сквозные (развёрнутые) значения, как в индексе."""
+        ix = self.index
+        m = np.ones(len(ix), dtype=bool)
+        for rng, lo, hi in ((seq, 'seq0', 'seq1'), (ts, 'ts0', 'ts1'), (t, 't0', 't1')):
+            if rng is not None:
+                m &= (ix[hi] >= rng[0]) & (ix[lo] <= rng[1])
+        return np.flatnonzero(m)
+
+    def _span(self, i: int):
+        """(начало, конец) записей i-го чанка в mmap; при verify — сверка CRC32."""
+        row = self.index[i]
+        off = int(row['offset']) + CHUNK_HDR.size
+        end = off + int(row['nbytes'])
+        if self.verify:
+            crc = CHUNK_HDR.unpack_from(self.mm, int(row['offset']))[3]
+            with memoryview(self.mm) as mv:
+                if zlib.crc32(mv[off:end]) != crc:
+                    raise ValueError(f'{self.path}: CRC32 чанка {i} не совпал')
+        return off, end
+
+    def chunk(self, i: int) -> memoryview:
+        """Записи i-го чанка (вид на mmap)."""
+        off, end = self._span(i)
+        return memoryview(self.mm)[off:end]
+
+    def frames(self, seq=None, ts=None, t=None):
+        """Кадры (KIND_FRAMES): (header_tuple, memoryview кадра) по порядку, с фильтром по seq/ts."""
+        mm = self.mm
+        ix = self.index
+        for i in self.select(seq, ts, t):
+            off, end = self._span(i)
+            s0 = int(ix['seq0'][i]); t0 = int(ix['ts0'][i])
+            for h, o in scan(mm, off, end, stat=False).rows:
+                if seq is not None and not (seq[0] <= _unwrap(s0, h[3]) <= seq[1]):
+                    continue
+                if ts is not None and not (ts[0] <= _unwrap(t0, h[4]) <= ts[1]):
+                    continue
+                yield h, memoryview(mm)[o:o + HDR_SIZE + 2 * h[5]]
+
+    def pairs(self, seq=None, ts=None, t=None):
+        """Пары (KIND_PAIRS): (seq, timestamp, ch0, ch1) — ch0/ch1 int16-виды на mmap;
+        seq/timestamp — как записаны (32 бита), фильтр — по сквозным."""
+        ix = self.index
+        for i in self.select(seq, ts, t):
+            s0 = int(ix['seq0'][i]); t0 = int(ix['ts0'][i])
+            for s, stamp, ch0, ch1 in self.chunk_pairs(i):
+                if seq is not None and not (seq[0] <= _unwrap(s0, s) <= seq[1]):
+                    continue
+                if ts is not None and not (ts[0] <= _unwrap(t0, stamp) <= ts[1]):
+                    continue
+                yield s, stamp, ch0, ch1
+
+    def chunk_pairs(self, i: int):
+        """Все пары i-го чанка: (seq, timestamp, ch0, ch1)."""
+        mv = self.chunk(i)
+        p = 0; end = len(mv)
+        while p + PAIR_HDR.size <= end:
+            s, stamp, n, _ = PAIR_HDR.unpack_from(mv, p)
+            p += PAIR_HDR.size
+            yield s, stamp, np.frombuffer(mv, dtype='<i2', count=n, offset=p), \
+                np.frombuffer(mv, dtype='<i2', count=n, offset=p + 2 * n)
+            p += 4 * n
+
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            pass   # на mmap ещё смотрят виды из frames()/pairs()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument('path')
+    ap.add_argument('--seq', type=int, nargs=2, metavar=('FROM', 'TO'))
+    ap.add_argument('--ts', type=int, nargs=2, metavar=('FROM', 'TO'))
+    args = ap.parse_args(argv)
+    with RecordReader(args.path) as r:
+        kind = 'pairs' if r.kind == KIND_PAIRS else 'frames'
+        ix = r.index
+        print(f"{args.path}: {kind} chunks={len(ix)} records={r.records}" + (' (index recovered)' if r.recovered else ''))
+        if len(ix):
+            print(f"  seq {ix['seq0'][0]}..{ix['seq1'][-1]}  ts {ix['ts0'][0]}..{ix['ts1'][-1]}  "
+                  f"host {ix['t1'][-1] - ix['t0'][0]:.1f} s")
+        if args.seq or args.ts:
+            sel = r.select(args.seq, args.ts)
+            it = r.pairs(args.seq, args.ts) if r.kind == KIND_PAIRS else r.frames(args.seq, args.ts)
+            cnt = sum(1 for _ in it)
+            print(f"  selected: chunks={len(sel)} records={cnt}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
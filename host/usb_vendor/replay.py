@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""replay.py — воспроизведение записи вместо устройства (ReplayStream ≈ USBStream без USB).
+
+Источник отображается в память (mmap) и прогоняется через тот же путь, что и
+живой поток: RxRing → _drain_ring (дефрейминг, CRC, TEST) → PairPool → SampleRing.
+Поэтому у ReplayStream те же get_stereo()/get_stereo_into()/sample_ring,
+last_stat, crc_bad, magic_bad, disconnected, last_rx_t, что у USBStream.
+
+Источники:
+  *.bmr (recorder.py)  — кадры или пары; темп по времени хоста из заголовков чанков;
+  иное (сырой дамп)    — байты Bulk IN как есть (кадры + STAT); темп — rate кадров/с.
+
+speed: 1.0 — реальное время, N — в N раз быстрее, 0 — как можно быстрее. В режиме 0
+поток не теряет пары: если потребитель get_stereo() отстаёт, воспроизведение ждёт его
+(при set_pair_queue(False) ждать некого — кольцо семплов просто перезаписывается).
+По концу файла eof=True (или начинаем сначала при loop=True).
+
+Usage:
+  python -m usb_vendor.replay capture.bmr --speed 0        # пропускная способность разбора
+  BMI30_REPLAY=capture.bmr BMI30_REPLAY_SPEED=2 python3 BMI30.200.py
+"""
+from __future__ import annotations
+import mmap, os, threading, time
+
+try:
+    from .usb_stream import USBStream, CMD_START_STREAM, CMD_STOP_STREAM
+    from .rx_ring import RxRing
+    from .pair_pool import PairPool
+    from .sample_ring import SampleRing
+    from .deframe import scan, HDR_SIZE, STAT_SIZE
+    from .recorder import RecordReader, FILE_MAGIC, KIND_PAIRS
+except ImportError:
+    from usb_stream import USBStream, CMD_START_STREAM, CMD_STOP_STREAM
+    from rx_ring import RxRing
+    from pair_pool import PairPool
+    from sample_ring import SampleRing
+    from deframe import scan, HDR_SIZE, STAT_SIZE
+    from recorder import RecordReader, FILE_MAGIC, KIND_PAIRS
+
+RAW_RATE = 400.0         # кадров/с для сырых дампов (200 пар/с)
+RAW_WINDOW = 1 << 20     # байт сырого дампа за один проход scan()
+FAST_BATCH = 64          # кадров за раз в режиме «как можно быстрее»
+
+
+class ReplayStream(USBStream):
+    """USBStream поверх записи. Аргументы устройства (profile, vid, …) принимаются и игнорируются."""
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False, rate: float = RAW_RATE,
+                 test_as_data: bool = False, frame_samples: int | None = None,
+                 pair_capacity: int | None = None, pair_policy: str | None = None,
+                 sample_ring: SampleRing | None = None, **_device_kw):
+        self.path = path
+        self.speed = max(0.0, float(speed))
+        self.loop = loop
+        self.rate = float(rate) if rate else RAW_RATE
+        self.test_as_data = test_as_data
+        self.frame_samples = frame_samples
+        self.dev = None
+        self.intf_num = None
+        self.lock = threading.Lock()
+        self.frames = 0; self.bytes = 0; self.crc_bad = 0; self.magic_bad = 0
+        self.test_seen = 0
+        self.last_stat = None
+        self.disconnected = False
+        self.connected_t = self.last_rx_t = time.time()
+        self.eof = False
+        self.loops = 0
+        self._working_seen = False
+        self.pool = PairPool.from_env(pair_capacity, pair_policy, frame_samples)
+        self.sample_ring = sample_ring if sample_ring is not None else SampleRing()
+        self.pool.on_pair = self._publish_pair
+        self.recorder = None
+        self.record_pairs = False
+        self.ring = RxRing()
+        self._f = open(path, 'rb')
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._reader = RecordReader(path, verify=False) if self._mm[:len(FILE_MAGIC)] == FILE_MAGIC else None
+        self.port_info = self.get_port_path_info()
+        self._running = True
+        self._paused = threading.Event()
+        self.th = threading.Thread(target=self._replay_loop, name='replay', daemon=True)
+        self.th.start()
+
+    # --- источники: (due_s, что подать) ---
+    def _raw_items(self):
+        """Сырой дамп: кадры и STAT по порядку; due — по номеру кадра и rate."""
+        mm = self._mm; n = len(mm)
+        pos = 0; k = 0
+        while pos < n:
+            b = scan(mm, pos, min(n, pos + RAW_WINDOW))
+            if b.consumed <= pos:
+                break
+            items = [(off, 0, HDR_SIZE + 2 * h[5]) for h, off in b.rows]
+            if b.stats:
+                items += [(off, 1, STAT_SIZE) for off in b.stats]
+                items.sort()
+            if b.skipped:
+                self.magic_bad += 1
+            for off, is_stat, size in items:
+                if is_stat:
+                    yield None, ('stat', off, size)
+                else:
+                    yield k / self.rate, ('frame', off, size)
+                    k += 1
+            pos = b.consumed
+            if n - pos < HDR_SIZE:
+                break
+
+    def _bmr_items(self):
+        """Запись .bmr: время кадра — линейно внутри [t0, t1] чанка."""
+        r = self._reader
+        ix = r.index
+        if not len(ix):
+            return
+        T0 = float(ix['t0'][0])
+        pairs = r.kind == KIND_PAIRS
+        for i in range(len(ix)):
+            row = ix[i]
+            t0 = float(row['t0']) - T0; dt = float(row['t1']) - float(row['t0'])
+            nrec = max(1, int(row['nrec']))
+            if pairs:
+                for j, (seq, ts, ch0, ch1) in enumerate(r.chunk_pairs(i)):
+                    yield t0 + dt * j / nrec, ('pair', seq, ts, ch0, ch1)
+            else:
+                off, end = r._span(i)
+                for j, (h, o) in enumerate(scan(self._mm, off, end, stat=False).rows):
+                    yield t0 + dt * j / nrec, ('frame', o, HDR_SIZE + 2 * h[5])
+
+    # --- поток воспроизведения ---
+    def _replay_loop(self):
+        mv = memoryview(self._mm)
+        try:
+            while self._running:
+                src = self._bmr_items() if self._reader is not None else self._raw_items()
+                t_start = time.perf_counter()
+                batch = 0
+                for due, item in src:
+                    if not self._running:
+                        break
+                    if self._paused.is_set():
+                        # STOP_STREAM из GUI: стоим, а после START темп продолжается с места паузы
+                        tp = time.perf_counter()
+                        while self._paused.is_set() and self._running:
+                            time.sleep(0.05)
+                        t_start += time.perf_counter() - tp
+                    if self.speed > 0 and due is not None:
+                        dt = t_start + due / self.speed - time.perf_counter()
+                        if dt > 0:
+                            if batch:
+                                self._drain_ring(); batch = 0
+                            time.sleep(dt)
+                    elif self.speed == 0:
+                        self._backpressure()
+                    kind = item[0]
+                    if kind == 'frame':
+                        _, off, size = item
+                        self.ring.write(mv[off:off+size])
+                        batch += 1
+                        if self.speed > 0 or batch >= FAST_BATCH:
+                            self._drain_ring(); batch = 0
+                    elif kind == 'stat':
+                        _, off, size = item
+                        self.last_stat = bytes(mv[off:off+size])
+                    else:
+                        _, seq, ts, ch0, ch1 = item
+                        self.pool.push(0, seq, ts, 0x01, memoryview(ch0).cast('B'))
+                        self.pool.push(1, seq, ts, 0x02, memoryview(ch1).cast('B'))
+                        self.frames += 2
+                        self.bytes += 4 * len(ch0)
+                        self._working_seen = True
+                    self.last_rx_t = time.time()
+                if batch:
+                    self._drain_ring()
+                if not self._running:
+                    break
+                if not self.loop:
+                    self.eof = True
+                    break
+                self.loops += 1
+        finally:
+            mv.release()
+
+    def _backpressure(self):
+        """«Как можно быстрее» = со скоростью потребителя: не переполняем очередь пар."""
+        pool = self.pool
+        limit = pool.cap // 2
+        while self._running and pool.queue_pairs and pool.ready() > limit:
+            time.sleep(0.0002)
+
+    # --- управление: то, что в USBStream шло в устройство ---
+    def send_cmd(self, cmd, payload: bytes = b""):
+        if cmd == CMD_STOP_STREAM:
+            self._paused.set()
+        elif cmd == CMD_START_STREAM:
+            self._paused.clear()
+
+    def soft_reset(self):
+        pass
+
+    def deep_reset(self):
+        pass
+
+    def set_alt(self, alt: int):
+        pass
+
+    def _get_status_ep0(self):
+        pass
+
+    def restart_stream(self, full=True):
+        self._paused.clear()
+
+    def get_port_path_info(self):
+        return {'bus': None, 'address': None, 'port_numbers': None, 'port_path': None,
+                'hub_loc': None, 'hub_port': None, 'vid': None, 'pid': None, 'replay': self.path}
+
+    def wait_eof(self, timeout: float | None = None) -> bool:
+        """Дождаться конца воспроизведения (без loop)."""
+        self.th.join(timeout)
+        return self.eof
+
+    def close(self):
+        self._running = False
+        self._paused.clear()
+        try:
+            self.th.join(timeout=2.0)
+        except Exception:
+            pass
+        try:
+            self.stop_recording()
+        except Exception:
+            pass
+        if self._reader is not None:
+            self._reader.close()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass   # потребитель ещё держит виды
+        self._f.close()
+
+
+def from_env(**kw):
+    """ReplayStream по BMI30_REPLAY / BMI30_REPLAY_SPEED / BMI30_REPLAY_LOOP или None."""
+    path = os.getenv('BMI30_REPLAY')
+    if not path:
+        return None
+    try:
+        speed = float(os.getenv('BMI30_REPLAY_SPEED', '1'))
+    except Exception:
+        speed = 1.0
+    loop = str(os.getenv('BMI30_REPLAY_LOOP', '0')).lower() not in ('0', 'false', 'no')
+    return ReplayStream(path, speed=speed, loop=loop, **kw)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument('path')
+    ap.add_argument('--speed', type=float, default=0.0, help='1 — реальное время, N — ускорение, 0 — как можно быстрее')
+    ap.add_argument('--rate', type=float, default=RAW_RATE, help='Кадров/с для сырого дампа')
+    args = ap.parse_args()
+    st = ReplayStream(args.path, speed=args.speed, rate=args.rate)
+    t0 = time.perf_counter(); pairs = 0; samples = 0
+    try:
+        while True:
+            pair = st.get_stereo(timeout=0.2)
+            if pair is None:
+                if st.eof and not st.pool.ready():
+                    break
+                continue
+            a, b = pair
+            pairs += 1; samples += a.samples
+            a.release(); b.release()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        st.close()
+    dt = time.perf_counter() - t0
+    print(f"pairs={pairs} in {dt:.2f}s → {pairs/max(dt, 1e-9):.0f} пар/с, {samples/max(dt, 1e-9)/1e6:.2f} Мсемпл/с/канал "
+          f"crc_bad={st.crc_bad} magic_bad={st.magic_bad} test={st.test_seen} pair_drop={st.pool.dropped_pairs}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""rx_ring.py — приёмный кольцевой буфер Vendor Bulk IN без лишних копий.
+
+USB читает прямо в окно преаллоцированного буфера (read_usb), дефреймер
+(take_frames) отдаёт заголовки и смещения кадров в этом же буфере. Payload
+живёт в кольце только до следующего чтения: поток RX сразу копирует его в
+слот пула пар (pair_pool), поэтому место освобождается, как только rpos
+ушёл за кадр, а поток RX никогда не ждёт потребителя.
+"""
+from __future__ import annotations
+import array, ctypes
+
+try:
+    from .deframe import scan
+except ImportError:
+    from deframe import scan
+
+RING_BYTES = 4 << 20   # ~1.5 с потока при 300 пар/с и 1360 семплах
+
+
+class _UsbWindow(array.array):
+    """Окно кольца для dev.read(): PyUSB принимает только array.array и берёт
+    адрес/длину приёмника через buffer_info(), сюда подставляем адрес в кольце."""
+    def __new__(cls):
+        self = super().__new__(cls, 'B')
+        self.addr = 0; self.size = 0
+        return self
+    def buffer_info(self):
+        return (self.addr, self.size)
+
+
+class RxRing:
+    def __init__(self, capacity: int = RING_BYTES):
+        self.cap = int(capacity)
+        self.rpos = 0          # начало ещё не разобранных байт
+        self.wpos = 0          # конец записанных байт
+        self.zero_copy = True  # False — чтение через промежуточный array (fallback)
+        self._win = _UsbWindow()
+        self._scratch = None
+        self._alloc()
+
+    def _alloc(self):
+        self.buf = bytearray(self.cap)
+        self.mv = memoryview(self.buf)
+        # экспорт буфера в ctypes одновременно запрещает bytearray менять размер
+        self._cbuf = (ctypes.c_char * self.cap).from_buffer(self.buf)
+        self._base = ctypes.addressof(self._cbuf)
+        self.rpos = 0
+        self.wpos = 0
+
+    # --- запись ---
+    def reserve(self, size: int) -> int:
+        """Вернуть смещение непрерывного свободного окна длиной size (без ожидания)."""
+        w = self.wpos
+        if w + size <= self.cap:
+            return w
+        # перенос: недоразобранный хвост (обычно < 1 кадра) в начало буфера
+        pend = w - self.rpos
+        if pend + size > self.cap:
+            raise ValueError(f"RxRing: capacity {self.cap} < pending {pend} + read {size}")
+        if pend:
+            self.buf[0:pend] = self.buf[self.rpos:w]
+        self.rpos = 0
+        self.wpos = pend
+        return pend
+
+    def commit(self, n: int):
+        self.wpos += int(n)
+
+    def read_usb(self, dev, ep: int, size: int, timeout: int) -> int:
+        """dev.read() прямо в кольцо; возвращает число байт (добавленных к wpos)."""
+        w = self.reserve(size)
+        if self.zero_copy:
+            win = self._win
+            win.addr = self._base + w; win.size = size
+            try:
+                n = dev.read(ep, win, timeout)
+            except (TypeError, AttributeError):
+                # бэкенд не понимает окно — переходим на промежуточный буфер
+                self.zero_copy = False
+            else:
+                self.wpos = w + n
+                return n
+        if self._scratch is None or len(self._scratch) < size:
+            self._scratch = array.array('B', bytes(size))
+        n = dev.read(ep, self._scratch, timeout)
+        self.mv[w:w+n] = memoryview(self._scratch)[:n]
+        self.wpos = w + n
+        return n
+
+    def write(self, data) -> int:
+        """Положить готовый кусок (replay/тесты) так же, как это сделал бы read_usb."""
+        n = len(data)
+        w = self.reserve(n)
+        self.mv[w:w+n] = data
+        self.wpos = w + n
+        return n
+
+    def cut(self, off: int, k: int):
+        """Вырезать k байт с off (STAT посреди недоразобранного кадра)."""
+        w = self.wpos
+        self.buf[off:w-k] = self.buf[off+k:w]
+        self.wpos = w - k
+
+    # --- разбор ---
+    def pending(self) -> int:
+        return self.wpos - self.rpos
+
+    def skip(self, n: int):
+        self.rpos += n
+
+    def take_frames(self):
+        """Все полные кадры между rpos и wpos одним проходом (deframe.scan);
+        rpos сразу встаёт за последний кадр. Смещения кадров валидны до следующего reserve()."""
+        batch = scan(self.buf, self.rpos, self.wpos, stat=False)
+        self.rpos = batch.consumed
+        return batch
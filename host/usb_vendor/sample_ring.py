@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""sample_ring.py — непрерывное двухканальное кольцо семплов (один писатель, любые читатели).
+
+USBStream дописывает сюда каждую собранную пару A/B. Индекс записи widx
+растёт монотонно (всего семплов с начала), поэтому потребители — GUI,
+запись, DSP — держат свой курсор и читают в своём темпе:
+  latest(n)        — последние n семплов обоих каналов (виды, без копий);
+  since(cursor)    — всё, что пришло после cursor (что успело затереться — пропускается);
+  blocks_since(k)  — метаданные пар (seq, timestamp, start, n) после k-й.
+
+Без блокировок: писатель сначала пишет данные, потом публикует widx/bidx.
+Буфер зеркальный (2*capacity, каждый семпл пишется дважды), так что любое
+окно до capacity семплов — непрерывный срез. Вид валиден, пока
+valid(start) — т.е. писатель не ушёл дальше чем на capacity вперёд.
+
+Всё состояние (счётчики, семплы, метаданные) лежит в одном буфере, поэтому
+кольцо можно разместить в multiprocessing.shared_memory: create_shared() в
+одном процессе, attach(name) в другом (см. usb_proc.py).
+"""
+from __future__ import annotations
+
+import numpy as np
+
+SAMPLE_RING = 1 << 19     # семплов на канал: ~1.9 с при 300 пар/с × 912
+BLOCK_RING = 4096         # пар в кольце метаданных
+
+
+_HDR_WORDS = 8   # int64: widx, bidx, capacity, blocks, резерв
+
+
+def _nbytes(capacity: int, blocks: int) -> int:
+    return 8 * _HDR_WORDS + 2 * 2 * (2 * capacity) + 4 * 8 * blocks
+
+
+class SampleRing:
+    def __init__(self, capacity: int = SAMPLE_RING, blocks: int = BLOCK_RING, buffer=None):
+        """buffer — готовая память под кольцо (shared_memory.buf); None — своя."""
+        if buffer is None:
+            buffer = bytearray(_nbytes(int(capacity), int(blocks)))
+        else:
+            # размеры берём из заголовка, если кольцо уже размечено другим процессом
+            hdr = np.ndarray((_HDR_WORDS,), dtype=np.int64, buffer=buffer)
+            if hdr[2]:
+                capacity, blocks = int(hdr[2]), int(hdr[3])
+        self.cap = int(capacity)
+        self.bcap = int(blocks)
+        self._mem = buffer
+        off = 0
+        self._ctr = np.ndarray((_HDR_WORDS,), dtype=np.int64, buffer=buffer, offset=off)
+        off += 8 * _HDR_WORDS
+        self.buf = np.ndarray((2, 2 * self.cap), dtype=np.int16, buffer=buffer, offset=off)
+        off += self.buf.nbytes
+        blk = np.ndarray((4, self.bcap), dtype=np.int64, buffer=buffer, offset=off)
+        self.blk_seq, self.blk_ts, self.blk_start, self.blk_n = blk
+        self._ctr[2] = self.cap; self._ctr[3] = self.bcap
+        self.shm = None
+
+    @classmethod
+    def create_shared(cls, capacity: int = SAMPLE_RING, blocks: int = BLOCK_RING) -> 'SampleRing':
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=_nbytes(int(capacity), int(blocks)))
+        shm.buf[:8 * _HDR_WORDS] = bytes(8 * _HDR_WORDS)
+        ring = cls(capacity, blocks, buffer=shm.buf)
+        ring.shm = shm
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> 'SampleRing':
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name)
+        ring = cls(buffer=shm.buf)
+        ring.shm = shm
+        return ring
+
+    def close(self, unlink: bool = False):
+        """Отпустить shared_memory (виды на кольцо после этого читать нельзя)."""
+        shm = self.shm
+        if shm is None:
+            return
+        self.shm = None
+        self._ctr = self.buf = self.blk_seq = self.blk_ts = self.blk_start = self.blk_n = None
+        self._mem = None
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        if unlink:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    @property
+    def widx(self) -> int:
+        """Всего записано семплов (на канал)."""
+        return int(self._ctr[0])
+
+    @property
+    def bidx(self) -> int:
+        """Всего записано пар."""
+        return int(self._ctr[1])
+
+    # --- писатель ---
+    def write(self, ch0, ch1, seq: int = 0, timestamp: int = 0) -> int:
+        """Дописать пару одинаковой длины; вернуть индекс её первого семпла."""
+        n = min(len(ch0), len(ch1), self.cap)
+        cap = self.cap; buf = self.buf
+        start = self.widx
+        p = start % cap
+        k = min(n, cap - p)
+        for row, src in ((buf[0], ch0), (buf[1], ch1)):
+            row[p:p+k] = src[:k]
+            row[p+cap:p+cap+k] = src[:k]
+            if k < n:
+                row[0:n-k] = src[k:n]
+                row[cap:cap+n-k] = src[k:n]
+        ctr = self._ctr
+        bi = int(ctr[1])
+        b = bi % self.bcap
+        self.blk_seq[b] = seq; self.blk_ts[b] = timestamp
+        self.blk_start[b] = start; self.blk_n[b] = n
+        # публикация: сначала данные, потом индексы
+        ctr[0] = start + n
+        ctr[1] = bi + 1
+        return start
+
+    # --- читатели ---
+    def valid(self, start: int) -> bool:
+        """Семплы с индекса start ещё не затёрты писателем."""
+        return start >= self.widx - self.cap
+
+    def view(self, start: int, n: int):
+        """(ch0, ch1) — виды на семплы [start, start+n); окно не длиннее capacity."""
+        cap = self.cap
+        end = start + n
+        e = end % cap + cap
+        return self.buf[0, e-n:e], self.buf[1, e-n:e]
+
+    def latest(self, n: int):
+        """(ch0, ch1, start) — последние n семплов (меньше, если столько ещё не пришло)."""
+        w = self.widx
+        n = max(0, min(int(n), w, self.cap))
+        v0, v1 = self.view(w - n, n)
+        return v0, v1, w - n
+
+    def since(self, cursor: int, limit: int | None = None):
+        """(ch0, ch1, start) — семплы после cursor; start > cursor, если часть уже затёрта.
+        Новый курсор = start + len(ch0)."""
+        w = self.widx
+        start = max(int(cursor), w - self.cap)
+        n = w - start
+        if limit is not None and n > limit:
+            n = int(limit)
+        v0, v1 = self.view(start, n)
+        return v0, v1, start
+
+    def blocks_since(self, k: int):
+        """Метаданные пар после k-й: (seq, ts, start, n, новый_k) — массивы int64 (копии)."""
+        b = self.bidx
+        k = max(int(k), b - self.bcap)
+        idx = np.arange(k, b) % self.bcap
+        return self.blk_seq[idx], self.blk_ts[idx], self.blk_start[idx], self.blk_n[idx], b
+
+    def last_block(self):
+        """(seq, timestamp, start, n) последней пары или None."""
+        b = self.bidx
+        if not b:
+            return None
+        i = (b - 1) % self.bcap
+        return int(self.blk_seq[i]), int(self.blk_ts[i]), int(self.blk_start[i]), int(self.blk_n[i])
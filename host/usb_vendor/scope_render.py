@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""scope_render.py — подготовка данных осциллограммы к отрисовке (без Qt).
+
+  MinMaxDecimator — прореживание до ширины графика в пикселях с сохранением
+                    пиков: на каждый пиксель пара точек (min, max) своего
+                    участка. X-массивы и выходной буфер Y преаллоцированы и
+                    переиспользуются между перерисовками.
+  PeakTracker     — симметричный диапазон Y по пикам только НОВЫХ данных
+                    (без np.max/np.min по всему буферу на каждом кадре),
+                    со сглаживанием перепадов.
+  PersistenceHist — послесвечение: гистограмма (семпл × уровень) последних
+                    N кадров, обновляется на каждый кадр за O(samples).
+
+Лента (roll) отдельного класса не требует: это SampleRing.latest(N) →
+MinMaxDecimator. Стоимость кадра отрисовки без Qt:
+  python -m usb_vendor.scope_render --rate 300 --roll 262144
+
+Пока семплов не больше 2×ширина — данные отдаются как есть (вид, без копии).
+"""
+from __future__ import annotations
+
+import numpy as np
+
+X_CACHE = 16      # сколько разных (длина, шаг) держать в кэше X
+
+
+class MinMaxDecimator:
+    """Один экземпляр на кривую: выходной буфер Y общий для всех вызовов."""
+    def __init__(self):
+        self._x = {}
+        self._y = np.zeros(0, dtype=np.int16)
+
+    def _xs(self, n: int, k: int) -> np.ndarray:
+        """X для n семплов с шагом k (k=1 — просто 0..n-1); считается один раз на (n, k)."""
+        key = (n, k)
+        x = self._x.get(key)
+        if x is None:
+            if len(self._x) >= X_CACHE:
+                self._x.clear()
+            if k == 1:
+                x = np.arange(n, dtype=np.float64)
+            else:
+                starts = np.arange(0, n, k, dtype=np.float64)
+                x = np.empty(2 * len(starts), dtype=np.float64)
+                x[0::2] = starts
+                # max — в середину участка (последний участок может быть короче)
+                x[1::2] = starts + (np.minimum(starts + k, n) - starts - 1) / 2.0
+            self._x[key] = x
+        return x
+
+    def __call__(self, y: np.ndarray, width: int, copy: bool = False):
+        """(x, y) для setData: не больше 2*width точек, экстремумы каждого участка сохранены.
+        copy=True — короткий y тоже копируется в свой буфер (y — вид на кольцо, которое перезапишут)."""
+        n = len(y)
+        width = max(1, int(width))
+        if n <= 2 * width:
+            if not copy:
+                return self._xs(n, 1), y
+            if len(self._y) < n or self._y.dtype != y.dtype:
+                self._y = np.empty(n, dtype=y.dtype)
+            self._y[:n] = y
+            return self._xs(n, 1), self._y[:n]
+        k = -(-n // width)
+        m = n // k
+        bins = -(-n // k)
+        if len(self._y) < 2 * bins or self._y.dtype != y.dtype:
+            self._y = np.empty(2 * bins, dtype=y.dtype)
+        out = self._y[:2 * bins].reshape(bins, 2)
+        body = y[:m * k].reshape(m, k)
+        np.min(body, axis=1, out=out[:m, 0])
+        np.max(body, axis=1, out=out[:m, 1])
+        if bins > m:
+            tail = y[m * k:]
+            out[m, 0] = tail.min(); out[m, 1] = tail.max()
+        return self._xs(n, k), self._y[:2 * bins]
+
+
+class PeakTracker:
+    """Пик |x| копится по мере поступления данных; span() раз в период отдаёт сглаженный спан."""
+    def __init__(self, alpha: float = 0.25, floor: float = 64.0, margin: float = 1.05):
+        self.alpha = alpha
+        self.floor = floor
+        self.margin = margin
+        self.smooth: float | None = None
+        self._peak = -1
+
+    def reset(self):
+        self.smooth = None
+        self._peak = -1
+
+    def feed(self, *chunks):
+        """Учесть новые семплы (только пришедшие с прошлого вызова)."""
+        p = self._peak
+        for a in chunks:
+            if len(a):
+                p = max(p, int(a.max()), -int(a.min()))
+        self._peak = p
+
+    def span(self) -> float | None:
+        """Сглаженный полуразмах или None, если данных ещё не было."""
+        if self._peak >= 0:
+            span = max(self.floor, self._peak * self.margin)
+            self.smooth = span if self.smooth is None else self.alpha * span + (1 - self.alpha) * self.smooth
+            self._peak = -1
+        return self.smooth
+
+
+class PersistenceHist:
+    """Послесвечение: 2-D гистограмма (семпл × уровень) последних frames кадров одного канала.
+
+    Каждый кадр даёт ровно одно попадание в каждый столбец, поэтому индексы
+    кадра уникальны и hist[idx] += 1 работает без np.add.at. Индексы кадров
+    хранятся в кольце (frames × samples) — при переполнении самый старый
+    кадр вычитается тем же способом, без пересчёта всей гистограммы.
+    hist имеет форму (samples, bins) — ось 0 это X для pg.ImageItem.
+    """
+    def __init__(self, samples: int, frames: int = 64, bins: int = 256, lo: float = -32768, hi: float = 32767):
+        self.samples = int(samples)
+        self.frames = max(1, min(int(frames), 65535))
+        self.bins = max(2, int(bins))
+        self.lo = float(lo)
+        self.hi = float(hi) if hi > lo else float(lo) + 1.0
+        self.hist = np.zeros((self.samples, self.bins), dtype=np.uint16)
+        self._flat = self.hist.reshape(-1)
+        self._col = np.arange(self.samples, dtype=np.int32) * self.bins
+        self._idx = np.zeros((self.frames, self.samples), dtype=np.int32)
+        self._n = np.zeros(self.frames, dtype=np.int32)
+        self._q = np.empty(self.samples, dtype=np.float32)
+        self._scale = self.bins / (self.hi - self.lo)
+        self.count = 0     # всего кадров с момента clear()
+
+    @property
+    def filled(self) -> int:
+        """Сколько кадров сейчас в гистограмме (для уровней изображения)."""
+        return min(self.count, self.frames)
+
+    def clear(self):
+        self.hist.fill(0)
+        self._n.fill(0)
+        self.count = 0
+
+    def add(self, frame: np.ndarray):
+        """Добавить кадр (вытеснив самый старый, если окно заполнено)."""
+        n = min(len(frame), self.samples)
+        slot = self.count % self.frames
+        if self.count >= self.frames:
+            m = self._n[slot]
+            self._flat[self._idx[slot, :m]] -= 1
+        q = self._q[:n]
+        np.subtract(frame[:n], self.lo, out=q, casting='unsafe')
+        q *= self._scale
+        np.clip(q, 0, self.bins - 1, out=q)
+        idx = self._idx[slot, :n]
+        np.add(self._col[:n], q, out=idx, casting='unsafe')
+        self._flat[idx] += 1
+        self._n[slot] = n
+        self.count += 1
+
+
+def main():
+    """Замер стоимости одного кадра отрисовки без Qt: лента из кольца и послесвечение."""
+    import argparse, time
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--samples', type=int, default=912)
+    ap.add_argument('--rate', type=float, default=300.0, help='Пар/с')
+    ap.add_argument('--roll', type=int, default=1 << 18, help='Семплов в ленте')
+    ap.add_argument('--width', type=int, default=1000, help='Ширина графика, пикселей')
+    ap.add_argument('--fps', type=float, default=30.0)
+    ap.add_argument('--seconds', type=float, default=3.0)
+    args = ap.parse_args()
+    try:
+        from .sample_ring import SampleRing
+    except ImportError:
+        from sample_ring import SampleRing
+    ring = SampleRing()
+    t = np.arange(args.samples)
+    frames = [((np.sin(2 * np.pi * (t / args.samples * 3 + k / 17.0)) * 8000
+                + np.random.randn(args.samples) * 300)).astype(np.int16) for k in range(32)]
+    dec = MinMaxDecimator()
+    ph = PersistenceHist(args.samples)
+    per_render = args.rate / args.fps
+    renders = 0; acc = 0.0; seq = 0
+    t_ingest = t_roll = t_pers = 0.0
+    t_end = time.perf_counter() + args.seconds
+    while time.perf_counter() < t_end:
+        acc += per_render
+        while acc >= 1.0:
+            f = frames[seq % len(frames)]
+            ring.write(f, f, seq, seq)
+            t0 = time.perf_counter(); ph.add(f); ph.add(f); t_ingest += time.perf_counter() - t0
+            seq += 1; acc -= 1.0
+        t0 = time.perf_counter()
+        v0, v1, _ = ring.latest(args.roll)
+        dec(v0, args.width); dec(v1, args.width)
+        t1 = time.perf_counter()
+        ph.hist.copy()   # стоимость передачи картинки в ImageItem ~ одна копия
+        t2 = time.perf_counter()
+        t_roll += t1 - t0; t_pers += t2 - t1
+        renders += 1
+    ms = lambda v: 1000.0 * v / max(1, renders)
+    print(f"renders={renders} pairs={seq}: roll {ms(t_roll):.2f} мс/кадр, persist {ms(t_pers):.2f} мс/кадр, "
+          f"ingest {ms(t_ingest):.2f} мс/кадр → запас {1000.0 / max(1e-6, ms(t_roll) + ms(t_pers) + ms(t_ingest)):.0f} FPS (без Qt)")
+
+
+if __name__ == '__main__':
+    main()
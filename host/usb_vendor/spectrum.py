@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""spectrum.py — спектр потока семплов (без Qt): окна и оси считаются один раз, rfft, усреднение Уэлча.
+
+  window(name, n)        — окно (hann, blackman, hamming, rect) длины n; LRU-кэш, массив только для чтения.
+  SpectrumPlan(...)      — всё, что зависит только от длины сегмента: окно, nfft, ось частот,
+                           нормировка в дБ относительно полной шкалы int16; band(f_min, f_max) —
+                           срез бинов полосы (считается один раз на полосу). plan() — LRU-кэш планов.
+  welch(x, plan, hop)    — средняя мощность по сегментам массива одним батчевым rfft.
+  RingSpectrum(ring, …)  — живой спектр SampleRing: poll() режет на сегменты только новые
+                           семплы, мощность последних avg сегментов копится скользящей суммой.
+                           Если за poll() пришло больше avg сегментов, считаются только последние.
+
+Спектр вещественный — rfft (nfft//2+1 бинов) вместо полного комплексного fft.
+fs=None — ось частот в циклах на семпл (0…0.5).
+
+Замер: python -m usb_vendor.spectrum --rate 300 --nperseg 4096
+"""
+from __future__ import annotations
+import os
+from functools import lru_cache
+
+import numpy as np
+
+WINDOWS = ('hann', 'blackman', 'hamming', 'rect')
+RESYNC = 1024       # добавлений между полными пересчётами скользящей суммы (ошибка округления)
+FLOOR_DB = -140.0   # нижняя граница дБ (вместо log10(0))
+
+
+@lru_cache(maxsize=16)
+def window(name: str, n: int) -> np.ndarray:
+    """Окно длины n; одно и то же для всех потребителей — не изменять."""
+    if name == 'rect':
+        w = np.ones(n)
+    elif name in WINDOWS:
+        w = getattr(np, 'hanning' if name == 'hann' else name)(n)
+    else:
+        raise ValueError(f'неизвестное окно: {name}')
+    w.setflags(write=False)
+    return w
+
+
+class SpectrumPlan:
+    """Параметры сегмента: окно, nfft (>= nperseg), ось частот, полосы."""
+    def __init__(self, nperseg: int, nfft: int | None = None, win: str = 'hann', fs: float | None = None):
+        self.nperseg = int(nperseg)
+        self.nfft = max(self.nperseg, int(nfft or self.nperseg))
+        self.win = window(win, self.nperseg)
+        self.fs = float(fs) if fs else None
+        self.freqs = np.fft.rfftfreq(self.nfft, 1.0 / self.fs if self.fs else 1.0)
+        # синус с амплитудой полной шкалы int16 даёт 0 дБ
+        self.ref = (32768.0 * self.win.sum() / 2.0) ** 2
+        self._bands: dict = {}
+
+    @property
+    def bins(self) -> int:
+        return len(self.freqs)
+
+    def band(self, f_min: float | None = None, f_max: float | None = None) -> slice:
+        """Срез бинов с f_min <= f <= f_max."""
+        key = (f_min, f_max)
+        s = self._bands.get(key)
+        if s is None:
+            lo = 0 if f_min is None else int(np.searchsorted(self.freqs, f_min, side='left'))
+            hi = self.bins if f_max is None else int(np.searchsorted(self.freqs, f_max, side='right'))
+            s = self._bands[key] = slice(lo, max(lo, hi))
+        return s
+
+    def power(self, segs: np.ndarray) -> np.ndarray:
+        """|rfft(сегмент · окно)|² по последней оси (segs — (..., nperseg))."""
+        f = np.fft.rfft(segs * self.win, n=self.nfft, axis=-1)
+        p = f.real * f.real
+        p += f.imag * f.imag
+        return p
+
+    def db(self, p: np.ndarray) -> np.ndarray:
+        """Мощность → дБ относительно полной шкалы int16."""
+        return np.maximum(10.0 * np.log10(np.maximum(p, 1e-30) / self.ref), FLOOR_DB)
+
+
+@lru_cache(maxsize=8)
+def plan(nperseg: int, nfft: int | None = None, win: str = 'hann', fs: float | None = None) -> SpectrumPlan:
+    """Общий план на (nperseg, nfft, окно, fs) — чтобы окна и оси не пересчитывались на каждом кадре."""
+    return SpectrumPlan(nperseg, nfft, win, fs)
+
+
+def welch(x: np.ndarray, p: SpectrumPlan, hop: int | None = None) -> np.ndarray | None:
+    """Средняя мощность по сегментам x (последняя ось) с шагом hop (по умолчанию nperseg/2) или None."""
+    n = p.nperseg
+    if x.shape[-1] < n:
+        return None
+    hop = max(1, int(hop or n // 2))
+    segs = np.lib.stride_tricks.sliding_window_view(x, n, axis=-1)[..., ::hop, :]
+    return p.power(segs).mean(axis=-2)
+
+
+class RingSpectrum:
+    """Спектр обоих каналов SampleRing по последним avg сегментам (Уэлч, перекрытие overlap)."""
+    def __init__(self, ring, nperseg: int = 4096, overlap: float = 0.5, avg: int = 8,
+                 win: str = 'hann', fs: float | None = None, nfft: int | None = None):
+        self.ring = ring
+        self.plan = plan(int(nperseg), nfft, win, fs)
+        n = self.plan.nperseg
+        if n > ring.cap:
+            raise ValueError('nperseg больше ёмкости кольца')
+        self.hop = max(1, n - int(n * min(max(float(overlap), 0.0), 0.95)))
+        self.avg = max(1, int(avg))
+        self._rows = np.zeros((self.avg, 2, self.plan.bins))
+        self._sum = np.zeros((2, self.plan.bins))
+        self._pos = 0
+        self._adds = 0
+        self.count = 0        # сегментов в среднем сейчас (<= avg)
+        self.segments = 0     # всего посчитано сегментов
+        self.skipped = 0      # сегментов пропущено (затёрты кольцом или вытеснены до расчёта)
+        self._next = ring.widx
+
+    @classmethod
+    def from_env(cls, ring, **defaults) -> 'RingSpectrum':
+        """BMI30_SPECTRUM_N / _OVERLAP / _AVG / _WINDOW / _FS поверх defaults."""
+        for key, name, typ in (('nperseg', 'BMI30_SPECTRUM_N', int), ('overlap', 'BMI30_SPECTRUM_OVERLAP', float),
+                               ('avg', 'BMI30_SPECTRUM_AVG', int), ('win', 'BMI30_SPECTRUM_WINDOW', str),
+                               ('fs', 'BMI30_SPECTRUM_FS', float)):
+            v = os.getenv(name)
+            if v not in (None, ''):
+                try:
+                    defaults[key] = typ(v)
+                except ValueError:
+                    pass
+        return cls(ring, **defaults)
+
+    def reset(self):
+        self._rows.fill(0)
+        self._sum.fill(0)
+        self._pos = 0
+        self.count = 0
+        self._next = self.ring.widx
+
+    def poll(self) -> int:
+        """Посчитать сегменты, целиком пришедшие с прошлого вызова; вернуть их число."""
+        ring = self.ring
+        n, hop = self.plan.nperseg, self.hop
+        w = ring.widx
+        lo = w - ring.cap
+        if self._next < lo:
+            lost = -(-(lo - self._next) // hop)
+            self._next += lost * hop
+            self.skipped += lost
+        k = (w - self._next - n) // hop + 1
+        if k <= 0:
+            return 0
+        if k > self.avg:
+            # всё, что старше последних avg сегментов, всё равно вытеснилось бы из среднего
+            self.skipped += k - self.avg
+            self._next += (k - self.avg) * hop
+            k = self.avg
+        start = self._next
+        span = (k - 1) * hop + n
+        v0, v1 = ring.view(start, span)
+        segs = np.lib.stride_tricks.sliding_window_view(np.stack((v0, v1)), n, axis=-1)[:, ::hop]
+        p = self.plan.power(segs)              # (2, k, bins)
+        self._next = start + k * hop
+        if not ring.valid(start):
+            self.skipped += k                  # писатель обогнал нас во время расчёта
+            return 0
+        for i in range(k):
+            old = self._rows[self._pos]
+            if self.count == self.avg:
+                self._sum -= old
+            else:
+                self.count += 1
+            old[...] = p[:, i]
+            self._sum += old
+            self._pos = (self._pos + 1) % self.avg
+            self._adds += 1
+        if self._adds >= RESYNC:
+            self._rows.sum(axis=0, out=self._sum)
+            self._adds = 0
+        self.segments += k
+        return k
+
+    def mean(self) -> np.ndarray | None:
+        """(2, bins) — средняя мощность последних count сегментов или None."""
+        return self._sum / self.count if self.count else None
+
+    def db(self, f_min: float | None = None, f_max: float | None = None):
+        """(freqs, db0, db1) полосы f_min..f_max или None, пока нет ни одного сегмента."""
+        m = self.mean()
+        if m is None:
+            return None
+        s = self.plan.band(f_min, f_max)
+        d = self.plan.db(m[:, s])
+        return self.plan.freqs[s], d[0], d[1]
+
+
+def main():
+    """Синтетический поток в SampleRing: стоимость poll()+db() на кадр отрисовки и сверка с welch()."""
+    import argparse, time
+    try:
+        from .sample_ring import SampleRing
+    except ImportError:
+        from sample_ring import SampleRing
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--samples', type=int, default=912)
+    ap.add_argument('--rate', type=float, default=300.0, help='Пар/с')
+    ap.add_argument('--nperseg', type=int, default=4096)
+    ap.add_argument('--avg', type=int, default=8)
+    ap.add_argument('--fps', type=float, default=30.0)
+    ap.add_argument('--seconds', type=float, default=3.0)
+    args = ap.parse_args()
+    ring = SampleRing()
+    rs = RingSpectrum(ring, args.nperseg, avg=args.avg)
+    n = args.samples
+    per_frame = args.rate / args.fps
+    acc = 0.0; seq = 0; frames = 0; t_spec = 0.0
+    rng = np.random.default_rng(0)
+    t_end = time.perf_counter() + args.seconds
+    while time.perf_counter() < t_end:
+        acc += per_frame
+        while acc >= 1.0:
+            t = (seq * n + np.arange(n)) * (2 * np.pi * 0.0371)
+            f = (8000 * np.sin(t) + rng.normal(0, 150, n)).astype(np.int16)
+            ring.write(f, f, seq, seq)
+            seq += 1; acc -= 1.0
+        t0 = time.perf_counter()
+        rs.poll()
+        rs.db()
+        t_spec += time.perf_counter() - t0
+        frames += 1
+    # сверка: среднее последних avg сегментов == welch() по тому же участку
+    v0, _ = ring.view(rs._next - rs.count * rs.hop, (rs.count - 1) * rs.hop + rs.plan.nperseg)
+    ref = welch(v0, rs.plan, rs.hop)
+    freqs, d0, _ = rs.db()
+    assert np.allclose(rs.mean()[0], ref, rtol=1e-6, atol=1e-6 * ref.max())
+    # полный комплексный fft против rfft на одном сегменте
+    seg = v0[:rs.plan.nperseg] * rs.plan.win
+    t0 = time.perf_counter()
+    for _ in range(200):
+        np.abs(np.fft.fft(seg))
+    t_fft = (time.perf_counter() - t0) / 200
+    t0 = time.perf_counter()
+    for _ in range(200):
+        rs.plan.power(seg)
+    t_rfft = (time.perf_counter() - t0) / 200
+    print(f"frames={frames} pairs={seq} segments={rs.segments} skipped={rs.skipped}: "
+          f"{1e3 * t_spec / max(1, frames):.3f} мс/кадр (poll+db), пик {freqs[int(np.argmax(d0))]:.4f} цикл/семпл, "
+          f"{d0.max():.1f} дБFS; fft {t_fft * 1e6:.0f} мкс против rfft {t_rfft * 1e6:.0f} мкс на сегмент")
+
+
+if __name__ == '__main__':
+    main()
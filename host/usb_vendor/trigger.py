@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""trigger.py — триггер по непрерывному кольцу семплов (SampleRing): развёртки, выровненные по событию.
+
+Режимы:
+  rising  — пересечение level снизу вверх;
+  falling — пересечение level сверху вниз;
+  level   — сигнал >= level (каждый семпл — кандидат, частоту режет holdoff);
+  window  — выход из окна [level, level2] (вход обратно взводит триггер).
+
+hysteresis — перевзвод фронтов только после ухода на hysteresis за уровень
+(для window — сужение окна), чтобы шум у порога не давал пачку срабатываний.
+holdoff — минимум семплов между срабатываниями; по умолчанию pre+post, т.е.
+развёртки не перекрываются. Развёртка = семплы [t-pre, t+post) обоих каналов.
+
+Поиск — векторный, только по семплам, пришедшим с прошлого poll(): маски
+«взвод»/«срабатывание» + np.maximum.accumulate последних индексов, состояние
+взвода переносится между вызовами. Python-цикл остаётся лишь по самим
+срабатываниям (holdoff, searchsorted).
+
+  find_triggers(x, mode, level, …) — то же для обычного массива (DSP, History-скрипты).
+  TriggerEngine(ring, …)           — поверх SampleRing: poll(), latest(), pop().
+  TriggerEngine.from_env(ring, …)  — BMI30_TRIGGER=rising|falling|level|window, BMI30_TRIG_*.
+
+Замер: python -m usb_vendor.trigger --rate 300
+"""
+from __future__ import annotations
+import os
+from collections import deque
+
+import numpy as np
+
+RISING, FALLING, LEVEL, WINDOW = 'rising', 'falling', 'level', 'window'
+MODES = (RISING, FALLING, LEVEL, WINDOW)
+SWEEPS_KEEP = 16     # готовых развёрток в очереди TriggerEngine (старые вытесняются)
+
+
+def _masks(x: np.ndarray, mode: str, level: float, level2: float | None, hysteresis: float):
+    """(arm, fire) — где триггер взводится и где срабатывает (взведённый)."""
+    h = abs(float(hysteresis))
+    if mode == RISING:
+        return x < level - h if h else x < level, x >= level
+    if mode == FALLING:
+        return x > level + h if h else x > level, x <= level
+    if mode == WINDOW:
+        if level2 is None:
+            raise ValueError('window: нужен level2')
+        lo, hi = min(level, level2), max(level, level2)
+        return (x >= lo + h) & (x <= hi - h), (x < lo) | (x > hi)
+    raise ValueError(f'неизвестный режим триггера: {mode}')
+
+
+def find_triggers(x: np.ndarray, mode: str = RISING, level: float = 0, level2: float | None = None,
+                  hysteresis: float = 0, armed: bool = False):
+    """(idx, armed) — индексы срабатываний в x и состояние взвода после последнего семпла.
+
+    armed — состояние на входе (из предыдущего куска потока); для фронта без
+    истории False: первое срабатывание только после того, как увидели «до фронта».
+    """
+    n = len(x)
+    if mode == LEVEL:
+        return np.flatnonzero(x >= level), True
+    if not n:
+        return np.zeros(0, dtype=np.int64), armed
+    arm, fire = _masks(x, mode, level, level2, hysteresis)
+    i = np.arange(n)
+    last_arm = np.maximum.accumulate(np.where(arm, i, -1))
+    last_fire = np.maximum.accumulate(np.where(fire, i, -1))
+    # взведён ли триггер перед семплом i: последний «взвод» позже последнего «срабатывания»
+    st = np.empty(n, dtype=bool)
+    st[0] = armed
+    st[1:] = last_arm[:-1] > last_fire[:-1]
+    if armed:
+        st[1:] |= (last_arm[:-1] < 0) & (last_fire[:-1] < 0)
+    idx = np.flatnonzero(fire & st)
+    out = bool(last_arm[-1] > last_fire[-1]) or (armed and last_arm[-1] < 0 and last_fire[-1] < 0)
+    return idx, out
+
+
+def apply_holdoff(idx: np.ndarray, holdoff: int, last: int | None = None) -> np.ndarray:
+    """Оставить срабатывания не ближе holdoff семплов друг к другу (и к last — предыдущему)."""
+    if holdoff <= 1 and last is None:
+        return idx
+    out = []
+    k = 0 if last is None else int(np.searchsorted(idx, last + holdoff))
+    n = len(idx)
+    while k < n:
+        t = int(idx[k])
+        out.append(t)
+        k = int(np.searchsorted(idx, t + max(1, holdoff), side='left'))
+    return np.asarray(out, dtype=np.int64)
+
+
+class TriggerEngine:
+    """Триггер по каналу channel кольца ring; развёртки — виды на кольцо (обе оси)."""
+    def __init__(self, ring, mode: str = RISING, level: float = 0, level2: float | None = None,
+                 channel: int = 0, pre: int = 0, post: int = 912, holdoff: int | None = None,
+                 hysteresis: float = 0, keep: int = SWEEPS_KEEP):
+        if mode not in MODES:
+            raise ValueError(f'неизвестный режим триггера: {mode}')
+        self.ring = ring
+        self.mode = mode
+        self.level = float(level)
+        self.level2 = None if level2 is None else float(level2)
+        self.channel = 1 if channel else 0
+        self.pre = max(0, int(pre))
+        self.post = max(1, int(post))
+        if self.pre + self.post > ring.cap:
+            raise ValueError('pre+post больше ёмкости кольца')
+        self.holdoff = self.pre + self.post if holdoff is None else max(1, int(holdoff))
+        self.hysteresis = float(hysteresis)
+        self.count = 0       # всего срабатываний
+        self.missed = 0      # срабатываний, чья развёртка успела затереться
+        self._scan = ring.widx
+        self._armed = False
+        self._last: int | None = None
+        self._pending: deque = deque()
+        self._done: deque = deque(maxlen=max(1, int(keep)))
+
+    @classmethod
+    def from_env(cls, ring, mode: str | None = None, **defaults) -> 'TriggerEngine | None':
+        """BMI30_TRIGGER (режим) и BMI30_TRIG_LEVEL/LEVEL2/CH/PRE/POST/HOLDOFF/HYST поверх defaults.
+        None — если режим не задан ни в окружении, ни аргументом mode."""
+        mode = str(os.getenv('BMI30_TRIGGER') or mode or '').lower()
+        if mode not in MODES:
+            return None
+        for key, name, typ in (('level', 'BMI30_TRIG_LEVEL', float), ('level2', 'BMI30_TRIG_LEVEL2', float),
+                               ('channel', 'BMI30_TRIG_CH', int), ('pre', 'BMI30_TRIG_PRE', int),
+                               ('post', 'BMI30_TRIG_POST', int), ('holdoff', 'BMI30_TRIG_HOLDOFF', int),
+                               ('hysteresis', 'BMI30_TRIG_HYST', float)):
+            v = os.getenv(name)
+            if v not in (None, ''):
+                try:
+                    defaults[key] = typ(v)
+                except ValueError:
+                    pass
+        return cls(ring, mode, **defaults)
+
+    def reset(self):
+        """Начать с текущего места кольца (после смены устройства/уровня)."""
+        self._scan = self.ring.widx
+        self._armed = False
+        self._last = None
+        self._pending.clear()
+        self._done.clear()
+
+    def poll(self) -> int:
+        """Просканировать новые семплы; вернуть, сколько развёрток стало готово."""
+        ring = self.ring
+        w = ring.widx
+        start = max(self._scan, w - ring.cap + 1)
+        if start > self._scan:
+            self._armed = False     # часть потока затёрта — историю взвода не знаем
+        if w > start:
+            v = ring.view(start, w - start)[self.channel]
+            idx, self._armed = find_triggers(v, self.mode, self.level, self.level2, self.hysteresis, self._armed)
+            if len(idx):
+                idx = apply_holdoff(idx + start, self.holdoff, self._last)
+                if len(idx):
+                    self._last = int(idx[-1])
+                    self.count += len(idx)
+                    self._pending.extend(idx.tolist())
+            self._scan = w
+        ready = 0
+        lo = w - ring.cap
+        pend = self._pending
+        while pend and pend[0] + self.post <= w:
+            t = pend.popleft()
+            if t - self.pre < max(0, lo):
+                self.missed += 1
+                continue
+            self._done.append(t)
+            ready += 1
+        # ожидающие, чьё начало уже затёрто, ждать бессмысленно
+        while pend and pend[0] - self.pre < lo:
+            pend.popleft()
+            self.missed += 1
+        return ready
+
+    def sweep(self, t: int):
+        """(ch0, ch1) — виды на развёртку срабатывания t или None, если кольцо её затёрло."""
+        s = t - self.pre
+        if s < 0 or not self.ring.valid(s):
+            return None
+        return self.ring.view(s, self.pre + self.post)
+
+    def latest(self):
+        """(t, ch0, ch1) — самая свежая готовая развёртка (очередь не трогает) или None."""
+        while self._done:
+            t = self._done[-1]
+            sw = self.sweep(t)
+            if sw is not None:
+                return (t,) + tuple(sw)
+            self._done.pop()
+        return None
+
+    def pop(self):
+        """(t, ch0, ch1) — самая старая непрочитанная развёртка (для DSP) или None."""
+        while self._done:
+            t = self._done.popleft()
+            sw = self.sweep(t)
+            if sw is not None:
+                return (t,) + tuple(sw)
+            self.missed += 1
+        return None
+
+
+def main():
+    """Синтетический поток в SampleRing: стоимость poll() и число развёрток."""
+    import argparse, time
+    try:
+        from .sample_ring import SampleRing
+    except ImportError:
+        from sample_ring import SampleRing
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--mode', default=RISING, choices=MODES)
+    ap.add_argument('--level', type=float, default=0.0)
+    ap.add_argument('--level2', type=float, default=None)
+    ap.add_argument('--samples', type=int, default=912)
+    ap.add_argument('--rate', type=float, default=300.0, help='Пар/с')
+    ap.add_argument('--pre', type=int, default=128)
+    ap.add_argument('--post', type=int, default=784)
+    ap.add_argument('--hyst', type=float, default=200.0)
+    ap.add_argument('--tick', type=float, default=0.06, help='Период poll(), с')
+    ap.add_argument('--seconds', type=float, default=3.0)
+    args = ap.parse_args()
+    ring = SampleRing()
+    eng = TriggerEngine(ring, args.mode, args.level, args.level2, pre=args.pre, post=args.post, hysteresis=args.hyst)
+    n = args.samples
+    per_tick = args.rate * args.tick
+    acc = 0.0; seq = 0; polls = 0; t_poll = 0.0; got = 0
+    t_end = time.perf_counter() + args.seconds
+    while time.perf_counter() < t_end:
+        acc += per_tick
+        while acc >= 1.0:
+            t = (seq * n + np.arange(n)) * (2 * np.pi * 7.3 / n)
+            f = (8000 * np.sin(t) + np.random.randn(n) * 150).astype(np.int16)
+            ring.write(f, f, seq, seq)
+            seq += 1; acc -= 1.0
+        t0 = time.perf_counter()
+        eng.poll()
+        while eng.pop() is not None:
+            got += 1
+        t_poll += time.perf_counter() - t0
+        polls += 1
+    print(f"pairs={seq} polls={polls} triggers={eng.count} sweeps={got} missed={eng.missed}: "
+          f"{1e3 * t_poll / max(1, polls):.3f} мс/poll ({1e9 * t_poll / max(1, seq * n):.1f} нс/семпл)")
+
+
+if __name__ == '__main__':
+    main()
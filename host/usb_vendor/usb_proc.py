@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""usb_proc.py — приём Vendor Bulk в отдельном процессе (вне GIL GUI).
+
+Дочерний процесс держит USBStream целиком: чтение bulk IN, дефрейминг, CRC,
+сборку пар. Пары пишутся в SampleRing, размещённый в multiprocessing.shared_memory,
+— GUI читает его напрямую, без копий через pipe. По маленькому каналу управления
+(Pipe) ходят только статистика, последний STAT, признак отключения и вызовы
+send_cmd/set_alt/soft_reset/… из GUI.
+
+ProcUSBStream повторяет ту часть интерфейса USBStream, которой пользуется
+BMI30.200.py (sample_ring, get_stereo, send_cmd, close, disconnected, last_rx_t, …),
+поэтому подменяется одной строкой. Включается BMI30_RX_PROC=1.
+
+Процесс запускается методом 'spawn' (fork из процесса с Qt и потоками небезопасен).
+"""
+from __future__ import annotations
+import multiprocessing as mp
+import threading, time
+
+import numpy as np
+
+try:
+    from .sample_ring import SampleRing
+except ImportError:
+    from sample_ring import SampleRing
+
+START_TIMEOUT = 15.0     # с: открытие устройства + SET_ALT + START в дочернем процессе
+CALL_TIMEOUT = 5.0       # с: один вызов метода USBStream через канал управления
+STATS_PERIOD = 0.2       # с: как часто дочерний процесс шлёт статистику
+
+# методы USBStream, доступные из родителя
+_CALLS = ('send_cmd', 'set_alt', 'soft_reset', 'deep_reset', '_get_status_ep0',
+          'restart_stream', 'get_port_path_info')
+
+
+def _snapshot(us) -> dict:
+    st = {'frames': us.frames, 'bytes': us.bytes, 'crc_bad': us.crc_bad, 'magic_bad': us.magic_bad,
+          'test_seen': us.test_seen, 'last_stat': us.last_stat, 'disconnected': us.disconnected,
+          'last_rx_t': us.last_rx_t}
+    try:
+        st['pool'] = us.pool.stats()
+    except Exception:
+        pass
+    return st
+
+
+def _child_main(kw: dict, shm_name: str, conn):
+    """Тело дочернего процесса: USBStream + обслуживание канала управления."""
+    try:
+        from .usb_stream import USBStream
+    except ImportError:
+        from usb_stream import USBStream
+    ring = SampleRing.attach(shm_name)
+    try:
+        us = USBStream(sample_ring=ring, **kw)
+    except SystemExit as e:
+        conn.send(('error', 'exit', str(e)))
+        return
+    except Exception as e:
+        conn.send(('error', 'exc', f"{type(e).__name__}: {e}"))
+        return
+    us.set_pair_queue(False)
+    try:
+        conn.send(('ready', {'port_info': us.port_info, 'intf_num': getattr(us, 'intf_num', None)}))
+        t_stat = 0.0
+        while True:
+            if conn.poll(STATS_PERIOD):
+                msg = conn.recv()
+                if msg[0] == 'close':
+                    break
+                if msg[0] == 'call':
+                    _, cid, name, args = msg
+                    try:
+                        if name not in _CALLS:
+                            raise AttributeError(name)
+                        res = (True, getattr(us, name)(*args))
+                    except Exception as e:
+                        res = (False, f"{type(e).__name__}: {e}")
+                    # сначала свежая статистика (например, last_stat после GET_STATUS), потом ответ
+                    conn.send(('stats', _snapshot(us)))
+                    conn.send(('ret', cid) + res)
+                    continue
+            now = time.monotonic()
+            if now - t_stat >= STATS_PERIOD:
+                t_stat = now
+                conn.send(('stats', _snapshot(us)))
+    except (EOFError, OSError, KeyboardInterrupt):
+        pass   # родитель ушёл — закрываемся сами
+    finally:
+        try:
+            us.close()
+        except Exception:
+            pass
+        th = getattr(us, 'th', None)
+        if th is not None:
+            th.join(timeout=1.0)
+        if th is None or not th.is_alive():
+            ring.close()   # иначе RX-поток ещё пишет в кольцо — shared_memory отпустит выход процесса
+
+
+class RingHalf:
+    """Полукадр пары из кольца семплов: поля как у PairHalf, payload — байтовый вид на кольцо."""
+    __slots__ = ('seq', 'timestamp', 'adc_id', 'flags', 'samples', 'payload')
+    def __init__(self, seq, timestamp, adc_id, samples, payload):
+        self.seq = seq; self.timestamp = timestamp; self.adc_id = adc_id
+        self.flags = 1 << adc_id; self.samples = samples; self.payload = payload
+    def release(self):
+        """Слотов нет — кольцо само перезаписывает старое; для совместимости с PairHalf."""
+        pass
+
+
+class ProcUSBStream:
+    """USBStream в дочернем процессе; аргументы те же, что у USBStream (кроме sample_ring)."""
+    def __init__(self, capacity: int | None = None, blocks: int | None = None, **kw):
+        kw.pop('interactive', None)   # у дочернего процесса нет stdin
+        self.frames = 0; self.bytes = 0; self.crc_bad = 0; self.magic_bad = 0
+        self.test_seen = 0
+        self.last_stat = None
+        self.pool_stats = {}
+        self.disconnected = False
+        self.last_rx_t = time.time()
+        self.port_info = None
+        self.intf_num = None
+        args = {}
+        if capacity:
+            args['capacity'] = capacity
+        if blocks:
+            args['blocks'] = blocks
+        self.sample_ring = SampleRing.create_shared(**args)
+        self._blk = 0
+        self._calls = {}; self._cid = 0
+        self._send_lock = threading.Lock()
+        ctx = mp.get_context('spawn')
+        self._conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_child_main, args=(kw, self.sample_ring.shm.name, child),
+                                name='bmi30-usb-rx', daemon=True)
+        try:
+            self.proc.start()
+            child.close()
+            if not self._conn.poll(START_TIMEOUT):
+                raise RuntimeError('USB-процесс не ответил за %.0f с' % START_TIMEOUT)
+            msg = self._conn.recv()
+        except EOFError:
+            self._shutdown()
+            raise RuntimeError('USB-процесс завершился при старте')
+        except BaseException:
+            self._shutdown()
+            raise
+        if msg[0] == 'error':
+            self._shutdown()
+            if msg[1] == 'exit':
+                raise SystemExit(msg[2])
+            raise RuntimeError(msg[2])
+        self.port_info = msg[1].get('port_info')
+        self.intf_num = msg[1].get('intf_num')
+        self.last_rx_t = time.time()
+        self._th = threading.Thread(target=self._ctl_loop, daemon=True)
+        self._th.start()
+
+    # --- канал управления ---
+    def _ctl_loop(self):
+        conn = self._conn
+        try:
+            while True:
+                msg = conn.recv()
+                kind = msg[0]
+                if kind == 'stats':
+                    self._apply(msg[1])
+                elif kind == 'ret':
+                    w = self._calls.get(msg[1])
+                    if w is not None:
+                        w[1] = msg[2:]
+                        w[0].set()
+        except (EOFError, OSError):
+            pass
+        # процесс умер или канал закрыт — для GUI это отключение
+        self.disconnected = True
+        for w in list(self._calls.values()):
+            w[0].set()
+
+    def _apply(self, st: dict):
+        self.frames = st['frames']; self.bytes = st['bytes']
+        self.crc_bad = st['crc_bad']; self.magic_bad = st['magic_bad']
+        self.test_seen = st['test_seen']
+        if st['last_stat'] is not None:
+            self.last_stat = st['last_stat']
+        self.last_rx_t = st['last_rx_t']
+        self.pool_stats = st.get('pool', self.pool_stats)
+        if st['disconnected']:
+            self.disconnected = True
+
+    def _call(self, name: str, *args):
+        if self.disconnected or not self.proc.is_alive():
+            raise RuntimeError('USB-процесс не работает')
+        with self._send_lock:
+            self._cid += 1
+            cid = self._cid
+            w = self._calls[cid] = [threading.Event(), None]
+            self._conn.send(('call', cid, name, args))
+        try:
+            if not w[0].wait(CALL_TIMEOUT) or w[1] is None:
+                raise RuntimeError(f'{name}: нет ответа от USB-процесса')
+        finally:
+            self._calls.pop(cid, None)
+        ok, val = w[1]
+        if not ok:
+            raise RuntimeError(val)
+        return val
+
+    # --- интерфейс USBStream ---
+    def send_cmd(self, cmd, payload: bytes):
+        return self._call('send_cmd', cmd, bytes(payload))
+    def set_alt(self, alt: int):
+        return self._call('set_alt', int(alt))
+    def soft_reset(self):
+        return self._call('soft_reset')
+    def deep_reset(self):
+        return self._call('deep_reset')
+    def _get_status_ep0(self):
+        return self._call('_get_status_ep0')
+    def restart_stream(self, full=True):
+        return self._call('restart_stream', full)
+    def get_port_path_info(self):
+        try:
+            return self._call('get_port_path_info')
+        except Exception:
+            return self.port_info
+
+    def set_pair_queue(self, enabled: bool):
+        """Очереди пар здесь нет: всё идёт через кольцо семплов."""
+        pass
+
+    def get_stereo(self, timeout=0.0):
+        """(a, b) — следующая пара из кольца (виды, валидны пока кольцо не ушло на круг) или None."""
+        ring = self.sample_ring
+        t_end = time.monotonic() + (timeout or 0.0)
+        while True:
+            b = ring.bidx
+            if b > self._blk:
+                k = max(self._blk, b - ring.bcap)
+                self._blk = k + 1
+                i = k % ring.bcap
+                seq = int(ring.blk_seq[i]); ts = int(ring.blk_ts[i])
+                start = int(ring.blk_start[i]); n = int(ring.blk_n[i])
+                if not ring.valid(start):
+                    continue
+                v0, v1 = ring.view(start, n)
+                return (RingHalf(seq, ts, 0, n, memoryview(v0).cast('B')),
+                        RingHalf(seq, ts, 1, n, memoryview(v1).cast('B')))
+            if time.monotonic() >= t_end or self.disconnected:
+                return None
+            time.sleep(0.001)
+
+    def get_stereo_into(self, dst0, dst1, timeout=0.0):
+        """Скопировать следующую пару в dst0/dst1: (seq, timestamp, samples) или None."""
+        pair = self.get_stereo(timeout)
+        if pair is None:
+            return None
+        a, b = pair
+        n = min(a.samples, len(dst0), len(dst1))
+        dst0[:n] = np.frombuffer(a.payload, dtype=np.int16, count=n)
+        dst1[:n] = np.frombuffer(b.payload, dtype=np.int16, count=n)
+        return a.seq, a.timestamp, n
+
+    def close(self):
+        try:
+            with self._send_lock:
+                self._conn.send(('close',))
+        except Exception:
+            pass
+        self._shutdown()
+
+    def _shutdown(self):
+        try:
+            self.proc.join(timeout=3.0)
+            if self.proc.is_alive():
+                self.proc.terminate()
+                self.proc.join(timeout=1.0)
+        except Exception:
+            pass
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self.disconnected = True
+        self.sample_ring.close(unlink=True)
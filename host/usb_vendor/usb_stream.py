@@ -1,6 +1,24 @@
 #!/usr/bin/env python3
-import usb.core, usb.util, struct, time, threading, queue, sys, os
+import usb.core, usb.util, struct, time, threading, sys, os
 from collections import deque
+try:
+    from .rx_ring import RxRing
+    from .bulk_in import SyncBulkIn, AsyncBulkIn, URB_COUNT, URB_SIZE
+    from .crc16 import vendor_frame_crc
+    from .pair_pool import PairPool
+    from .sample_ring import SampleRing
+    from .recorder import Recorder, KIND_FRAMES, KIND_PAIRS
+    from .device_sim import from_env as device_sim_from_env
+    from .control import vendor_client
+except ImportError:
+    from rx_ring import RxRing
+    from bulk_in import SyncBulkIn, AsyncBulkIn, URB_COUNT, URB_SIZE
+    from crc16 import vendor_frame_crc
+    from pair_pool import PairPool
+    from sample_ring import SampleRing
+    from recorder import Recorder, KIND_FRAMES, KIND_PAIRS
+    from device_sim import from_env as device_sim_from_env
+    from control import vendor_client
 
 VID=0xCAFE  # Автопоиск если не найдено
 PID=0x4001
@@ -22,66 +40,23 @@ MAGIC=0xA55A
 HDR_FMT='<HBBI I H H I I I H H'  # manual split
 # We'll unpack manually due to spacing: (magic,ver,flags,seq,timestamp,total_samples,zone_count,zone1_offset,zone1_length,reserved,reserved2,crc16)
 HDR_SIZE=32
+STAT_SIZE=64
+RX_READ_SIZE=4096   # один bulk IN read (кадр 1360 семплов = 2752 байт)
 
 VF_ADC0   =0x01
 VF_ADC1   =0x02
 VF_CRC    =0x04
 
-def crc16_ccitt_false(data:bytes, init=0xFFFF):
-    crc=init
-    for b in data:
-        crc ^= b<<8
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = (crc<<1) ^ 0x1021
-            else:
-                crc <<=1
-            crc &=0xFFFF
-    return crc
-
 class Frame:
     __slots__=("seq","timestamp","adc_id","flags","samples","payload")
     def __init__(self,seq,timestamp,adc_id,flags,samples,payload):
         self.seq=seq; self.timestamp=timestamp; self.adc_id=adc_id; self.flags=flags; self.samples=samples; self.payload=payload
 
-class StereoAssembler:
-    def __init__(self):
-        self.bufA={}; self.bufB={}; self.q=queue.Queue(maxsize=256)
-        try:
-            self.relaxed = str(os.getenv('BMI30_RELAXED_PAIRING','1')).lower() not in ('0','false','no')
-        except Exception:
-            self.relaxed = True
-    def _emit_pair(self, a: 'Frame', b: 'Frame'):
-        try:
-            self.q.put((a, b))
-        except Exception:
-            pass
-    def push(self,f:Frame):
-        if f.adc_id==0:
-            self.bufA[f.seq]=f
-            if f.seq in self.bufB:
-                a=self.bufA.pop(f.seq); b=self.bufB.pop(f.seq)
-                self._emit_pair(a,b)
-            elif self.relaxed and (f.seq+1) in self.bufB:
-                # Допуск: устройство может инкрементировать seq на каждом кадре (A->B)
-                a=self.bufA.pop(f.seq); b=self.bufB.pop(f.seq+1)
-                self._emit_pair(a,b)
-        else:
-            self.bufB[f.seq]=f
-            if f.seq in self.bufA:
-                a=self.bufA.pop(f.seq); b=self.bufB.pop(f.seq)
-                self._emit_pair(a,b)
-            elif self.relaxed and (f.seq-1) in self.bufA:
-                a=self.bufA.pop(f.seq-1); b=self.bufB.pop(f.seq)
-                self._emit_pair(a,b)
-        # Простейшая защита от разрастания при редких несостыковках
-        if len(self.bufA) > 2048:
-            self.bufA.clear()
-        if len(self.bufB) > 2048:
-            self.bufB.clear()
-
 class USBStream:
-    def __init__(self, profile=1, full=True, vid=VID, pid=PID, interactive=False, allow_any=False, iface_prefer=None, test_as_data: bool=False, frame_samples: int | None = None):
+    def __init__(self, profile=1, full=True, vid=VID, pid=PID, interactive=False, allow_any=False, iface_prefer=None, test_as_data: bool=False, frame_samples: int | None = None,
+                 rx_async: bool | None = None, urb_count: int | None = None, urb_size: int | None = None,
+                 pair_capacity: int | None = None, pair_policy: str | None = None,
+                 sample_ring: SampleRing | None = None, dev=None):
         self._running = True
         self.dev=None
         self.intf=None
@@ -89,6 +64,8 @@ class USBStream:
         self.full = full
         self.test_as_data = test_as_data
         self.frame_samples = frame_samples
+        # команды — пачками через общий клиент (без sleep(0.02) после каждой; пауза — BMI30_CMD_GAP_S)
+        self.ctrl = vendor_client(self)
         # функция сканирования всех интерфейсов устройства
         def scan_device(dev):
             infos=[]
@@ -99,8 +76,24 @@ class USBStream:
                     if EP_IN in eps and EP_OUT in eps:
                         infos.append((cfg.bConfigurationValue, intf.bInterfaceNumber, eps))
             return infos
+        # 0. Готовое PyUSB-совместимое устройство: симулятор (device_sim.py, BMI30_SIM) или иной транспорт
+        if dev is None:
+            try:
+                dev = device_sim_from_env()
+            except Exception as e:
+                print('[sim] BMI30_SIM задан, но симулятор недоступен:', e)
+        if dev is not None:
+            matches=scan_device(dev)
+            if not matches:
+                raise SystemExit(f"{type(dev).__name__}: нет интерфейса с EP {hex(EP_IN)}/{hex(EP_OUT)}")
+            if iface_prefer is not None:
+                m2=[m for m in matches if m[1]==iface_prefer]
+                if m2: matches=m2
+            self.dev=dev
+            self.intf_sel=(matches[0][0], matches[0][1])
+            print(f"[open] {type(dev).__name__} cfg={self.intf_sel[0]} intf={self.intf_sel[1]}")
         # 1. Ищем только указанный VID/PID (строго). Если нужно любое устройство, передать allow_any=True
-        if vid and pid:
+        if self.dev is None and vid and pid:
             exact_list=list(usb.core.find(find_all=True, idVendor=vid, idProduct=pid))
             if exact_list:
                 # выбираем первое; если iface_prefer задан – ищем интерфейс по номеру
@@ -306,25 +299,7 @@ class USBStream:
                 self._wait_ready(timeout=1.0)
             except Exception:
                 pass
-            try:
-                if self.profile is not None:
-                    self.send_cmd(CMD_SET_PROFILE, bytes([int(self.profile) & 0xFF])); time.sleep(0.02)
-            except Exception:
-                pass
-            try:
-                self.send_cmd(CMD_SET_FULL_MODE, bytes([1 if self.full else 0])); time.sleep(0.02)
-            except Exception:
-                pass
-            if self.frame_samples is not None:
-                try:
-                    # u16 LE
-                    ns = max(1, int(self.frame_samples)) & 0xFFFF
-                    self.send_cmd(CMD_SET_FRAME_SAMPLES, ns.to_bytes(2, 'little'))
-                    time.sleep(0.02)
-                except Exception:
-                    pass
-            self.send_cmd(CMD_START_STREAM, b"")
-            time.sleep(0.02)
+            self.start_burst()
             # EP0 статус-пинг сразу после старта
             self._get_status_ep0()
         except Exception:
@@ -334,7 +309,23 @@ class USBStream:
         self.frames = 0; self.bytes = 0; self.crc_bad = 0; self.magic_bad = 0
         self.test_seen = 0
         self.last_stat = None
-        self.asm = StereoAssembler()
+        # стереопары: преаллоцированный пул (capacity, 2, samples), RX не ждёт потребителя
+        self.pool = PairPool.from_env(pair_capacity, pair_policy, frame_samples)
+        # непрерывный поток семплов обоих каналов: GUI/запись/DSP читают по своему курсору
+        # (может быть передано снаружи — например, кольцо в shared_memory, см. usb_proc.py)
+        self.sample_ring = sample_ring if sample_ring is not None else SampleRing()
+        self.pool.on_pair = self._publish_pair
+        # запись потока в .bmr (recorder.py): BMI30_RECORD=путь, BMI30_RECORD_PAIRS=1 — пары вместо сырых кадров
+        self.recorder = None
+        self.record_pairs = False
+        try:
+            _rec = os.getenv('BMI30_RECORD')
+            if _rec:
+                self.start_recording(_rec, pairs=str(os.getenv('BMI30_RECORD_PAIRS','0')).lower() not in ('0','false','no'))
+        except Exception as e:
+            print('[rec] не удалось начать запись:', e)
+        self.ring = RxRing()
+        self.rx_in = self._open_bulk_in(rx_async, urb_count, urb_size)
         self.stat_t = time.time()
         self.th = threading.Thread(target=self._rx_loop, daemon=True)
         self.th.start()
@@ -347,6 +338,25 @@ class USBStream:
         except Exception:
             self.force_reopen = True
 
+    def _open_bulk_in(self, rx_async, urb_count, urb_size):
+        """Транспорт bulk IN: синхронный read (по умолчанию) или очередь async transfer'ов libusb.
+        Включается rx_async=True или BMI30_RX_ASYNC=1; BMI30_RX_URBS / BMI30_RX_URB_SIZE — глубина и размер."""
+        if rx_async is None:
+            try:
+                rx_async = str(os.getenv('BMI30_RX_ASYNC','0')).lower() not in ('0','false','no')
+            except Exception:
+                rx_async = False
+        if rx_async:
+            try:
+                count = int(urb_count if urb_count is not None else os.getenv('BMI30_RX_URBS', URB_COUNT))
+                size = int(urb_size if urb_size is not None else os.getenv('BMI30_RX_URB_SIZE', URB_SIZE))
+                rx = AsyncBulkIn(self.dev, EP_IN, count=count, size=size)
+                print(f"[rx] async bulk IN: {rx.count}x{rx.size}B в очереди")
+                return rx
+            except Exception as e:
+                print('[rx] async bulk IN недоступен, остаёмся на sync:', e)
+        return SyncBulkIn(self.dev, EP_IN, RX_READ_SIZE)
+
     def _parse_stat_ready(self, st: bytes) -> tuple[bool, bool]:
         """Парсим STAT, возвращаем (alt1, out_armed). Безопасно при любом буфере."""
         try:
@@ -512,14 +522,27 @@ class USBStream:
         except Exception:
             pass
 
+    def start_cmds(self) -> list:
+        """Пачка старта: профиль, режим, размер кадра (что задано) и START."""
+        cmds = []
+        if self.profile is not None:
+            cmds.append((CMD_SET_PROFILE, bytes([int(self.profile) & 0xFF])))
+        cmds.append((CMD_SET_FULL_MODE, bytes([1 if self.full else 0])))
+        if self.frame_samples is not None:
+            cmds.append((CMD_SET_FRAME_SAMPLES, (max(1, int(self.frame_samples)) & 0xFFFF).to_bytes(2, 'little')))
+        cmds.append((CMD_START_STREAM, b""))
+        return cmds
+
+    def start_burst(self, cmds=None):
+        """Отправить команды (по умолчанию start_cmds()) подряд, без пауз между ними."""
+        return self.ctrl.burst(self.start_cmds() if cmds is None else cmds)
+
     def restart_stream(self, full=True):
         """Повторно пнуть поток, если устройство молчит."""
         try:
             # Чистый рестарт: остановить, очистить и только потом запускать
             self._prepare_clean_start(stop_first=True)
-            if full:
-                self.send_cmd(CMD_SET_FULL_MODE, bytes([1])); time.sleep(0.02)
-            self.send_cmd(CMD_START_STREAM, b""); time.sleep(0.02)
+            self.start_burst(([(CMD_SET_FULL_MODE, bytes([1]))] if full else []) + [(CMD_START_STREAM, b"")])
             self._prime_get_status()
             self._kick_cdc_start()
             self.last_restart_t = time.time()
@@ -538,15 +561,9 @@ class USBStream:
         if self._fallback_done:
             return
         try:
-            self.send_cmd(CMD_SET_PROFILE, bytes([self.profile])); time.sleep(0.02)
-        except Exception:
-            pass
-        try:
-            self.send_cmd(CMD_SET_FULL_MODE, bytes([1 if self.full else 0])); time.sleep(0.02)
-        except Exception:
-            pass
-        try:
-            self.send_cmd(CMD_START_STREAM, b""); time.sleep(0.02)
+            self.start_burst([(CMD_SET_PROFILE, bytes([self.profile])),
+                              (CMD_SET_FULL_MODE, bytes([1 if self.full else 0])),
+                              (CMD_START_STREAM, b"")])
         except Exception:
             pass
         # Попробуем дополнительно CDC START (если есть CDC Data интерфейс)
@@ -561,6 +578,16 @@ class USBStream:
             self.send_cmd(CMD_STOP_STREAM,b"")
         except Exception:
             pass
+        try:
+            self.stop_recording()
+        except Exception:
+            pass
+        # RX-поток дождёмся в любом режиме: async-очередь он снимает сам на выходе,
+        # а sync-поток ещё может писать пару в sample_ring, который закрывают после нас
+        try:
+            self.th.join(timeout=1.5)
+        except Exception:
+            pass
         # Переведём IF в alt=0 (idle), если возможно
         try:
             if hasattr(self, 'intf_num') and self.intf_num is not None:
@@ -747,11 +774,20 @@ class USBStream:
             pass
         print(f"[tx-err] cmd=0x{cmd:02X} failed after retries: {last_err}")
     def _rx_loop(self):
-        buf = bytearray()
-        MAGIC_LE = b"\x5A\xA5"
+        try:
+            self._rx_loop_inner()
+        finally:
+            try:
+                self.rx_in.close()
+            except Exception:
+                pass
+    def _rx_loop_inner(self):
+        ring = self.ring
         while self._running and not self.disconnected:
             try:
-                data = bytes(self.dev.read(EP_IN, 4096, timeout=1000))
+                # bulk IN читается прямо в кольцо (без bytes()/extend): sync read или очередь async transfer'ов
+                n = self.rx_in.read_into(ring, 1000)
+                w0 = ring.wpos - n
             except usb.core.USBError as e:
                 if e.errno == 110: # timeout
                     # При длительном отсутствии рабочих кадров попробуем единоразовый fallback
@@ -765,25 +801,11 @@ class USBStream:
                         self.keepalive_last = now_t
                     if (now_t - self.last_rx_t) > 4.0 and (now_t - self.last_restart_t) > 3.0:
                         try:
+                            # снимем очередь IN (async) до STOP/CLEAR_HALT/alt, поставим снова после START
+                            self.rx_in.pause()
                             # Выполним мягкий «чистый» рестарт: STOP + очистка EP + переустановка altsetting
                             self._prepare_clean_start(stop_first=True)
-                            try:
-                                if self.profile is not None:
-                                    self.send_cmd(CMD_SET_PROFILE, bytes([int(self.profile) & 0xFF])); time.sleep(0.02)
-                            except Exception:
-                                pass
-                            try:
-                                self.send_cmd(CMD_SET_FULL_MODE, bytes([1 if self.full else 0])); time.sleep(0.02)
-                            except Exception:
-                                pass
-                            if self.frame_samples is not None:
-                                try:
-                                    ns = max(1, int(self.frame_samples)) & 0xFFFF
-                                    self.send_cmd(CMD_SET_FRAME_SAMPLES, ns.to_bytes(2,'little'))
-                                    time.sleep(0.02)
-                                except Exception:
-                                    pass
-                            self.send_cmd(CMD_START_STREAM, b""); time.sleep(0.02)
+                            self.start_burst()
                             self._prime_get_status()
                             self._kick_cdc_start()
                             self.last_restart_t = time.time()
@@ -791,6 +813,11 @@ class USBStream:
                             print("[kick] gentle restart (no RX)")
                         except Exception as e2:
                             print("[kick] gentle restart failed:", e2)
+                        finally:
+                            try:
+                                self.rx_in.resume()
+                            except Exception:
+                                pass
                         # По достижении нескольких неудачных рестартов можно попробовать жёсткий reset устройства (опционально)
                         try:
                             import os as _os
@@ -820,98 +847,22 @@ class USBStream:
                     time.sleep(0.05)
                     continue
                 print("USB err", e); time.sleep(0.1); continue
-            # перехват STAT коротких пакетов: выкусываем подряд и оставляем хвост
-            if data:
-                mv = memoryview(data)
-                pos = 0
-                n = len(mv)
-                while pos + 4 <= n and mv[pos:pos+4] == b'STAT':
-                    if pos + 64 <= n:
-                        self.last_stat = bytes(mv[pos:pos+64])
-                        pos += 64
-                        continue
-                    # если STAT неполный (маловероятно) — не трогаем, ждём доклейку
-                    break
-                if pos < n:
-                    buf.extend(mv[pos:].tobytes())
-            if data:
-                self.last_rx_t = time.time()
-            # выкидываем STAT пакеты как отдельные короткие сообщения
-            # (они не содержат магии и могут приходить как <=64 байт)
-            # Дефрамер: ищем магию 0xA55A (LE: 5A A5), затем ждём весь кадр
-            while True:
-                if len(buf) < HDR_SIZE:
-                    break
-                if not (buf[0] == 0x5A and buf[1] == 0xA5):
-                    idx = buf.find(MAGIC_LE)
-                    if idx == -1:
-                        # оставим хвост до 1 байта возможной магии
-                        del buf[:max(0, len(buf)-1)]
+            # перехват STAT коротких пакетов в начале чтения: выкусываем подряд и оставляем хвост
+            if n:
+                buf = ring.buf
+                while n >= 4 and buf[w0:w0+4] == b'STAT':
+                    if n < STAT_SIZE:
+                        # если STAT неполный (маловероятно) — не трогаем, ждём доклейку
                         break
+                    self.last_stat = bytes(buf[w0:w0+STAT_SIZE])
+                    if ring.rpos == w0:
+                        ring.skip(STAT_SIZE)
+                        w0 += STAT_SIZE
                     else:
-                        del buf[:idx]
-                        if len(buf) < HDR_SIZE:
-                            break
-                hdr_bytes = bytes(buf[:HDR_SIZE])
-                try:
-                    (magic,ver,flags,seq,timestamp,total_samples,zone_count,zone1_offset,zone1_length,reserved,reserved2,crc16v)= struct.unpack('<H B B I I H H I I I H H', hdr_bytes)
-                except struct.error:
-                    # недостаточно данных для заголовка — ждём
-                    break
-                if magic != MAGIC:
-                    # сдвинемся на байт вперёд и поищем магию снова
-                    self.magic_bad += 1
-                    del buf[0]
-                    continue
-                payload_len = int(total_samples)*2
-                frame_total = HDR_SIZE + payload_len
-                if len(buf) < frame_total:
-                    # ждём остаток кадра
-                    break
-                payload = bytes(buf[HDR_SIZE:frame_total])
-                # CRC опционален: при несовпадении не отбрасываем кадр, только считаем ошибку
-                if flags & VF_CRC:
-                    try:
-                        calc = crc16_ccitt_false(hdr_bytes[:-2])
-                        calc = crc16_ccitt_false(payload, calc)
-                        if calc != crc16v:
-                            self.crc_bad += 1
-                    except Exception:
-                        # если что-то пошло не так при расчёте CRC — не мешаем потоку
-                        self.crc_bad += 1
-                # TEST-бит (0x80):
-                # - если это «чистый» тестовый кадр (нет битов ADC0/ADC1) — по умолчанию пропускаем,
-                #   а при test_as_data дублируем на A и B;
-                # - если вместе с TEST выставлены биты канала (DIAG: 0x81/0x82) — считаем обычным A/B кадром.
-                if (flags & 0x80) and (flags & (VF_ADC0 | VF_ADC1)) == 0:
-                    self.test_seen += 1
-                    if self.test_as_data:
-                        try:
-                            fA = Frame(seq, timestamp, 0, flags, total_samples, payload)
-                            fB = Frame(seq, timestamp, 1, flags, total_samples, payload)
-                            self.asm.push(fA)
-                            self.asm.push(fB)
-                            self.frames += 2
-                            self.bytes += payload_len * 2
-                            self._working_seen = True
-                        except Exception:
-                            pass
-                    del buf[:frame_total]
-                    continue
-                if flags & VF_ADC0:
-                    adc_id = 0
-                elif flags & VF_ADC1:
-                    adc_id = 1
-                else:
-                    # неизвестный флаг — отбрасываем кадр
-                    del buf[:frame_total]
-                    continue
-                f = Frame(seq,timestamp,adc_id,flags,total_samples,payload)
-                self.asm.push(f)
-                self.frames += 1
-                self.bytes += payload_len
-                del buf[:frame_total]
-                self._working_seen = True
+                        ring.cut(w0, STAT_SIZE)
+                    n -= STAT_SIZE
+                self.last_rx_t = time.time()
+            self._drain_ring()
             now=time.time()
             # Если видим только STAT и нет рабочих кадров — один раз пробуем fallback
             if (not self._working_seen) and (not self._fallback_done) and (now - self.connected_t > 1.6):
@@ -919,13 +870,96 @@ class USBStream:
             if now - self.stat_t >=1.0:
                 with self.lock:
                     fps=self.frames; bps=self.bytes
-                    print(f"fps={fps} bytes={bps} crc_bad={self.crc_bad} magic_bad={self.magic_bad} stereo_ready={self.asm.q.qsize()}")
+                    print(f"fps={fps} bytes={bps} crc_bad={self.crc_bad} magic_bad={self.magic_bad} stereo_ready={self.pool.ready()} orphans={self.pool.orphans_a}/{self.pool.orphans_b} pair_drop={self.pool.dropped_pairs + self.pool.dropped_frames}" + (f" rec_drop={self.recorder.dropped_records}" if self.recorder is not None else ""))
                     self.frames=0; self.bytes=0; self.stat_t=now
-    def get_stereo(self, timeout=0.0):
-        try:
-            return self.asm.q.get(timeout=timeout)
-        except queue.Empty:
+    def _drain_ring(self):
+        """Дефрейминг всего, что накопилось в кольце: payload копируется прямо в слот
+        PairPool (одна копия), место в кольце освобождается сразу."""
+        ring = self.ring
+        mv = ring.mv
+        pool = self.pool
+        rec = None if self.record_pairs else self.recorder
+        batch = ring.take_frames()
+        if batch.skipped:
+            # был мусор до магии (рассинхрон потока)
+            self.magic_bad += 1
+        for (magic,ver,flags,seq,timestamp,total_samples,zone_count,zone1_offset,zone1_length,reserved,reserved2,crc16v), off in batch.rows:
+            payload_len = int(total_samples)*2
+            frame_total = HDR_SIZE + payload_len
+            payload = mv[off+HDR_SIZE:off+frame_total]
+            # CRC опционален: при несовпадении не отбрасываем кадр, только считаем ошибку
+            if flags & VF_CRC:
+                try:
+                    if vendor_frame_crc(mv, off, frame_total) != crc16v:
+                        self.crc_bad += 1
+                except Exception:
+                    # если что-то пошло не так при расчёте CRC — не мешаем потоку
+                    self.crc_bad += 1
+            if rec is not None:
+                # сырой кадр как пришёл (включая TEST): копия в чанк, на диск — фоновым потоком
+                rec.add_frame(mv[off:off+frame_total], seq, timestamp)
+            # TEST-бит (0x80):
+            # - если это «чистый» тестовый кадр (нет битов ADC0/ADC1) — по умолчанию пропускаем,
+            #   а при test_as_data дублируем на A и B;
+            # - если вместе с TEST выставлены биты канала (DIAG: 0x81/0x82) — считаем обычным A/B кадром.
+            if (flags & 0x80) and (flags & (VF_ADC0 | VF_ADC1)) == 0:
+                self.test_seen += 1
+                if self.test_as_data:
+                    try:
+                        pool.push(0, seq, timestamp, flags, payload)
+                        pool.push(1, seq, timestamp, flags, payload)
+                        self.frames += 2
+                        self.bytes += payload_len * 2
+                        self._working_seen = True
+                    except Exception:
+                        pass
+                continue
+            if flags & VF_ADC0:
+                adc_id = 0
+            elif flags & VF_ADC1:
+                adc_id = 1
+            else:
+                # неизвестный флаг — отбрасываем кадр
+                continue
+            pool.push(adc_id, seq, timestamp, flags, payload)
+            self.frames += 1
+            self.bytes += payload_len
+            self._working_seen = True
+    def _publish_pair(self, slot, a, b):
+        n = min(a.samples, b.samples)
+        d = self.pool.data
+        self.sample_ring.write(d[slot, 0, :n], d[slot, 1, :n], a.seq, a.timestamp)
+        rec = self.recorder
+        if rec is not None and self.record_pairs:
+            rec.add_pair(d[slot, 0, :n], d[slot, 1, :n], a.seq, a.timestamp)
+    def start_recording(self, path: str, pairs: bool = False, **kw):
+        """Писать поток в path (.bmr): сырые кадры или (pairs=True) собранные стереопары."""
+        self.stop_recording()
+        rec = Recorder(path, KIND_PAIRS if pairs else KIND_FRAMES, **kw)
+        self.record_pairs = bool(pairs)
+        self.recorder = rec
+        print(f"[rec] запись в {path} ({'пары' if pairs else 'кадры'}, O_DIRECT={rec.direct})")
+        return rec
+    def stop_recording(self):
+        """Остановить запись: дописать очередь, индекс и трейлер. Возвращает stats() или None."""
+        rec = self.recorder
+        if rec is None:
             return None
+        self.recorder = None
+        rec.close()
+        st = rec.stats()
+        print(f"[rec] {rec.path}: records={st['records']} chunks={st['chunks']} dropped={st['dropped_records']}")
+        return st
+    def set_pair_queue(self, enabled: bool):
+        """False — пары только публикуются в sample_ring, очередь get_stereo() не копится
+        (для потребителей, читающих кольцо семплов)."""
+        self.pool.queue_pairs = bool(enabled)
+    def get_stereo(self, timeout=0.0):
+        """(a, b) — половины пары (seq/timestamp/flags/samples/payload); после работы a.release(); b.release()."""
+        return self.pool.get(timeout)
+    def get_stereo_into(self, dst0, dst1, timeout=0.0):
+        """Скопировать следующую пару в dst0/dst1 (int16) без удержания слота: (seq, timestamp, samples) или None."""
+        return self.pool.pop_into(dst0, dst1, timeout)
 
     # --- helpers for GUI ---
     def get_port_path_info(self):
@@ -1014,7 +1048,9 @@ def watch_loop(interval=1.0):
                     time.sleep(interval)
                 else:
                     # poll for stereo pairs lightly (discard output here)
-                    _ = us.get_stereo(timeout=0.01)
+                    pair = us.get_stereo(timeout=0.01)
+                    if pair:
+                        pair[0].release(); pair[1].release()
                     time.sleep(0.1)
         except KeyboardInterrupt:
             print('\n[exit]')
@@ -1036,6 +1072,7 @@ if __name__=='__main__':
                 if pair:
                     (a,b) = pair
                     print(f"stereo seq={a.seq} samplesA={a.samples} samplesB={b.samples}")
+                    a.release(); b.release()
         except KeyboardInterrupt:
             pass
         finally:
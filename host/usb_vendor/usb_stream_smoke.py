@@ -27,6 +27,7 @@ def main():
             continue
         a, b = p
         print(f"[smoke] pair seq={a.seq} samplesA={a.samples} samplesB={b.samples}")
+        a.release(); b.release()
         pairs += 1
         if pairs == 1:
             # маленькая пауза, чтобы успел прийти ещё кадр
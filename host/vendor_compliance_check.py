@@ -9,6 +9,9 @@ except Exception as e:
     print(f"[ERR] PyUSB not installed: {e}")
     sys.exit(2)
 
+from usb_vendor.crc16 import vendor_frame_crc
+from usb_vendor.control import bulk_client
+
 VID = 0xCAFE
 PID = 0x4001
 EP_IN_EXPECT = 0x83
@@ -31,6 +34,7 @@ class USBVend:
         if self.dev is None:
             raise SystemExit(f"Device {vid:04X}:{pid:04X} not found")
         self._pick_interface()
+        self.ctrl = bulk_client(lambda pkt: self.dev.write(self.ep_out, pkt, timeout=1000))
 
     def _pick_interface(self):
         # detach kernel drivers quickly
@@ -102,8 +106,7 @@ class USBVend:
             pass
 
     def write_cmd(self, cmd: int, payload: bytes = b'') -> int:
-        pkt = bytes([cmd]) + payload
-        return int(self.dev.write(self.ep_out, pkt, timeout=1000))
+        return self.ctrl.send(cmd, payload)[1]   # ('SENT', байт записано dev.write)
 
     def read_in(self, nbytes: int = 4096, timeout_ms: int = 1000) -> bytes:
         return bytes(self.dev.read(self.ep_in, nbytes, timeout=timeout_ms))
@@ -133,11 +136,13 @@ def main() -> int:
         only_work_flags_ok = True
         frames_collected = 0
         pairs_collected = 0
+        crc_checked = 0
+        crc_bad = 0
         buf = bytearray()
         MAGIC_LE = b"\x5A\xA5"
 
         def drain_buf():
-            nonlocal test_seen, size_locked, seq_pairs, last_pair_seq, monotonic_ok, only_work_flags_ok, frames_collected, pairs_collected, buf
+            nonlocal test_seen, size_locked, seq_pairs, last_pair_seq, monotonic_ok, only_work_flags_ok, frames_collected, pairs_collected, crc_checked, crc_bad, buf
             while True:
                 if len(buf) < HDR_SIZE:
                     break
@@ -162,6 +167,13 @@ def main() -> int:
                 frame_total = HDR_SIZE + payload_len
                 if len(buf) < frame_total:
                     break
+                # CRC (flags & 0x04): заголовок без поля crc16 + payload
+                if flags & 0x04:
+                    crc_checked += 1
+                    calc = vendor_frame_crc(buf, 0, frame_total)
+                    if calc != crc16v:
+                        crc_bad += 1
+                        notes.append(f"crc mismatch seq={seq} flags=0x{flags:02X} got=0x{crc16v:04X} calc=0x{calc:04X}")
                 # optional test frame
                 if (flags & 0x80) and total_samples == 8 and not test_seen:
                     print(f"[ok] test frame: flags=0x81 total=8 ver={ver}")
@@ -255,6 +267,7 @@ def main() -> int:
             us.write_cmd(CMD_GET_STATUS)
             _ = wait_for_stat(0.4)
             # 1 = 200 Hz, 2 = 300 Hz (per spec)
+            # паузы оставлены: проверка соответствия идёт в исходном темпе команд прошивки
             us.write_cmd(CMD_SET_PROFILE, bytes([2]))
             time.sleep(0.05)
             us.write_cmd(CMD_SET_FULL_MODE, bytes([1]))
@@ -314,6 +327,8 @@ def main() -> int:
             fails.append("non-working flags seen")
         if not monotonic_ok:
             fails.append("non-monotonic pair sequence")
+        if crc_bad:
+            fails.append(f"crc mismatch in {crc_bad}/{crc_checked} frames")
         if fails:
             print("\nRESULT: FAIL")
             for f in fails:
@@ -327,6 +342,8 @@ def main() -> int:
             print("\nRESULT: PASS")
             if size_locked is not None:
                 print(f"locked total_samples={size_locked}")
+            if crc_checked:
+                print(f"crc ok in {crc_checked} frames")
             return 0
     finally:
         try: